@@ -1,23 +1,74 @@
 import os
 import glob
-import geopandas as gpd
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import ExitStack
+import numpy as np
 import rasterio
+from rasterio.coords import disjoint_bounds
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
 from rasterio.mask import mask
 from rasterio.merge import merge
-from rasterio.crs import CRS
+from rasterio.transform import from_origin
+from rasterio.windows import Window, bounds as window_bounds, from_bounds
+from shapely import STRtree, box
+
+from geometry_cache import default_cache
+from instrumentation import file_size, stage
+from raster_blocks import tiled_profile
+from vector_io import read_vector
 
 # Paths
 shapefile_path = "...path\\boundary.shp"
 tiles_dir = "...path\\tiles"  # Directory containing Landsat tiles
 output_mosaic_path = "...path\\mosaic_output.tif"
+streaming = False  # Stream tiles larger than RAM block by block (no boundary clip)
+
+# Compositing methods supported by streaming_mosaic
+MOSAIC_METHODS = ("first", "last", "min", "max", "mean")
+
+
+def clip_tile_in_memory(src, gdf, stack, prepared=None):
+    """
+    Clips an open tile to the boundary and returns the result as an in-memory
+    dataset registered on stack, or None if the tile does not overlap the boundary.
+    The overlap test uses only the tile header, so skipped tiles cost no pixel reads;
+    with a prepared boundary union, tiles inside its bounding box but outside the
+    boundary itself are skipped too.
+    """
+    if disjoint_bounds(src.bounds, tuple(gdf.total_bounds)):
+        return None
+    if prepared is not None and not prepared.intersects(box(*src.bounds)):
+        return None
+
+    clipped_image, clipped_transform = mask(src, gdf.geometry, crop=True)
+
+    profile = src.profile
+    profile.update({
+        "driver": "GTiff",
+        "height": clipped_image.shape[1],
+        "width": clipped_image.shape[2],
+        "transform": clipped_transform,
+        "crs": src.crs
+    })
 
-# Initialize lists to avoid NameError
-clipped_rasters = []
-temp_files = []
+    memfile = stack.enter_context(MemoryFile())
+    dataset = stack.enter_context(memfile.open(**profile))
+    dataset.write(clipped_image)
+    return dataset
 
-try:
+
+def mosaic_tiles(shapefile_path, tiles_dir, output_mosaic_path):
+    """
+    Clips every tile in tiles_dir to the shapefile and mosaics the results.
+    Clipped tiles are kept in memory datasets, so the only file written is the mosaic.
+    """
     # Read the shapefile and get its CRS
-    gdf = gpd.read_file(shapefile_path)
+    with stage("mosaic.load_boundary") as record:
+        gdf = read_vector(shapefile_path)
+        record["features"] = len(gdf)
     shapefile_crs = gdf.crs
     if shapefile_crs is None:
         raise ValueError("Shapefile has no CRS defined. Please assign a valid CRS (e.g., EPSG:4326).")
@@ -29,74 +80,226 @@ try:
         raise ValueError(f"No TIFF files found in {tiles_dir}")
     print(f"Found {len(tile_paths)} tiles: {tile_paths}")
 
-    # Process each tile: clip to shapefile extent
-    for i, tile_path in enumerate(tile_paths):
-        print(f"Processing tile {i+1}/{len(tile_paths)}: {tile_path}")
-        
-        with rasterio.open(tile_path) as src:
-            # Check the tile's CRS
-            tile_crs = src.crs
-            if tile_crs is None:
-                raise ValueError(f"Tile {tile_path} has no CRS defined.")
-            print(f"Tile CRS: {tile_crs}")
-
-            # Ensure the tile and shapefile CRS match (reproject shapefile if needed)
-            if tile_crs != shapefile_crs:
-                print(f"Warning: Tile CRS ({tile_crs}) does not match shapefile CRS ({shapefile_crs}). Reprojecting shapefile geometry.")
-                gdf_reprojected = gdf.to_crs(tile_crs)
-            else:
-                gdf_reprojected = gdf
-
-            # Clip the tile to the shapefile geometry
-            clipped_image, clipped_transform = mask(src, gdf_reprojected.geometry, crop=True)
-
-            # Create a temporary in-memory raster for the clipped image
-            temp_profile = src.profile
-            temp_profile.update({
-                "height": clipped_image.shape[1],
-                "width": clipped_image.shape[2],
-                "transform": clipped_transform,
-                "crs": tile_crs  # Use tile's CRS temporarily for clipping
-            })
+    # Boundary reprojected once per tile CRS (shared cache)
+    warned = set()
 
-            # Save clipped image to a temporary file (required for mosaicking)
-            temp_file = f"temp_clipped_{i}.tif"
-            with rasterio.open(temp_file, "w", **temp_profile) as dst:
-                dst.write(clipped_image)
-            temp_files.append(temp_file)
-
-            # Store the clipped raster for mosaicking
-            clipped_rasters.append(rasterio.open(temp_file))
-
-    # Mosaic the clipped rasters
-    print("Mosaicking clipped tiles...")
-    mosaic, mosaic_transform = merge(clipped_rasters)
-
-    # Update the mosaic profile with the shapefile's CRS
-    mosaic_profile = clipped_rasters[0].profile
-    mosaic_profile.update({
-        "height": mosaic.shape[1],
-        "width": mosaic.shape[2],
-        "transform": mosaic_transform,
-        "crs": shapefile_crs  # Set output CRS to shapefile's CRS
-    })
+    # Every tile and in-memory dataset is closed when the stack exits
+    with ExitStack() as stack:
+        clipped_rasters = []
+
+        # Process each tile: clip to shapefile extent
+        for i, tile_path in enumerate(tile_paths):
+            print(f"Processing tile {i+1}/{len(tile_paths)}: {tile_path}")
+
+            with rasterio.open(tile_path) as src:
+                # Check the tile's CRS
+                tile_crs = src.crs
+                if tile_crs is None:
+                    raise ValueError(f"Tile {tile_path} has no CRS defined.")
+
+                # Ensure the tile and shapefile CRS match (reproject shapefile if needed)
+                if tile_crs != shapefile_crs and tile_crs.to_wkt() not in warned:
+                    print(f"Warning: Tile CRS ({tile_crs}) does not match shapefile CRS ({shapefile_crs}). Reprojecting shapefile geometry.")
+                    warned.add(tile_crs.to_wkt())
+
+                with stage("mosaic.reproject", features=len(gdf)):
+                    prepared = default_cache.prepared(gdf, tile_crs)
+                    tile_gdf = default_cache.get(gdf, tile_crs, count=False)
+                with stage("mosaic.clip_tile") as record:
+                    clipped = clip_tile_in_memory(src, tile_gdf, stack, prepared)
+                    record["pixels"] = clipped.count * clipped.width * clipped.height if clipped else 0
+                if clipped is None:
+                    print(f"Skipping tile outside the boundary: {tile_path}")
+                    continue
+                clipped_rasters.append(clipped)
+
+        if not clipped_rasters:
+            raise ValueError("No tiles intersect the shapefile boundary.")
+
+        stats = default_cache.stats()
+        print(f"Boundary reprojection cache: {stats['hits']} hits, {stats['misses']} misses")
+
+        # Mosaic the clipped rasters
+        print("Mosaicking clipped tiles...")
+        with stage("mosaic.merge") as record:
+            mosaic, mosaic_transform = merge(clipped_rasters)
+            record["pixels"] = mosaic.size
+
+        # Update the mosaic profile with the shapefile's CRS
+        mosaic_profile = clipped_rasters[0].profile
+        mosaic_profile.update({
+            "height": mosaic.shape[1],
+            "width": mosaic.shape[2],
+            "transform": mosaic_transform,
+            "crs": shapefile_crs  # Set output CRS to shapefile's CRS
+        })
 
     # Save the mosaicked raster
-    with rasterio.open(output_mosaic_path, "w", **mosaic_profile) as dst:
-        dst.write(mosaic)
+    with stage("mosaic.write", pixels=mosaic.size) as record:
+        with rasterio.open(output_mosaic_path, "w", **mosaic_profile) as dst:
+            dst.write(mosaic)
+        record["bytes_written"] = file_size(output_mosaic_path)
 
     print(f"Mosaicked raster saved as {output_mosaic_path} with CRS: {shapefile_crs}")
 
-except Exception as e:
-    print(f"Error occurred: {e}")
-
-finally:
-    # Close all rasterio datasets safely
-    for raster in clipped_rasters:
-        if raster and not raster.closed:
-            raster.close()
-    # Clean up temporary files
-    for temp_file in temp_files:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-            print(f"Deleted temporary file: {temp_file}")
+
+class _TileReaders(threading.local):
+    """Per-thread open tile handles; rasterio datasets must not be shared across threads."""
+
+    def __init__(self, registry, lock):
+        self.datasets = {}
+        self.registry = registry
+        self.lock = lock
+
+    def get(self, path):
+        if path not in self.datasets:
+            dataset = rasterio.open(path)
+            self.datasets[path] = dataset
+            with self.lock:
+                self.registry.append(dataset)
+        return self.datasets[path]
+
+
+def _composite_block(window, out_transform, tiles, tree, readers, count, dtype, nodata, method):
+    """Reads the tiles overlapping one output block and composites them."""
+    height, width = int(window.height), int(window.width)
+    left, bottom, right, top = window_bounds(window, out_transform)
+    block_box = box(left, bottom, right, top)
+
+    # Tiles touching the block only along an edge contribute no pixels
+    hits = sorted(i for i in tree.query(block_box)
+                  if tiles[i]["footprint"].intersection(block_box).area > 0)
+
+    if method == "last":
+        hits = hits[::-1]
+
+    if method == "mean":
+        total = np.zeros((count, height, width), dtype="float64")
+        counts = np.zeros((count, height, width), dtype="uint32")
+    result = np.full((count, height, width), nodata, dtype=dtype)
+    filled = np.zeros((count, height, width), dtype=bool)
+
+    for i in hits:
+        src = readers.get(tiles[i]["path"])
+        src_window = from_bounds(left, bottom, right, top, transform=src.transform)
+        data = src.read(window=src_window, out_shape=(count, height, width), boundless=True,
+                        masked=True, resampling=Resampling.nearest)
+        valid = ~np.ma.getmaskarray(data)
+        values = data.data
+
+        if method in ("first", "last"):
+            take = valid & ~filled
+        elif method == "min":
+            take = valid & (~filled | (values < result))
+        elif method == "max":
+            take = valid & (~filled | (values > result))
+        else:
+            total[valid] += values[valid]
+            counts[valid] += 1
+            take = None
+
+        if take is not None:
+            result[take] = values[take]
+        filled |= valid
+
+        # First / last can stop once every pixel of the block is covered
+        if method in ("first", "last") and filled.all():
+            break
+
+    if method == "mean":
+        np.divide(total, counts, out=total, where=counts > 0)
+        result[filled] = total[filled].astype(dtype)
+    return window, result
+
+
+def streaming_mosaic(tile_paths, output_mosaic_path, method="first", block_size=1024,
+                     threads=4, resolution=None, nodata=None, compress="lzw"):
+    """
+    Mosaics tiles block by block without holding the mosaic in memory.
+    Tile footprints go into an STRtree; for each output block only the tiles that
+    overlap it are read and composited (first, last, min, max or mean), and the
+    block is written to a tiled, compressed GeoTIFF before moving on.
+    Blocks are composited by a pool of threads, each with its own tile handles.
+    """
+    if method not in MOSAIC_METHODS:
+        raise ValueError(f"Unknown mosaic method '{method}', expected one of {MOSAIC_METHODS}")
+    if not tile_paths:
+        raise ValueError("No tiles to mosaic.")
+
+    # Tile headers only: footprint, grid and band layout
+    tiles = []
+    for tile_path in tile_paths:
+        with rasterio.open(tile_path) as src:
+            tiles.append({
+                "path": tile_path,
+                "footprint": box(*src.bounds),
+                "crs": src.crs,
+                "res": src.res,
+                "count": src.count,
+                "dtype": src.dtypes[0],
+                "nodata": src.nodata,
+            })
+
+    first = tiles[0]
+    for tile in tiles[1:]:
+        if tile["crs"] != first["crs"]:
+            raise ValueError(f"Tile {tile['path']} CRS ({tile['crs']}) differs from {first['path']} ({first['crs']}).")
+        if tile["count"] != first["count"]:
+            raise ValueError(f"Tile {tile['path']} has {tile['count']} bands, expected {first['count']}.")
+
+    res_x, res_y = resolution if resolution is not None else first["res"]
+    if nodata is None:
+        nodata = first["nodata"] if first["nodata"] is not None else 0
+    count, dtype = first["count"], first["dtype"]
+
+    all_bounds = np.array([t["footprint"].bounds for t in tiles])
+    left, bottom = all_bounds[:, :2].min(axis=0)
+    right, top = all_bounds[:, 2:].max(axis=0)
+    width = int(math.ceil(round((right - left) / res_x, 6)))
+    height = int(math.ceil(round((top - bottom) / res_y, 6)))
+    out_transform = from_origin(left, top, res_x, res_y)
+
+    tree = STRtree([t["footprint"] for t in tiles])
+
+    profile = tiled_profile({}, compress=compress, width=width, height=height, count=count,
+                            dtype=dtype, nodata=nodata, crs=first["crs"], transform=out_transform)
+
+    windows = (Window(col, row, min(block_size, width - col), min(block_size, height - row))
+               for row in range(0, height, block_size)
+               for col in range(0, width, block_size))
+
+    opened = []
+    readers = _TileReaders(opened, threading.Lock())
+    print(f"Streaming mosaic of {len(tiles)} tiles into {width}x{height} pixels ({method})")
+
+    try:
+        with rasterio.open(output_mosaic_path, "w", **profile) as dst, \
+                ThreadPoolExecutor(max_workers=threads) as pool:
+            # Bound the number of blocks in flight so memory stays O(block)
+            pending = set()
+            for window in windows:
+                pending.add(pool.submit(_composite_block, window, out_transform, tiles, tree,
+                                        readers, count, dtype, nodata, method))
+                if len(pending) >= 2 * threads:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        block_window, block = future.result()
+                        dst.write(block, window=block_window)
+            for future in pending:
+                block_window, block = future.result()
+                dst.write(block, window=block_window)
+    finally:
+        for dataset in opened:
+            dataset.close()
+
+    print(f"Streaming mosaic saved as {output_mosaic_path}")
+
+
+if __name__ == "__main__":
+    try:
+        if streaming:
+            streaming_mosaic(glob.glob(os.path.join(tiles_dir, "*.tif")), output_mosaic_path)
+        else:
+            mosaic_tiles(shapefile_path, tiles_dir, output_mosaic_path)
+    except Exception as e:
+        print(f"Error occurred: {e}")
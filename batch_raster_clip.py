@@ -1,23 +1,79 @@
 import os
+import json
+import time
+import hashlib
+import traceback
 import rasterio
-from rasterio.mask import mask
+from rasterio.mask import raster_geometry_mask
 import geopandas as gpd
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from geometry_cache import default_cache, geometry_hash
+from instrumentation import file_size, profiler, stage
+from vector_io import read_vector
+
+# Manifest written to the output root in incremental mode
+MANIFEST_NAME = ".clip_manifest.json"
+
+# Boundary shared by every clip in this process
+_boundary = None
+
+def load_boundary(shapefile):
+    """Reads the clipping boundary once; GeoDataFrames are passed through."""
+    if isinstance(shapefile, gpd.GeoDataFrame):
+        return shapefile
+    return read_vector(shapefile)
+
+def _init_worker(boundary, cache_dir=None, profile=False, in_worker=False):
+    """
+    Sets up a process for clipping. A forked pool worker (in_worker=True)
+    starts with a copy of the parent's profiler records and cache counters,
+    which are dropped so they are not reported with its own.
+    """
+    global _boundary
+    _boundary = boundary
+    default_cache.cache_dir = cache_dir
+    profiler.enabled = profile
+    if in_worker:
+        profiler.reset()
+        default_cache.reset_stats()
+
+def get_boundary_shapes(gdf, crs):
+    """
+    Returns the boundary geometries in the given CRS.
+    Reprojections come from the shared cache, so each CRS is done once.
+    """
+    return default_cache.shapes(gdf, crs)
 
 def clip_raster_to_shape(input_tif, output_tif, shapefile):
+    """
+    Clips a raster to the boundary (cropped, outside pixels set to nodata).
+    Equivalent to rasterio.mask.mask, split so that rasterizing the boundary,
+    reading the window and masking are timed as separate stages.
+    """
+    # Shapefile may be a path or an already loaded boundary GeoDataFrame
+    with stage("clip.load_boundary"):
+        gdf = load_boundary(shapefile)
+
     # Open the raster to get its CRS
     with rasterio.open(input_tif) as src:
         raster_crs = src.crs
-        raster_transform = src.transform
+        nodata = src.nodata if src.nodata is not None else 0
 
-        # Read and reproject shapefile
-        gdf = gpd.read_file(shapefile)
-        if gdf.crs != raster_crs:
-            gdf = gdf.to_crs(raster_crs)
+        # Boundary reprojected to the raster CRS (cached per CRS)
+        with stage("clip.reproject", features=len(gdf)):
+            shapes = get_boundary_shapes(gdf, raster_crs)
 
         # Mask the raster
-        shapes = [feature["geometry"] for feature in gdf.__geo_interface__["features"]]
-        out_image, out_transform = mask(src, shapes, crop=True)
+        with stage("clip.rasterize") as record:
+            shape_mask, out_transform, window = raster_geometry_mask(src, shapes, crop=True)
+            record["pixels"] = shape_mask.size
+        with stage("clip.read") as record:
+            out_image = src.read(window=window, masked=True)
+            record["pixels"] = out_image.size
+        with stage("clip.mask", pixels=out_image.size):
+            out_image.mask = out_image.mask | shape_mask
+            out_image = out_image.filled(nodata)
         out_meta = src.meta.copy()
 
     # Update metadata
@@ -33,10 +89,27 @@ def clip_raster_to_shape(input_tif, output_tif, shapefile):
     os.makedirs(os.path.dirname(output_tif), exist_ok=True)
 
     # Save clipped raster
-    with rasterio.open(output_tif, "w", **out_meta) as dest:
-        dest.write(out_image)
+    with stage("clip.write", pixels=out_image.size) as record:
+        with rasterio.open(output_tif, "w", **out_meta) as dest:
+            dest.write(out_image)
+        record["bytes_written"] = file_size(output_tif)
 
-def process_directory(input_root, output_root, shapefile):
+def _clip_job(input_tif, output_tif, in_worker=False):
+    """
+    Clips one raster with the process-wide boundary; errors are returned, not raised.
+    The worker's cache counters are returned with the result, and in a pool
+    worker also its profiler records.
+    """
+    try:
+        clip_raster_to_shape(input_tif, output_tif, _boundary)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return error, os.getpid(), default_cache.stats(), profiler.drain() if in_worker else []
+
+def find_rasters(input_root, output_root):
+    """Lists (input_tif, output_tif) pairs mirroring input_root under output_root."""
+    jobs = []
     for dirpath, _, filenames in os.walk(input_root):
         for filename in filenames:
             if filename.lower().endswith(".tif"):
@@ -44,13 +117,212 @@ def process_directory(input_root, output_root, shapefile):
                 relative_path = os.path.relpath(dirpath, input_root)
                 output_dir = os.path.join(output_root, relative_path)
                 output_tif = os.path.join(output_dir, filename)
+                jobs.append((input_tif, output_tif))
+    return jobs
+
+def file_hash(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def boundary_hash(shapefile):
+    """
+    Hashes the clipping boundary so outputs can be redone when it changes.
+    A file boundary (.gpkg, .fgb, .parquet, ...) is hashed whole; for a
+    shapefile every sidecar file (.shp, .dbf, .prj, ...) is included.
+    """
+    if isinstance(shapefile, gpd.GeoDataFrame):
+        return geometry_hash(shapefile)
+
+    stem, ext = os.path.splitext(str(shapefile))
+    if ext.lower() != ".shp":
+        return file_hash(shapefile)
+
+    digest = hashlib.sha256()
+    for ext in (".shp", ".shx", ".dbf", ".prj", ".cpg"):
+        for candidate in (stem + ext, stem + ext.upper()):
+            if os.path.exists(candidate):
+                digest.update(ext.encode())
+                digest.update(file_hash(candidate).encode())
+                break
+    return digest.hexdigest()
+
+def load_manifest(output_root):
+    """Reads the clip manifest from output_root, or returns an empty one."""
+    path = os.path.join(output_root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"boundary": None, "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(output_root, manifest):
+    """Writes the manifest atomically so an interrupted run cannot corrupt it."""
+    os.makedirs(output_root, exist_ok=True)
+    path = os.path.join(output_root, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _input_state(input_tif, previous=None, hash_inputs=False):
+    """Size / mtime (and optionally hash) of an input; unchanged files are not rehashed."""
+    stat = os.stat(input_tif)
+    state = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if hash_inputs:
+        if previous and previous.get("sha256") and \
+                previous.get("size") == state["size"] and previous.get("mtime") == state["mtime"]:
+            state["sha256"] = previous["sha256"]
+        else:
+            state["sha256"] = file_hash(input_tif)
+    return state
+
+def _is_up_to_date(entry, state, output_tif, hash_inputs, boundary):
+    """An output is current if its input is unchanged and it was clipped to this boundary."""
+    if entry is None or not os.path.exists(output_tif) or entry.get("boundary") != boundary:
+        return False
+    if hash_inputs:
+        return entry.get("sha256") == state["sha256"]
+    return entry.get("size") == state["size"] and entry.get("mtime") == state["mtime"]
+
+def prune_orphans(output_root, manifest, current_inputs):
+    """Deletes outputs whose input is gone and drops them from the manifest."""
+    pruned = []
+    for rel_input in list(manifest["files"]):
+        if rel_input in current_inputs:
+            continue
+        entry = manifest["files"].pop(rel_input)
+        output_tif = os.path.join(output_root, entry["output"])
+        if os.path.exists(output_tif):
+            os.remove(output_tif)
+            print(f"Pruned orphaned output: {output_tif}")
+        pruned.append(output_tif)
+    return pruned
+
+def process_directory(input_root, output_root, shapefile, workers=1,
+                      incremental=False, hash_inputs=False, cache_dir=None):
+    """
+    Clips every .tif under input_root to the shapefile boundary.
+    With workers > 1 the rasters are clipped in a process pool; the boundary is
+    read once and handed to each worker. A failing raster is reported and
+    skipped without stopping the run. Returns a summary dictionary.
+
+    With incremental=True a manifest in output_root records each input's size
+    and mtime (plus its SHA-256 if hash_inputs=True) and the hash of the
+    boundary it was clipped to. Only new or changed rasters are clipped,
+    everything is redone when the boundary changes, and outputs whose input has
+    disappeared are deleted. Entries of rasters about to be clipped are dropped
+    first, so a raster that fails stays pending for the next run.
+
+    Boundary reprojections are cached per raster CRS in every process; with
+    cache_dir they are also kept on disk for the other workers and later runs.
+    The summary reports the cache hits and misses of this run.
+    """
+    boundary = load_boundary(shapefile)
+    jobs = find_rasters(input_root, output_root)
+    skipped = 0
+    pruned = []
+    states = {}
+
+    if incremental:
+        manifest = load_manifest(output_root)
+        current_boundary = boundary_hash(shapefile)
+        boundary_changed = manifest["boundary"] != current_boundary
+        if boundary_changed and manifest["files"]:
+            print("Boundary changed since last run; reprocessing all rasters.")
+        manifest["boundary"] = current_boundary
+
+        pending = []
+        for input_tif, output_tif in jobs:
+            rel_input = os.path.relpath(input_tif, input_root)
+            entry = manifest["files"].get(rel_input)
+            state = _input_state(input_tif, entry, hash_inputs)
+            if _is_up_to_date(entry, state, output_tif, hash_inputs, current_boundary):
+                skipped += 1
+                continue
+            manifest["files"].pop(rel_input, None)
+            states[input_tif] = state
+            pending.append((input_tif, output_tif))
+
+        current_inputs = {os.path.relpath(input_tif, input_root) for input_tif, _ in jobs}
+        pruned = prune_orphans(output_root, manifest, current_inputs)
+        jobs = pending
+        print(f"Incremental mode: {len(jobs)} to clip, {skipped} up to date, {len(pruned)} pruned")
+
+    total = len(jobs)
+    total_bytes = sum(os.path.getsize(input_tif) for input_tif, _ in jobs)
+    outputs = dict(jobs)
+    failed = {}
+    cache_stats = {}
+    # The counters of this process are cumulative; only this run's lookups count
+    cache_start = default_cache.stats()
+    start = time.perf_counter()
+
+    def report(i, input_tif, result):
+        error, pid, stats, records = result
+        cache_stats[pid] = stats
+        profiler.extend(records)
+        if error is None:
+            print(f"[{i}/{total}] Clipped: {input_tif}")
+            if incremental:
+                entry = dict(states[input_tif])
+                entry["output"] = os.path.relpath(outputs[input_tif], output_root)
+                entry["boundary"] = current_boundary
+                manifest["files"][os.path.relpath(input_tif, input_root)] = entry
+        else:
+            failed[input_tif] = error
+            print(f"[{i}/{total}] Failed: {input_tif}\n{error}")
+
+    try:
+        if workers is None or workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(boundary, cache_dir, profiler.enabled, True)) as pool:
+                futures = {pool.submit(_clip_job, input_tif, output_tif, True): input_tif
+                           for input_tif, output_tif in jobs}
+                for i, future in enumerate(as_completed(futures), start=1):
+                    report(i, futures[future], future.result())
+        else:
+            _init_worker(boundary, cache_dir, profiler.enabled)
+            for i, (input_tif, output_tif) in enumerate(jobs, start=1):
                 print(f"Processing: {input_tif}")
-                clip_raster_to_shape(input_tif, output_tif, shapefile)
+                report(i, input_tif, _clip_job(input_tif, output_tif))
+    finally:
+        # Record whatever finished, even if the run was interrupted
+        if incremental:
+            save_manifest(output_root, manifest)
+
+    elapsed = time.perf_counter() - start
+    cache = {name: sum(stats[name] - (cache_start[name] if pid == os.getpid() else 0)
+                       for pid, stats in cache_stats.items())
+             for name in ("hits", "misses", "disk_hits")}
+    summary = {
+        "files": total,
+        "skipped": skipped,
+        "pruned": pruned,
+        "failed": failed,
+        "seconds": elapsed,
+        "files_per_second": total / elapsed if elapsed else 0.0,
+        "mb_per_second": total_bytes / 1e6 / elapsed if elapsed else 0.0,
+        "cache": cache,
+    }
+    print(f"Clipped {total - len(failed)}/{total} rasters in {elapsed:.1f} s "
+          f"({summary['files_per_second']:.2f} files/s, {summary['mb_per_second']:.2f} MB/s)")
+    print(f"Reprojection cache: {cache['hits']} hits, {cache['misses']} misses "
+          f"({cache['disk_hits']} loaded from disk)")
+    if failed:
+        print(f"{len(failed)} raster(s) failed: {list(failed)}")
+    return summary
 
 # === CONFIGURE THESE ===
 input_directory = r"D:\Module11\PySEBAL_data\SEBAL_out"
 output_directory = r"D:\Module11\PySEBAL_data\SEBAL_out_clipped"
 shapefile_path = r"D:\Module11\PySEBAL_data\mississippi.shp"
+worker_count = os.cpu_count()
+incremental = True  # Only clip new or changed rasters
 
 # === RUN ===
-process_directory(input_directory, output_directory, shapefile_path)
+if __name__ == "__main__":
+    process_directory(input_directory, output_directory, shapefile_path,
+                      workers=worker_count, incremental=incremental)
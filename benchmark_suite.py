@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import math
+import time
+import zipfile
+import argparse
+import platform
+import tempfile
+import numpy as np
+import geopandas as gpd
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+
+from automated_geospatial_mosaicking import mosaic_tiles
+from batch_raster_clip import clip_raster_to_shape
+from dissolving_shapefiles import dissolve_layers
+from instrumentation import profiler, stage
+from kmz_to_utm_shapefiles import kmz_to_category_shapefiles
+from raster_blocks import iter_windows, tiled_profile
+from raster_unique_pixel_counter import get_pixel_value_counts
+from vector_io import write_vector
+
+# Synthetic data sizes: raster side in pixels, tile grid and tile side,
+# KMZ placemarks and polygons (with vertices per polygon)
+SIZES = {
+    "small": {"raster_size": 1024, "bands": 4, "tiles": 2, "tile_size": 512,
+              "kmz_features": 2000, "polygons": 2000, "vertices": 32},
+    "medium": {"raster_size": 4096, "bands": 4, "tiles": 4, "tile_size": 1024,
+               "kmz_features": 50000, "polygons": 50000, "vertices": 32},
+    "large": {"raster_size": 16384, "bands": 4, "tiles": 8, "tile_size": 2048,
+              "kmz_features": 500000, "polygons": 500000, "vertices": 64},
+}
+
+WORKFLOWS = ("clip", "mosaic", "pixel_counts", "kmz", "dissolve")
+
+# Synthetic scenes are Landsat-like 30 m pixels in UTM 39N
+CRS = "EPSG:32639"
+PIXEL_SIZE = 30.0
+ORIGIN = (400000.0, 3300000.0)
+
+# Stages more than this much slower than the baseline are flagged, unless
+# they take under MIN_SECONDS, where timer noise dominates
+REGRESSION_THRESHOLD = 1.10
+MIN_SECONDS = 0.05
+
+
+def _patches(rng, shape, low, high, patch=8):
+    """Random integers in patch x patch blocks, so rasters compress like real ones."""
+    coarse = rng.integers(low, high, (math.ceil(shape[0] / patch), math.ceil(shape[1] / patch)))
+    return np.kron(coarse, np.ones((patch, patch), dtype=coarse.dtype))[:shape[0], :shape[1]]
+
+
+def make_raster(path, width, height, count=1, dtype="uint8", value_range=(0, 10), nodata=None,
+                origin=ORIGIN, crs=CRS, seed=0):
+    """
+    Writes a tiled GeoTIFF of random patchy values in value_range, one window at
+    a time, so rasters larger than memory can be generated.
+    """
+    profile = tiled_profile({"width": width, "height": height, "count": count, "dtype": dtype,
+                             "crs": crs, "nodata": nodata,
+                             "transform": from_origin(origin[0], origin[1], PIXEL_SIZE, PIXEL_SIZE)},
+                            block_size=512)
+    with rasterio.open(path, "w", **profile) as dst:
+        for i, window in enumerate(iter_windows(dst)):
+            rng = np.random.default_rng((seed, i))
+            shape = (int(window.height), int(window.width))
+            block = np.stack([_patches(rng, shape, *value_range) for _ in range(count)])
+            dst.write(block.astype(dtype), window=window)
+    return path
+
+
+def make_tiles(tiles_dir, grid, tile_size, bands=4, overlap=16, seed=0):
+    """grid x grid overlapping uint16 reflectance tiles covering one scene."""
+    os.makedirs(tiles_dir, exist_ok=True)
+    paths = []
+    step = (tile_size - overlap) * PIXEL_SIZE
+    for row in range(grid):
+        for col in range(grid):
+            origin = (ORIGIN[0] + col * step, ORIGIN[1] - row * step)
+            path = os.path.join(tiles_dir, f"tile_{row:02d}_{col:02d}.tif")
+            paths.append(make_raster(path, tile_size, tile_size, bands, "uint16", (1, 10000),
+                                     nodata=0, origin=origin, seed=(seed, row, col)))
+    return paths
+
+
+def scene_bounds(size):
+    """UTM bounds of a size x size pixel scene at ORIGIN."""
+    return ORIGIN[0], ORIGIN[1] - size * PIXEL_SIZE, ORIGIN[0] + size * PIXEL_SIZE, ORIGIN[1]
+
+
+def make_boundary(path, bounds, crs="EPSG:4326", vertices=256):
+    """
+    Writes a round boundary covering the middle of UTM bounds, in crs, so that
+    clipping also has to reproject it.
+    """
+    minx, miny, maxx, maxy = bounds
+    circle = shapely.Point((minx + maxx) / 2, (miny + maxy) / 2).buffer(
+        0.4 * min(maxx - minx, maxy - miny), quad_segs=vertices // 4)
+    write_vector(gpd.GeoDataFrame({"id": [1]}, geometry=[circle], crs=CRS).to_crs(crs), path)
+    return path
+
+
+def random_polygons(n, bounds, vertices=32, radius=None, invalid_fraction=0.0, seed=0):
+    """
+    n random star-shaped polygons inside bounds. A fraction of them get two
+    vertices swapped, making self-intersecting rings that need repair.
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bounds
+    if radius is None:
+        # About two polygons overlap each point of the extent
+        radius = math.sqrt(2 * (maxx - minx) * (maxy - miny) / (n * math.pi))
+    centers = rng.uniform((minx, miny), (maxx, maxy), (n, 2))
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = radius * rng.uniform(0.5, 1.0, (n, 1)) * rng.uniform(0.7, 1.0, (n, vertices))
+    coords = np.stack([centers[:, :1] + radii * np.cos(angles),
+                       centers[:, 1:] + radii * np.sin(angles)], axis=-1)
+
+    invalid = rng.random(n) < invalid_fraction
+    coords[invalid, 1], coords[invalid, 2] = coords[invalid, 2].copy(), coords[invalid, 1].copy()
+    return shapely.polygons(np.concatenate([coords, coords[:, :1]], axis=1))
+
+
+def make_polygons(path, n, bounds, vertices=32, invalid_fraction=0.01, crs="EPSG:4326", seed=0):
+    """Writes n random polygons (see random_polygons) inside UTM bounds, saved in crs."""
+    geometries = random_polygons(n, bounds, vertices, invalid_fraction=invalid_fraction, seed=seed)
+    rng = np.random.default_rng(seed)
+    gdf = gpd.GeoDataFrame({"id": np.arange(n), "class": rng.integers(0, 5, n)}, geometry=geometries, crs=CRS)
+    if crs != CRS:
+        gdf = gdf.to_crs(crs)
+    write_vector(gdf, path)
+    return path
+
+
+def make_kmz(path, n_features, bounds, folders=4, vertices=16, seed=0):
+    """
+    Writes a KMZ of n_features polygon placemarks spread over folders. The KML is
+    streamed into the archive in chunks, so large files need little memory.
+    """
+    gdf = gpd.GeoDataFrame(geometry=random_polygons(n_features, bounds, vertices, seed=seed), crs=CRS)
+    lonlat = gdf.to_crs("EPSG:4326").geometry.values
+    folder_of = np.arange(n_features) % folders
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open("doc.kml", "w") as kml:
+            kml.write(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                      b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n')
+            for folder in range(folders):
+                kml.write(f"<Folder><name>Class {folder}</name>\n".encode())
+                chunk = []
+                for i in np.flatnonzero(folder_of == folder):
+                    ring = " ".join(f"{x:.7f},{y:.7f},0" for x, y in shapely.get_coordinates(lonlat[i]))
+                    chunk.append(f"<Placemark><name>Feature {i}</name><description>synthetic</description>"
+                                 f"<Polygon><outerBoundaryIs><LinearRing><coordinates>{ring}</coordinates>"
+                                 f"</LinearRing></outerBoundaryIs></Polygon></Placemark>\n")
+                    if len(chunk) >= 1000:
+                        kml.write("".join(chunk).encode())
+                        chunk = []
+                kml.write(("".join(chunk) + "</Folder>\n").encode())
+            kml.write(b"</Document></kml>\n")
+    return path
+
+
+def generate_data(work_dir, config, seed=0):
+    """
+    Generates the synthetic inputs for config in work_dir and returns their paths.
+    Files that already exist are reused, so one data set can serve many runs;
+    run_suite keeps one work_dir per configuration.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    bounds = scene_bounds(config["raster_size"])
+    paths = {
+        "scene": os.path.join(work_dir, "scene.tif"),
+        "classes": os.path.join(work_dir, "classes.tif"),
+        "tiles_dir": os.path.join(work_dir, "tiles"),
+        "boundary": os.path.join(work_dir, "boundary.shp"),
+        "kmz": os.path.join(work_dir, "features.kmz"),
+        "polygons": os.path.join(work_dir, "polygons.shp"),
+    }
+    size = config["raster_size"]
+    mosaic_size = config["tiles"] * config["tile_size"]
+
+    if not os.path.exists(paths["scene"]):
+        make_raster(paths["scene"], size, size, config["bands"], "uint16", (1, 10000), nodata=0, seed=seed)
+    if not os.path.exists(paths["classes"]):
+        make_raster(paths["classes"], size, size, 1, "uint8", (1, 10), nodata=0, seed=seed + 1)
+    if not os.path.isdir(paths["tiles_dir"]):
+        make_tiles(paths["tiles_dir"], config["tiles"], config["tile_size"], config["bands"], seed=seed)
+    if not os.path.exists(paths["boundary"]):
+        make_boundary(paths["boundary"], scene_bounds(max(size, mosaic_size)))
+    if not os.path.exists(paths["kmz"]):
+        make_kmz(paths["kmz"], config["kmz_features"], bounds, seed=seed)
+    if not os.path.exists(paths["polygons"]):
+        make_polygons(paths["polygons"], config["polygons"], bounds, config["vertices"], seed=seed)
+    return paths
+
+
+def run_suite(work_dir, size="small", workflows=WORKFLOWS, workers=1, seed=0, **overrides):
+    """
+    Runs the workflows on synthetic data under the shared profiler and returns a
+    report with the configuration, environment and per-stage results.
+    overrides replace entries of the SIZES preset (e.g. polygons=10000).
+    """
+    config = dict(SIZES[size], **overrides)
+    start = time.perf_counter()
+    data_dir = os.path.join(work_dir, "data_" + "_".join(str(value) for value in config.values()) + f"_{seed}")
+    paths = generate_data(data_dir, config, seed)
+    print(f"Synthetic data ready in {time.perf_counter() - start:.1f} s: {config}")
+
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir, exist_ok=True)
+    profiler.reset()
+    was_enabled, profiler.enabled = profiler.enabled, True
+    try:
+        for workflow in workflows:
+            print(f"--- {workflow} ---")
+            with stage(f"bench.{workflow}"):
+                if workflow == "clip":
+                    clip_raster_to_shape(paths["scene"], os.path.join(out_dir, "scene_clipped.tif"),
+                                         paths["boundary"])
+                elif workflow == "mosaic":
+                    mosaic_tiles(paths["boundary"], paths["tiles_dir"], os.path.join(out_dir, "mosaic.tif"))
+                elif workflow == "pixel_counts":
+                    get_pixel_value_counts(paths["classes"], workers=workers)
+                elif workflow == "kmz":
+                    kmz_to_category_shapefiles(paths["kmz"], os.path.join(out_dir, "kmz"), 2000)
+                elif workflow == "dissolve":
+                    dissolve_layers([paths["polygons"]], os.path.join(out_dir, "dissolved.shp"), workers=workers)
+                else:
+                    raise ValueError(f"Unknown workflow {workflow!r}; choose from {WORKFLOWS}")
+    finally:
+        profiler.enabled = was_enabled
+
+    return {
+        "size": size,
+        "config": config,
+        "workers": workers,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "gdal": rasterio.__gdal_version__,
+                        "rasterio": rasterio.__version__, "shapely": shapely.__version__,
+                        "numpy": np.__version__},
+        **profiler.to_json(),
+    }
+
+
+def compare_reports(baseline, current, threshold=REGRESSION_THRESHOLD, min_seconds=MIN_SECONDS):
+    """
+    Prints the wall time of every stage in both reports and the speedup
+    (baseline / current); stages slower than threshold x baseline (and longer
+    than min_seconds) are flagged. Returns the names of the regressed stages.
+    """
+    regressions = []
+    header = f"{'stage':<28}{'baseline s':>12}{'current s':>12}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, s in current["summary"].items():
+        before = baseline["summary"].get(name)
+        if before is None:
+            print(f"{name[:27]:<28}{'-':>12}{s['wall_s']:>12.3f}{'new':>9}")
+            continue
+        speedup = before["wall_s"] / s["wall_s"] if s["wall_s"] else float("inf")
+        flag = ""
+        if s["wall_s"] > max(before["wall_s"] * threshold, min_seconds):
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name[:27]:<28}{before['wall_s']:>12.3f}{s['wall_s']:>12.3f}{speedup:>8.2f}x{flag}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the workflows on synthetic data.")
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--workflows", nargs="+", choices=WORKFLOWS, default=list(WORKFLOWS))
+    parser.add_argument("--work-dir", help="Keep data and outputs here (data is reused by later runs)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--trace", help="Write a Chrome trace of the stages")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against an earlier JSON report")
+    for key in ("raster_size", "bands", "tiles", "tile_size", "kmz_features", "polygons", "vertices"):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, help=f"Override the preset's {key}")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    overrides = {key: value for key, value in vars(args).items() if key in SIZES["small"] and value is not None}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run_suite(args.work_dir or tmp, args.size, args.workflows, args.workers, **overrides)
+        if args.trace:
+            profiler.to_trace(args.trace)
+
+    print()
+    profiler.print_summary()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=float)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        return 1 if compare_reports(baseline, report) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_suite.py --size small --output baseline.json
+    #        python benchmark_suite.py --size small --compare baseline.json
+    sys.exit(main())
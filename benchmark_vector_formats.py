@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import tempfile
+
+from vector_io import iter_vector_batches, read_vector, read_vector_info, write_vector
+
+# Formats compared against the reference layers
+FORMATS = (".shp", ".gpkg", ".fgb", ".parquet")
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def benchmark_layer(path, work_dir, columns=None, bbox_fraction=0.1, batch_size=65536):
+    """
+    Converts one reference layer to each format and times write, full read,
+    column-only read (no geometry), bbox read and batched streaming read.
+    Returns one result dictionary per format.
+    """
+    gdf = read_vector(path)
+    if columns is None:
+        columns = [col for col in gdf.columns if col != gdf.geometry.name][:1]
+
+    minx, miny, maxx, maxy = gdf.total_bounds
+    dx, dy = (maxx - minx) * bbox_fraction ** 0.5, (maxy - miny) * bbox_fraction ** 0.5
+    cx, cy = (minx + maxx) / 2, (miny + maxy) / 2
+    bbox = (cx - dx / 2, cy - dy / 2, cx + dx / 2, cy + dy / 2)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    results = []
+    for ext in FORMATS:
+        # One directory per format, so its size counts only its own files
+        format_dir = os.path.join(work_dir, f"{name}_{ext[1:]}")
+        os.makedirs(format_dir, exist_ok=True)
+        out_path = os.path.join(format_dir, f"{name}{ext}")
+        write_s, _ = _timed(write_vector, gdf, out_path)
+        read_s, _ = _timed(read_vector, out_path)
+        columns_s, _ = _timed(read_vector, out_path, columns=columns, read_geometry=False)
+        bbox_s, subset = _timed(read_vector, out_path, bbox=bbox)
+        stream_s, _ = _timed(lambda: sum(len(batch) for batch in iter_vector_batches(out_path, batch_size)))
+
+        size = sum(os.path.getsize(os.path.join(format_dir, f)) for f in os.listdir(format_dir))
+        results.append({
+            "layer": name,
+            "format": ext,
+            "features": read_vector_info(out_path)["features"],
+            "size_mb": size / 1e6,
+            "write_s": write_s,
+            "read_s": read_s,
+            "columns_s": columns_s,
+            "bbox_s": bbox_s,
+            "bbox_features": len(subset),
+            "stream_s": stream_s,
+        })
+    return results
+
+
+def print_results(results):
+    header = f"{'layer':<24}{'format':<10}{'features':>10}{'MB':>9}{'write':>9}{'read':>9}" \
+             f"{'columns':>9}{'bbox':>9}{'stream':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['layer'][:23]:<24}{r['format']:<10}{r['features']:>10}{r['size_mb']:>9.2f}"
+              f"{r['write_s']:>9.3f}{r['read_s']:>9.3f}{r['columns_s']:>9.3f}{r['bbox_s']:>9.3f}"
+              f"{r['stream_s']:>9.3f}")
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_vector_formats.py layer1.shp [layer2.shp ...]
+    reference_layers = sys.argv[1:] or [r"...\reference_2000_bu.shp", r"...\reference_2000_nbu.shp"]
+
+    all_results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for layer_path in reference_layers:
+            all_results.extend(benchmark_layer(layer_path, work_dir))
+    print_results(all_results)
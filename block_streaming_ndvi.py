@@ -0,0 +1,79 @@
+import numpy as np
+import rasterio
+
+from raster_blocks import iter_windows, tiled_profile
+from spectral_indices import SENSORS
+
+# NIR / Red band keys for each sensor returned by detect_sensor
+NDVI_BANDS = {
+    sensor: (spec["roles"]["nir"], spec["roles"]["red"])
+    for sensor, spec in SENSORS.items()
+    if "nir" in spec["roles"] and "red" in spec["roles"]
+}
+
+
+def ndvi_block(nir, red, min_reflectance=0.05, nodata=None):
+    """
+    Computes NDVI for one block of float32 NIR / Red values.
+    Pixels below min_reflectance or equal to nodata are returned as NaN.
+    """
+    valid = np.isfinite(nir) & np.isfinite(red)
+    if min_reflectance is not None:
+        valid &= (nir > min_reflectance) & (red > min_reflectance)
+    if nodata is not None:
+        nodata = np.float32(nodata)
+        valid &= (nir != nodata) & (red != nodata)
+
+    ndvi = np.full(nir.shape, np.nan, dtype="float32")
+    np.subtract(nir, red, out=ndvi, where=valid)
+    denom = np.add(nir, red, dtype="float32")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(ndvi, denom, out=ndvi, where=valid)
+    ndvi[np.isinf(ndvi)] = np.nan
+    return ndvi
+
+
+def windowed_ndvi(input_path, output_path, nir_band, red_band, min_reflectance=0.05,
+                  block_size=None, compress="lzw"):
+    """
+    Writes NDVI to a tiled float32 GeoTIFF, one raster block at a time.
+    Only the NIR and Red bands (1-based indices) are read, so memory use depends
+    on the block size rather than the scene size.
+    Returns the min, max and mean NDVI and the number of valid pixels.
+    """
+    count = 0
+    total = 0.0
+    ndvi_min = np.inf
+    ndvi_max = -np.inf
+
+    with rasterio.open(input_path) as src:
+        nodata = src.nodata
+        profile = tiled_profile(src.profile, compress=compress,
+                                count=1, dtype="float32", nodata=np.nan)
+
+        with rasterio.open(output_path, "w", **profile) as dst:
+            for window in iter_windows(src, block_size, band=nir_band):
+                nir = src.read(nir_band, window=window, out_dtype="float32")
+                red = src.read(red_band, window=window, out_dtype="float32")
+                ndvi = ndvi_block(nir, red, min_reflectance, nodata)
+                dst.write(ndvi, 1, window=window)
+
+                finite = ndvi[np.isfinite(ndvi)]
+                if finite.size:
+                    count += finite.size
+                    total += float(finite.sum(dtype="float64"))
+                    ndvi_min = min(ndvi_min, float(finite.min()))
+                    ndvi_max = max(ndvi_max, float(finite.max()))
+
+    if not count:
+        return {"min": np.nan, "max": np.nan, "mean": np.nan, "valid_pixels": 0}
+    return {"min": ndvi_min, "max": ndvi_max, "mean": total / count, "valid_pixels": count}
+
+
+if __name__ == "__main__":
+    input_path = r"...\L8_composite_2020.tif"
+    output_path = r"...\L8_composite_2020_ndvi.tif"
+
+    stats = windowed_ndvi(input_path, output_path, nir_band=5, red_band=4)
+    print(f"NDVI saved: {output_path}")
+    print(f"NDVI min: {stats['min']}, max: {stats['max']}, mean: {stats['mean']}")
@@ -1,36 +1,102 @@
+import os
 import geopandas as gpd
 import pandas as pd
+import shapely
+from concurrent.futures import ProcessPoolExecutor
 
-# Read shapefiles
-gdf1 = gpd.read_file(r"...\reference_2000_bu.shp")
-gdf2 = gpd.read_file(r"...\reference_2000_nbu.shp")
+from instrumentation import stage
+from vector_io import read_vector, write_vector
 
-# Combine
-combined = pd.concat([gdf1, gdf2], ignore_index=True)
 
-# --- FIX GEOMETRY ERRORS ---
-# Force valid geometries by buffer(0)
-combined["geometry"] = combined["geometry"].buffer(0)
+def repair_invalid(geometries):
+    """buffer(0) only the geometries that are invalid; valid ones are left as is."""
+    geometries = geometries.copy()
+    invalid = ~geometries.is_valid & geometries.notna()
+    if invalid.any():
+        print(f"Repairing {int(invalid.sum())} invalid geometries")
+        geometries[invalid] = geometries[invalid].buffer(0)
+    return geometries
 
-# Add dissolve key
-combined["id"] = 1
 
-# Dissolve
-dissolved = combined.dissolve(by="id")
+def _union(geometries):
+    return shapely.union_all(geometries)
 
-# Reproject to UTM Zone 39N (for accurate area calculation)
-dissolved_utm = dissolved.to_crs(epsg=32639)
 
-# Calculate area
-dissolved_utm["area_sqm"] = dissolved_utm.geometry.area
-dissolved_utm["area_sqkm"] = dissolved_utm["area_sqm"] / 1e6
+def parallel_union(geometries, workers=None, partitions_per_worker=4):
+    """
+    Unions a GeoSeries into one geometry using several processes.
+    Geometries are ordered along a Hilbert curve so each partition is spatially
+    compact, every partition is unioned in a worker, and the partial results are
+    then merged pairwise, level by level, until one geometry is left.
+    """
+    geometries = geometries[geometries.notna() & ~geometries.is_empty]
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(geometries) < 2 * workers:
+        return shapely.union_all(geometries.values)
 
-# Keep only geometry + area
-fields_to_keep = ["geometry", "area_sqm", "area_sqkm"]
-dissolved_cleaned = dissolved_utm[fields_to_keep]
+    ordered = geometries.iloc[geometries.hilbert_distance().argsort()].values
+    n_parts = min(len(ordered), workers * partitions_per_worker)
+    bounds = [len(ordered) * i // n_parts for i in range(n_parts + 1)]
+    parts = [ordered[bounds[i]:bounds[i + 1]] for i in range(n_parts)]
 
-# Save result
-out_path = r"...\dissolved_reference.shp"
-dissolved_cleaned.to_file(out_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(_union, parts))
+        # Neighbouring partials share edges, so merge them pairwise
+        while len(partials) > 1:
+            pairs = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = list(pool.map(_union, pairs))
+    return partials[0]
 
-print("✅ Dissolved shapefile saved:", out_path)
+
+def dissolve_layers(input_paths, out_path, workers=None, utm_epsg=32639):
+    """
+    Dissolves every polygon of the input layers into one feature and saves it
+    in UTM with its area in square metres and square kilometres.
+    """
+    # Read input layers (any format vector_io supports)
+    with stage("dissolve.read") as record:
+        gdfs = [read_vector(path) for path in input_paths]
+        record["features"] = sum(len(gdf) for gdf in gdfs)
+
+    # Combine
+    combined = pd.concat(gdfs, ignore_index=True)
+    crs = gdfs[0].crs
+
+    # --- FIX GEOMETRY ERRORS ---
+    # Only invalid geometries are repaired with buffer(0)
+    with stage("dissolve.repair", features=len(combined)):
+        geometries = repair_invalid(gpd.GeoSeries(combined["geometry"], crs=crs))
+
+    # Dissolve
+    with stage("dissolve.union", features=len(geometries)):
+        dissolved = gpd.GeoDataFrame(
+            {"geometry": [parallel_union(geometries, workers)]},
+            index=pd.Index([1], name="id"),
+            crs=crs,
+        )
+
+    # Reproject to UTM Zone 39N (for accurate area calculation)
+    with stage("dissolve.reproject", features=1):
+        dissolved_utm = dissolved.to_crs(epsg=utm_epsg)
+
+    # Calculate area
+    dissolved_utm["area_sqm"] = dissolved_utm.geometry.area
+    dissolved_utm["area_sqkm"] = dissolved_utm["area_sqm"] / 1e6
+
+    # Keep only geometry + area
+    fields_to_keep = ["geometry", "area_sqm", "area_sqkm"]
+    dissolved_cleaned = dissolved_utm[fields_to_keep]
+
+    # Save result
+    with stage("dissolve.write", features=1):
+        write_vector(dissolved_cleaned, out_path)
+    return dissolved_cleaned
+
+
+if __name__ == "__main__":
+    input_paths = [r"...\reference_2000_bu.shp", r"...\reference_2000_nbu.shp"]
+    out_path = r"...\dissolved_reference.shp"
+
+    dissolve_layers(input_paths, out_path)
+
+    print("✅ Dissolved shapefile saved:", out_path)
@@ -1,26 +1,72 @@
-import geopandas as gpd
-
-# Path to your shapefile
-shapefile_path = r"...\county.shp"
-
-# Read shapefile
-gdf = gpd.read_file(shapefile_path)
-
-# Get bounds in original CRS
-min_x, min_y, max_x, max_y = gdf.total_bounds
-print(f"Original CRS: {gdf.crs}")
-print(f"Projected bounds:")
-print(f"  Min X = {min_x}, Max X = {max_x}")
-print(f"  Min Y = {min_y}, Max Y = {max_y}")
-
-# Reproject to WGS84 (EPSG:4326) if not already
-if gdf.crs.to_string() != "EPSG:4326":
-    gdf_wgs84 = gdf.to_crs(epsg=4326)
-else:
-    gdf_wgs84 = gdf.copy()
-
-# Get bounds in geographic coordinates (lat/lon)
-min_lon, min_lat, max_lon, max_lat = gdf_wgs84.total_bounds
-print(f"\nGeographic coordinates (EPSG:4326) bounds:")
-print(f"  Longitude: Min = {min_lon}, Max = {max_lon}")
-print(f"  Latitude:  Min = {min_lat}, Max = {max_lat}")
+import os
+import numpy as np
+import rasterio
+import shapely
+from concurrent.futures import ThreadPoolExecutor
+from rasterio.warp import transform_bounds
+
+from vector_io import iter_vector_batches, read_vector_info
+
+RASTER_EXTENSIONS = (".tif", ".tiff", ".vrt", ".img")
+VECTOR_EXTENSIONS = (".shp", ".gpkg", ".fgb", ".geojson", ".parquet")
+
+
+def _streamed_bounds(path, batch_size=65536):
+    """Bounds from the geometries alone; no attribute columns are read."""
+    bounds = np.array([np.inf, np.inf, -np.inf, -np.inf])
+    for batch in iter_vector_batches(path, batch_size, columns=[]):
+        part = shapely.bounds(batch.geometry.values)
+        bounds[:2] = np.fmin(bounds[:2], np.nanmin(part[:, :2], axis=0))
+        bounds[2:] = np.fmax(bounds[2:], np.nanmax(part[:, 2:], axis=0))
+    return tuple(bounds.tolist())
+
+
+def get_bounds(path, densify_pts=21):
+    """
+    Returns the native bounds, CRS and EPSG:4326 bounds of a raster or vector layer.
+    Raster bounds and vector extents stored in the file header are used when
+    present; otherwise only the geometries are streamed. Geographic bounds come
+    from transforming the densified bounding box edges, not every feature, so
+    they always enclose the layer but can be slightly larger than its true extent.
+    """
+    if path.lower().endswith(RASTER_EXTENSIONS):
+        with rasterio.open(path) as src:
+            bounds, crs = tuple(src.bounds), src.crs
+    else:
+        info = read_vector_info(path)
+        crs = info["crs"]
+        bounds = info["total_bounds"] or _streamed_bounds(path)
+
+    geographic = None
+    if crs is not None:
+        geographic = transform_bounds(crs, "EPSG:4326", *bounds, densify_pts=densify_pts)
+    return {"path": path, "crs": str(crs) if crs is not None else None,
+            "bounds": bounds, "bounds_4326": geographic}
+
+
+def get_directory_bounds(directory, workers=8):
+    """Runs get_bounds on every raster and vector layer in a directory in parallel."""
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith(RASTER_EXTENSIONS + VECTOR_EXTENSIONS))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(get_bounds, paths))
+
+
+if __name__ == "__main__":
+    # Path to your shapefile
+    shapefile_path = r"...\county.shp"
+
+    result = get_bounds(shapefile_path)
+
+    # Get bounds in original CRS
+    min_x, min_y, max_x, max_y = result["bounds"]
+    print(f"Original CRS: {result['crs']}")
+    print("Projected bounds:")
+    print(f"  Min X = {min_x}, Max X = {max_x}")
+    print(f"  Min Y = {min_y}, Max Y = {max_y}")
+
+    # Get bounds in geographic coordinates (lat/lon)
+    min_lon, min_lat, max_lon, max_lat = result["bounds_4326"]
+    print("\nGeographic coordinates (EPSG:4326) bounds:")
+    print(f"  Longitude: Min = {min_lon}, Max = {max_lon}")
+    print(f"  Latitude:  Min = {min_lat}, Max = {max_lat}")
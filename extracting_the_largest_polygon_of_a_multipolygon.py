@@ -1,15 +1,56 @@
-wfrom shapely.geometry import Polygon, MultiPolygon
-import geopandas as gpd
+import numpy as np
+import shapely
 
-# Load shapefile (may contain MultiPolygon)
-gdf = gpd.read_file("shapefile.shp")
+from vector_io import read_vector, write_vector
 
-# Extract the largest polygon if it's a MultiPolygon
-if gdf.geometry.iloc[0].geom_type == 'MultiPolygon':
-    # Get all individual polygons and pick the largest one
-    polygons = list(gdf.geometry.iloc[0].geoms)  # Extract polygons from MultiPolygon
-    largest_polygon = max(polygons, key=lambda p: p.area)  # Pick largest
-    gdf.geometry = gpd.GeoSeries([largest_polygon])  # Replace geometry
 
-# Save as new shapefile (single polygon)
-gdf.to_file("single_polygon.shp")
+def largest_parts(gdf, top_n=1, min_area=None):
+    """
+    Keeps the largest part of every feature (or its top_n largest parts as a
+    MultiPolygon), with all attributes intact.
+    All MultiPolygons are exploded at once and part areas are computed in one
+    vectorized call; parts are then ranked within each feature by sorting on
+    (feature, -area). Parts smaller than min_area are dropped, and features left
+    without any part are removed from the output.
+    """
+    parts, feature = shapely.get_parts(gdf.geometry.values, return_index=True)
+    areas = shapely.area(parts)
+
+    if min_area is not None:
+        keep = areas >= min_area
+        parts, feature, areas = parts[keep], feature[keep], areas[keep]
+
+    # Sort by feature, largest part first, and number the parts within each feature
+    order = np.lexsort((-areas, feature))
+    parts, feature = parts[order], feature[order]
+    group_start = np.flatnonzero(np.r_[True, feature[1:] != feature[:-1]])
+    rank = np.arange(len(feature)) - np.repeat(group_start, np.diff(np.r_[group_start, len(feature)]))
+
+    selected = rank < top_n
+    parts, feature = parts[selected], feature[selected]
+    features = np.unique(feature)
+
+    if top_n == 1:
+        geometries = parts
+    else:
+        # Renumber so the features with parts left are 0..n-1
+        geometries = shapely.multipolygons(parts, indices=np.searchsorted(features, feature))
+
+    dropped = len(gdf) - len(features)
+    if dropped:
+        print(f"{dropped} features have no part left and were dropped")
+
+    out = gdf.iloc[features].copy()
+    out.geometry = geometries
+    return out
+
+
+if __name__ == "__main__":
+    # Load shapefile (may contain MultiPolygon)
+    gdf = read_vector("shapefile.shp")
+
+    # Keep the largest polygon of every feature
+    gdf = largest_parts(gdf)
+
+    # Save as new shapefile (single polygons)
+    write_vector(gdf, "single_polygon.shp")
@@ -0,0 +1,82 @@
+import pandas as pd
+import pyogrio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from vector_io import iter_vector_batches
+
+
+def _new_profile():
+    return {"rows": 0, "nulls": 0, "counts": Counter(), "truncated": False}
+
+
+def _add_batch(profile, values, max_unique):
+    """Adds one chunk of a column to a running profile."""
+    profile["rows"] += len(values)
+    profile["nulls"] += int(values.isna().sum())
+    if profile["truncated"]:
+        return
+    profile["counts"].update(values.value_counts(dropna=True).to_dict())
+    if max_unique is not None and len(profile["counts"]) > max_unique:
+        # Too many distinct values (e.g. an ID field): keep only rows and nulls
+        profile["counts"] = Counter()
+        profile["truncated"] = True
+
+
+def profile_fields(path, fields, layer=None, batch_size=500_000, max_unique=1_000_000):
+    """
+    Profiles attribute fields of one layer without reading geometries.
+    Only the requested columns are read, in chunks of batch_size rows, and
+    counts are accumulated chunk by chunk. Returns {field: profile} where a
+    profile holds rows, nulls, cardinality and value counts. Fields with more
+    than max_unique distinct values stop counting values and report
+    cardinality None.
+    """
+    if isinstance(fields, str):
+        fields = [fields]
+    profiles = {field: _new_profile() for field in fields}
+    for batch in iter_vector_batches(path, batch_size, columns=fields, layer=layer, read_geometry=False):
+        for field in fields:
+            _add_batch(profiles[field], batch[field], max_unique)
+
+    for profile in profiles.values():
+        profile["cardinality"] = None if profile["truncated"] else len(profile["counts"])
+        profile["value_counts"] = pd.Series(dict(profile.pop("counts").most_common()), dtype="int64")
+    return profiles
+
+
+def profile_layers(layers, fields, workers=4, **kwargs):
+    """
+    Runs profile_fields on several layers concurrently.
+    layers is a list of paths or (path, layer) pairs, e.g. every feature class
+    of a geodatabase from gdb_layers(). Returns {(path, layer): {field: profile}}.
+    """
+    jobs = [item if isinstance(item, tuple) else (item, None) for item in layers]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {job: pool.submit(profile_fields, job[0], fields, job[1], **kwargs) for job in jobs}
+        return {job: future.result() for job, future in futures.items()}
+
+
+def gdb_layers(gdb_path, field=None):
+    """(path, layer) pairs for the feature classes of a geodatabase, optionally only those with field."""
+    layers = [name for name, _ in pyogrio.list_layers(gdb_path)]
+    if field is not None:
+        layers = [name for name in layers if field in pyogrio.read_info(gdb_path, layer=name)["fields"]]
+    return [(gdb_path, name) for name in layers]
+
+
+def print_profile(field, profile, top=None):
+    unique = f"{profile['cardinality']} unique values" if profile["cardinality"] is not None \
+        else "too many unique values to count"
+    print(f"Field '{field}': {profile['rows']} rows, {profile['nulls']} nulls, {unique}")
+    if profile["cardinality"] is not None:
+        counts = profile["value_counts"]
+        print(counts if top is None else counts.head(top))
+
+
+if __name__ == "__main__":
+    shapefile_path = "path/to/your/shapefile.shp"
+    field_name = "your_field_name"
+
+    profiles = profile_fields(shapefile_path, field_name)
+    print_profile(field_name, profiles[field_name])
@@ -0,0 +1,162 @@
+import os
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+
+from vector_io import read_vector, write_vector
+
+
+def _crs_key(crs):
+    return CRS.from_user_input(crs).to_wkt() if crs is not None else None
+
+
+@lru_cache(maxsize=64)
+def _transformer(src_wkt, dst_wkt):
+    return Transformer.from_crs(CRS.from_wkt(src_wkt), CRS.from_wkt(dst_wkt), always_xy=True)
+
+
+def get_transformer(src_crs, dst_crs):
+    """Returns a pyproj Transformer (x/y axis order), built once per CRS pair."""
+    return _transformer(_crs_key(src_crs), _crs_key(dst_crs))
+
+
+def reproject_geometries(geometries, src_crs, dst_crs):
+    """Reprojects a geometry array with a cached Transformer."""
+    transformer = get_transformer(src_crs, dst_crs)
+    return shapely.transform(geometries, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])))
+
+
+def geometry_hash(gdf):
+    """SHA-256 of a GeoDataFrame's CRS and geometries (WKB)."""
+    digest = hashlib.sha256()
+    digest.update(str(gdf.crs).encode())
+    for wkb in shapely.to_wkb(gdf.geometry.values):
+        digest.update(wkb if wkb is not None else b"")
+    return digest.hexdigest()
+
+
+class ReprojectionCache:
+    """
+    LRU cache of boundaries reprojected to raster CRSs.
+    Entries are keyed by (geometry hash, target CRS) and hold the reprojected
+    GeoDataFrame plus lazily built GeoJSON-like shapes and a prepared union
+    for fast intersection tests. With cache_dir set, reprojected layers are also
+    stored as GeoParquet and reused by later runs and other processes.
+    hits/misses count memory lookups; disk_hits counts misses served from disk.
+    A caller that needs several views of one boundary counts one lookup and
+    passes count=False for the others.
+    """
+
+    def __init__(self, maxsize=32, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.RLock()
+
+    def source_key(self, gdf):
+        """Geometry hash of gdf, computed once per object."""
+        cached = self._hashes.get(id(gdf))
+        if cached is not None and cached[0]() is gdf:
+            return cached[1]
+        key = geometry_hash(gdf)
+        with self._lock:
+            self._hashes[id(gdf)] = (weakref.ref(gdf), key)
+        return key
+
+    def _entry(self, gdf, crs, count=True):
+        key = (self.source_key(gdf), _crs_key(crs))
+        with self._lock:
+            if key in self._entries:
+                if count:
+                    self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if count:
+                self.misses += 1
+
+        entry = {"gdf": self._load_or_reproject(gdf, crs, key)}
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                (source, _), _ = self._entries.popitem(last=False)
+                self._forget_source(source)
+        return entry
+
+    def _forget_source(self, source):
+        """Drops the hash of an evicted source once no entry refers to it."""
+        if any(key[0] == source for key in self._entries):
+            return
+        for object_id, (_, key) in list(self._hashes.items()):
+            if key == source:
+                del self._hashes[object_id]
+
+    def _load_or_reproject(self, gdf, crs, key):
+        path = None
+        if self.cache_dir is not None:
+            name = hashlib.sha256("|".join(str(part) for part in key).encode()).hexdigest()[:32]
+            path = os.path.join(self.cache_dir, f"{name}.parquet")
+            if os.path.exists(path):
+                self.disk_hits += 1
+                return read_vector(path)
+
+        if crs is None or gdf.crs is None or CRS.from_user_input(crs) == gdf.crs:
+            reprojected = gdf
+        else:
+            geometries = reproject_geometries(gdf.geometry.values, gdf.crs, crs)
+            reprojected = gdf.set_geometry(geometries, crs=CRS.from_user_input(crs))
+
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.parquet"
+            write_vector(reprojected, tmp_path)
+            os.replace(tmp_path, path)
+        return reprojected
+
+    def get(self, gdf, crs, count=True):
+        """gdf reprojected to crs."""
+        return self._entry(gdf, crs, count)["gdf"]
+
+    def shapes(self, gdf, crs, count=True):
+        """GeoJSON-like geometries of gdf in crs, as rasterio.mask expects."""
+        entry = self._entry(gdf, crs, count)
+        if "shapes" not in entry:
+            entry["shapes"] = [feature["geometry"] for feature in entry["gdf"].__geo_interface__["features"]]
+        return entry["shapes"]
+
+    def prepared(self, gdf, crs, count=True):
+        """Prepared union of gdf in crs, for repeated intersects/contains tests."""
+        entry = self._entry(gdf, crs, count)
+        if "prepared" not in entry:
+            union = shapely.union_all(entry["gdf"].geometry.values)
+            shapely.prepare(union)
+            entry["prepared"] = union
+        return entry["prepared"]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                "entries": len(self._entries)}
+
+    def reset_stats(self):
+        """Zeroes the counters but keeps the cached entries."""
+        with self._lock:
+            self.hits = self.misses = self.disk_hits = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hashes.clear()
+        self.reset_stats()
+
+
+# Cache shared by the clipping and mosaicking scripts in this process
+default_cache = ReprojectionCache()
@@ -1,20 +1,143 @@
+import os
+import numpy as np
 import rasterio
 import pandas as pd
+from rasterio.windows import Window
 
-# Open the GeoTIFF
-with rasterio.open("geotiff.tif") as src:
-    array = src.read(1)  # read first band
-    transform = src.transform
-
-# Flatten data with coordinates
-rows, cols = array.shape
-data = []
-for row in range(rows):
-    for col in range(cols):
-        x, y = transform * (col, row)  # get coordinates
-        value = array[row, col]
-        data.append((x, y, value))
-
-# Save to Excel
-df = pd.DataFrame(data, columns=["X", "Y", "Value"])
-df.to_excel("geotiff.xlsx", index=False)
+# Excel sheets hold 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+# Rasters with more pixels than this are refused for .xlsx output
+EXCEL_MAX_PIXELS = 5_000_000
+
+
+def block_to_frame(data, window, transform, band_names, nodata=None, skip_nodata=False):
+    """
+    Turns a (bands, rows, cols) block into a table of X, Y and band values.
+    Coordinates come from the affine transform in bulk (top-left pixel corner,
+    as transform * (col, row) gives).
+    """
+    rows = np.arange(window.row_off, window.row_off + window.height, dtype="float64")
+    cols = np.arange(window.col_off, window.col_off + window.width, dtype="float64")
+    col_grid, row_grid = np.meshgrid(cols, rows)
+    x = transform.a * col_grid + transform.b * row_grid + transform.c
+    y = transform.d * col_grid + transform.e * row_grid + transform.f
+
+    values = data.reshape(data.shape[0], -1)
+    columns = {"X": x.ravel(), "Y": y.ravel()}
+    for name, band in zip(band_names, values):
+        columns[name] = band
+    df = pd.DataFrame(columns)
+
+    if skip_nodata and nodata is not None:
+        # Drop pixels that are nodata in every band (NaN never equals itself)
+        is_nodata = np.isnan(values) if np.isnan(nodata) else values == nodata
+        df = df[~is_nodata.all(axis=0)]
+    return df
+
+
+def iter_row_blocks(src, pixels_per_block=1_000_000):
+    """Yields full-width row windows of roughly pixels_per_block pixels."""
+    rows_per_block = max(1, pixels_per_block // src.width)
+    for row_off in range(0, src.height, rows_per_block):
+        yield Window(0, row_off, src.width, min(rows_per_block, src.height - row_off))
+
+
+def iter_raster_frames(input_tif, pixels_per_block=1_000_000, skip_nodata=False):
+    """Yields DataFrames of X, Y and every band, one row block at a time."""
+    with rasterio.open(input_tif) as src:
+        if src.count == 1:
+            band_names = ["Value"]
+        else:
+            band_names = [f"Band{i}" for i in range(1, src.count + 1)]
+        for window in iter_row_blocks(src, pixels_per_block):
+            data = src.read(window=window)
+            yield block_to_frame(data, window, src.transform, band_names, src.nodata, skip_nodata)
+
+
+def _write_parquet(frames, output_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema, compression="zstd")
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_feather(frames, output_path):
+    import pyarrow as pa
+
+    writer = None
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pa.ipc.new_file(output_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_csv(frames, output_path):
+    with open(output_path, "w", newline="") as f:
+        for i, df in enumerate(frames):
+            df.to_csv(f, header=(i == 0), index=False)
+
+
+def _write_excel(frames, output_path):
+    # Split across sheets as each one fills up
+    sheet = 1
+    sheet_rows = 0
+    with pd.ExcelWriter(output_path) as writer:
+        for df in frames:
+            while len(df):
+                if sheet_rows == EXCEL_MAX_ROWS:
+                    sheet += 1
+                    sheet_rows = 0
+                part = df.iloc[:EXCEL_MAX_ROWS - sheet_rows]
+                df = df.iloc[len(part):]
+                part.to_excel(writer, sheet_name=f"Sheet{sheet}", index=False,
+                              header=(sheet_rows == 0), startrow=sheet_rows + (sheet_rows > 0))
+                sheet_rows += len(part)
+
+
+WRITERS = {
+    ".parquet": _write_parquet,
+    ".feather": _write_feather,
+    ".arrow": _write_feather,
+    ".csv": _write_csv,
+    ".xlsx": _write_excel,
+}
+
+
+def geotiff_to_table(input_tif, output_path, pixels_per_block=1_000_000, skip_nodata=False):
+    """
+    Exports every pixel of a GeoTIFF as X, Y and band value rows.
+    The output format follows the extension (.parquet, .feather/.arrow, .csv or
+    .xlsx). Row blocks are streamed to the writer, so memory depends on
+    pixels_per_block rather than on the raster size. Excel output is only
+    allowed for small rasters and is split over several sheets when needed.
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError(f"Unsupported output format '{ext}', expected one of {list(WRITERS)}")
+
+    if ext == ".xlsx":
+        with rasterio.open(input_tif) as src:
+            pixels = src.width * src.height
+        if pixels > EXCEL_MAX_PIXELS:
+            raise ValueError(f"{input_tif} has {pixels} pixels; use .parquet, .feather or .csv "
+                             f"for rasters over {EXCEL_MAX_PIXELS} pixels.")
+
+    WRITERS[ext](iter_raster_frames(input_tif, pixels_per_block, skip_nodata), output_path)
+
+
+if __name__ == "__main__":
+    geotiff_to_table("geotiff.tif", "geotiff.xlsx")
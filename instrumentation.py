@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-process I/O counters (Linux); rchar/wchar count every read()/write() call,
+# including reads served from the page cache
+PROC_IO = "/proc/self/io"
+
+# Counters a stage can carry; bytes are measured when not given
+COUNTERS = ("pixels", "features", "bytes_read", "bytes_written")
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def io_counters():
+    """(bytes read, bytes written) by this process so far, or None if unknown."""
+    try:
+        with open(PROC_IO) as f:
+            fields = dict(line.split(":") for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def file_size(*paths):
+    """Total size in bytes of the paths that exist."""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+
+class Profiler:
+    """
+    Records wall time, peak RSS, bytes read/written and pixel/feature counts
+    per named stage. Stages nest, and each record keeps its parent's name.
+
+        with profiler.stage("clip.read") as record:
+            data = src.read(window=window)
+            record["pixels"] = data.size
+
+    Bytes are measured from the process I/O counters unless the stage sets
+    them; peak RSS is the process peak when the stage ends, and rss_growth how
+    much the stage raised it. Each process has its own profiler; pool workers
+    can drain() their records and the parent extend() its own with them.
+    Records can be summarised per stage, saved as JSON or as a Chrome trace
+    (chrome://tracing or https://ui.perfetto.dev).
+    A disabled profiler records nothing and stages cost next to nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """Times the block as one stage; the yielded record takes counters."""
+        record = {counter: None for counter in COUNTERS}
+        record.update(counts)
+        if not self.enabled:
+            yield record
+            return
+
+        stack = self._stack()
+        record.update({"name": name, "parent": stack[-1]["name"] if stack else None, "depth": len(stack)})
+        rss_start, io_start = peak_rss(), io_counters()
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            rss_end, io_end = peak_rss(), io_counters()
+
+            if io_start is not None and io_end is not None:
+                if record["bytes_read"] is None:
+                    record["bytes_read"] = io_end[0] - io_start[0]
+                if record["bytes_written"] is None:
+                    record["bytes_written"] = io_end[1] - io_start[1]
+            record.update({
+                # Wall-clock start, so records of several processes line up
+                "start": time.time() - (end - start),
+                "wall_s": end - start,
+                "peak_rss": rss_end,
+                "rss_growth": rss_end - rss_start if rss_end is not None else None,
+                "pid": os.getpid(),
+                "thread": threading.get_ident(),
+            })
+            with self._lock:
+                self.records.append(record)
+
+    def iterate(self, name, iterable, features=None):
+        """
+        Yields from iterable, timing each step as a stage, for generators that
+        read lazily. features(item) gives the feature count of an item.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                if features is not None:
+                    record["features"] = features(item)
+            yield item
+
+    def drain(self):
+        """Returns the records and clears them, e.g. to send them from a worker."""
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def extend(self, records):
+        """Adds records drained from another profiler (such as a pool worker's)."""
+        with self._lock:
+            self.records.extend(records)
+
+    def reset(self):
+        self.drain()
+
+    def summary(self):
+        """
+        Totals per stage name in first-seen order: calls, wall time, counters,
+        highest peak RSS and throughput (pixels/s, features/s, MB/s).
+        """
+        stages = {}
+        for record in self.records:
+            s = stages.setdefault(record["name"], {"calls": 0, "wall_s": 0.0, "peak_rss": None,
+                                                   **{counter: 0 for counter in COUNTERS}})
+            s["calls"] += 1
+            s["wall_s"] += record["wall_s"]
+            for counter in COUNTERS:
+                s[counter] += record[counter] or 0
+            if record["peak_rss"] is not None:
+                s["peak_rss"] = max(s["peak_rss"] or 0, record["peak_rss"])
+
+        for s in stages.values():
+            seconds = s["wall_s"] or float("nan")
+            s["pixels_per_s"] = s["pixels"] / seconds
+            s["features_per_s"] = s["features"] / seconds
+            s["read_mb_per_s"] = s["bytes_read"] / 1e6 / seconds
+            s["write_mb_per_s"] = s["bytes_written"] / 1e6 / seconds
+        return stages
+
+    def print_summary(self):
+        header = f"{'stage':<28}{'calls':>6}{'wall s':>9}{'peak MB':>9}{'MB read':>9}{'MB written':>11}" \
+                 f"{'Mpx/s':>9}{'feat/s':>10}"
+        print(header)
+        print("-" * len(header))
+        for name, s in self.summary().items():
+            peak = s["peak_rss"] / 1e6 if s["peak_rss"] is not None else float("nan")
+            print(f"{name[:27]:<28}{s['calls']:>6}{s['wall_s']:>9.3f}{peak:>9.1f}{s['bytes_read'] / 1e6:>9.1f}"
+                  f"{s['bytes_written'] / 1e6:>11.1f}{s['pixels_per_s'] / 1e6:>9.2f}{s['features_per_s']:>10.0f}")
+
+    def to_json(self, path=None):
+        """Records and per-stage summary as a dictionary, also written to path if given."""
+        report = {"records": self.records, "summary": self.summary()}
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2, default=float)
+        return report
+
+    def to_trace(self, path):
+        """
+        Writes the records as Chrome trace events: one complete event per stage
+        with its counters as arguments, plus a peak RSS counter track.
+        """
+        events = []
+        origin = min((record["start"] for record in self.records), default=0.0)
+        for record in self.records:
+            ts = (record["start"] - origin) * 1e6
+            args = {counter: record[counter] for counter in COUNTERS if record[counter] is not None}
+            events.append({"name": record["name"], "cat": "stage", "ph": "X",
+                           "ts": ts, "dur": record["wall_s"] * 1e6,
+                           "pid": record["pid"], "tid": record["thread"], "args": args})
+            if record["peak_rss"] is not None:
+                events.append({"name": "peak RSS (MB)", "ph": "C",
+                               "ts": ts + record["wall_s"] * 1e6,
+                               "pid": record["pid"], "args": {"peak_rss": record["peak_rss"] / 1e6}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Profiler shared by the workflows in this process; off unless a benchmark or
+# the pipeline CLI (--profile / --trace) turns it on
+profiler = Profiler()
+
+
+def stage(name, **counts):
+    """profiler.stage on the shared profiler."""
+    return profiler.stage(name, **counts)
@@ -1,15 +1,26 @@
 import geopandas as gpd
+import numpy as np
 import os
+import shutil
+import tempfile
 import zipfile
-from shapely.geometry import MultiPoint, Point, Polygon
+import shapely
+from shapely.geometry import (GeometryCollection, LineString, MultiLineString, MultiPoint,
+                              MultiPolygon, Point, Polygon)
 import xml.etree.ElementTree as ET
 
+from geometry_cache import reproject_geometries
+from instrumentation import profiler, stage
+from vector_io import iter_vector_batches, write_vector
+
 # ===============================
 # 🔧 USER SETTINGS
 # ===============================
 KMZ_PATH = r"...\2000.kmz"
 OUTPUT_DIR = r"shapefiles_output"
 REFERENCE_YEAR = 2000
+PER_FEATURE_UTM = False  # Pick the UTM zone per feature instead of per folder
+COMBINE_FOLDERS = False  # With PER_FEATURE_UTM: one output per zone for all folders
 # ===============================
 
 def get_utm_crs(lon, lat):
@@ -19,6 +30,11 @@ def get_utm_crs(lon, lat):
     epsg = 32600 + zone_number if hemisphere == "north" else 32700 + zone_number
     return f"EPSG:{epsg}"
 
+def utm_epsg_codes(lon, lat):
+    """Vectorized get_utm_crs: UTM EPSG codes for arrays of longitudes and latitudes."""
+    zone_number = np.clip(np.floor((np.asarray(lon) + 180) / 6).astype("int64") + 1, 1, 60)
+    return np.where(np.asarray(lat) >= 0, 32600, 32700) + zone_number
+
 def parse_coordinates(coords_str):
     """Parse coordinates string from KML."""
     coords = []
@@ -33,153 +49,309 @@ def parse_coordinates(coords_str):
                 continue
     return coords
 
-def extract_features_from_kml(kml_path):
-    """Extract all features from KML using direct XML parsing."""
-    tree = ET.parse(kml_path)
-    root = tree.getroot()
-    
-    # Define KML namespace
-    ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-    
-    features_by_folder = {}
-    current_folder = "Unknown"
-    
-    # Recursively process elements
-    def process_element(element, folder_name):
-        if element.tag.endswith('Folder'):
-            # New folder
-            name_elem = element.find('kml:name', ns)
-            new_folder = name_elem.text if name_elem is not None else folder_name
-            
-            # Process all children
-            for child in element:
-                process_element(child, new_folder)
-                
-        elif element.tag.endswith('Placemark'):
-            # Placemark found
-            name_elem = element.find('kml:name', ns)
+def parse_coordinates_array(coords_str):
+    """Parse a KML coordinates string into an (n, 2) lon/lat array in one pass."""
+    tuples = coords_str.split()
+    if not tuples:
+        return np.empty((0, 2))
+    width = tuples[0].count(',') + 1
+    if width >= 2:
+        try:
+            values = np.array(','.join(tuples).split(','), dtype="float64")
+            if values.size == width * len(tuples):
+                return values.reshape(-1, width)[:, :2]
+        except ValueError:
+            pass
+    # Mixed 2D/3D tuples or bad values: fall back to per-tuple parsing
+    return np.array(parse_coordinates(coords_str), dtype="float64").reshape(-1, 2)
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _find_child(element, name):
+    for child in element:
+        if _local_name(child.tag) == name:
+            return child
+    return None
+
+def _ring_coords(boundary):
+    """Coordinates of the LinearRing inside an outer/innerBoundaryIs element."""
+    ring = _find_child(boundary, 'LinearRing')
+    coords_elem = _find_child(ring, 'coordinates') if ring is not None else None
+    if coords_elem is None or not coords_elem.text:
+        return None
+    coords = parse_coordinates_array(coords_elem.text)
+    return coords if len(coords) >= 3 else None
+
+def parse_geometry(element):
+    """Build a shapely geometry from a KML geometry element, or None."""
+    kind = _local_name(element.tag)
+
+    if kind in ('Point', 'LineString'):
+        coords_elem = _find_child(element, 'coordinates')
+        if coords_elem is None or not coords_elem.text:
+            return None
+        coords = parse_coordinates_array(coords_elem.text)
+        if kind == 'Point':
+            return Point(coords[0]) if len(coords) else None
+        return LineString(coords) if len(coords) >= 2 else None
+
+    if kind == 'Polygon':
+        shell = None
+        holes = []
+        for child in element:
+            name = _local_name(child.tag)
+            if name == 'outerBoundaryIs':
+                shell = _ring_coords(child)
+            elif name == 'innerBoundaryIs':
+                hole = _ring_coords(child)
+                if hole is not None:
+                    holes.append(hole)
+        return Polygon(shell, holes) if shell is not None else None
+
+    if kind == 'MultiGeometry':
+        parts = [geom for geom in (parse_geometry(child) for child in element) if geom is not None]
+        if not parts:
+            return None
+        types = {geom.geom_type for geom in parts}
+        if types == {'Polygon'}:
+            return MultiPolygon(parts)
+        if types == {'LineString'}:
+            return MultiLineString(parts)
+        if types == {'Point'}:
+            return MultiPoint(parts)
+        return GeometryCollection(parts)
+
+    return None
+
+def iter_kml_features(kml_file):
+    """
+    Stream (folder_name, feature) pairs from a KML file object with iterparse.
+    Each Placemark is parsed when its end tag is reached and then removed from
+    the tree, so memory does not grow with the size of the KML.
+    """
+    folder_names = []
+    parents = []
+
+    for event, element in ET.iterparse(kml_file, events=('start', 'end')):
+        kind = _local_name(element.tag)
+
+        if event == 'start':
+            if kind == 'Folder':
+                # Inherit the enclosing folder name until this one's <name> is seen
+                folder_names.append(folder_names[-1] if folder_names else "Unknown")
+            parents.append(element)
+            continue
+
+        parents.pop()
+        parent = parents[-1] if parents else None
+
+        if kind == 'name' and parent is not None and _local_name(parent.tag) == 'Folder':
+            if element.text:
+                folder_names[-1] = element.text
+
+        elif kind == 'Placemark':
+            name_elem = _find_child(element, 'name')
             name = name_elem.text if name_elem is not None else "Unnamed"
-            
-            desc_elem = element.find('kml:description', ns)
-            description = desc_elem.text if desc_elem is not None else ""
-            
-            # Extract geometry
+
+            desc_elem = _find_child(element, 'description')
+            description = desc_elem.text if desc_elem is not None and desc_elem.text else ""
+
             geometry = None
-            point_elem = element.find('.//kml:Point', ns)
-            polygon_elem = element.find('.//kml:Polygon', ns)
-            
-            if point_elem is not None:
-                coords_elem = point_elem.find('kml:coordinates', ns)
-                if coords_elem is not None and coords_elem.text:
-                    coords = parse_coordinates(coords_elem.text)
-                    if coords:
-                        geometry = Point(coords[0])
-            
-            elif polygon_elem is not None:
-                coords_elem = polygon_elem.find('.//kml:coordinates', ns)
-                if coords_elem is not None and coords_elem.text:
-                    coords = parse_coordinates(coords_elem.text)
-                    if coords:
-                        geometry = Polygon(coords)
-            
+            for child in element:
+                geometry = parse_geometry(child)
+                if geometry is not None:
+                    break
+
             if geometry is not None:
-                if folder_name not in features_by_folder:
-                    features_by_folder[folder_name] = []
-                
-                features_by_folder[folder_name].append({
+                folder_name = folder_names[-1] if folder_names else "Unknown"
+                yield folder_name, {
                     'name': name,
                     'description': description,
                     'geometry': geometry
-                })
-        
-        else:
-            # Process children of other elements
-            for child in element:
-                process_element(child, folder_name)
-    
-    # Start processing from root
-    for child in root:
-        process_element(child, current_folder)
-    
-    return features_by_folder
+                }
+            element.clear()
+            if parent is not None:
+                parent.remove(element)
 
-def kmz_to_category_shapefiles(kmz_path, output_dir, year):
-    os.makedirs(output_dir, exist_ok=True)
+        elif kind == 'Folder':
+            folder_names.pop()
+            element.clear()
+            if parent is not None:
+                parent.remove(element)
 
-    # Extract KML from KMZ
+def extract_features_from_kml(kml_path):
+    """Extract all features from KML, grouped by folder."""
+    features_by_folder = {}
+    with open(kml_path, 'rb') as kml_file:
+        for folder_name, feature in iter_kml_features(kml_file):
+            features_by_folder.setdefault(folder_name, []).append(feature)
+    return features_by_folder
+
+def iter_kmz_feature_batches(kmz_path, batch_size=50000):
+    """
+    Stream features straight from the KML member of a KMZ without extracting it.
+    Yields (folder_name, features) batches of at most batch_size features.
+    """
     with zipfile.ZipFile(kmz_path, 'r') as kmz:
         kml_files = [f for f in kmz.namelist() if f.endswith('.kml')]
         if not kml_files:
             raise ValueError("No KML found inside KMZ.")
-        kml_path = kmz.extract(kml_files[0], path=output_dir)
+
+        batches = {}
+        with kmz.open(kml_files[0]) as kml_file:
+            for folder_name, feature in iter_kml_features(kml_file):
+                batch = batches.setdefault(folder_name, [])
+                batch.append(feature)
+                if len(batch) >= batch_size:
+                    yield folder_name, batches.pop(folder_name)
+
+        for folder_name, batch in batches.items():
+            yield folder_name, batch
+
+def shapefile_columns(gdf):
+    """Truncate column names to the 10 characters a Shapefile allows."""
+    new_columns = {}
+    for col in gdf.columns:
+        if len(col) > 10:
+            new_columns[col] = col[:10]
+    if new_columns:
+        gdf = gdf.rename(columns=new_columns)
+    return gdf
+
+def _features_to_gdf(features):
+    return gpd.GeoDataFrame({
+        'Name': [feature['name'] for feature in features],
+        'Description': [feature['description'] for feature in features],
+        'geometry': [feature['geometry'] for feature in features]
+    }, crs="EPSG:4326")  # KML uses WGS84
+
+def kmz_to_category_shapefiles(kmz_path, output_dir, year, batch_size=50000):
+    os.makedirs(output_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix="kmz_staging_", dir=output_dir)
 
     try:
-        # Parse KML using direct XML parsing to get all features
-        features_by_folder = extract_features_from_kml(kml_path)
-        print(f"Found folders: {list(features_by_folder.keys())}")
-        
+        # Stream feature batches into one WGS84 staging layer per folder, keeping
+        # running centroid sums so the UTM zone is known once the KML is read
+        staged = {}
+        batches = profiler.iterate("kmz.parse", iter_kmz_feature_batches(kmz_path, batch_size),
+                                   features=lambda item: len(item[1]))
+        for category, features in batches:
+            with stage("kmz.to_frame", features=len(features)):
+                batch_gdf = _features_to_gdf(features)
+
+            if category not in staged:
+                staged[category] = {
+                    'path': os.path.join(staging_dir, f"folder_{len(staged)}.gpkg"),
+                    'count': 0, 'sum_x': 0.0, 'sum_y': 0.0, 'centroids': 0
+                }
+            info = staged[category]
+
+            centroids = shapely.centroid(batch_gdf.geometry.values)
+            centroids = centroids[~shapely.is_empty(centroids)]
+            info['sum_x'] += float(shapely.get_x(centroids).sum())
+            info['sum_y'] += float(shapely.get_y(centroids).sum())
+            info['centroids'] += len(centroids)
+
+            with stage("kmz.write_staging", features=len(batch_gdf)):
+                write_vector(batch_gdf, info['path'], append=info['count'] > 0)
+            info['count'] += len(batch_gdf)
+
+        print(f"Found folders: {list(staged.keys())}")
+
         # Process each folder
-        for category, features in features_by_folder.items():
-            if not features:
-                print(f"Skipping empty category: {category}")
-                continue
-                
-            print(f"Category '{category}': Found {len(features)} features")
-            
-            # Create GeoDataFrame from features
-            geometries = []
-            names = []
-            descriptions = []
-            
-            for feature in features:
-                geometries.append(feature['geometry'])
-                names.append(feature['name'])
-                descriptions.append(feature['description'])
-            
-            # Create GeoDataFrame
-            category_gdf = gpd.GeoDataFrame({
-                'Name': names,
-                'Description': descriptions,
-                'geometry': geometries
-            }, crs="EPSG:4326")  # KML uses WGS84
-            
+        for category, info in staged.items():
+            print(f"Category '{category}': Found {info['count']} features")
+
             # Determine UTM zone from centroid
-            valid_geoms = [geom.centroid for geom in category_gdf.geometry if geom is not None]
-            if not valid_geoms:
+            if not info['centroids']:
                 print(f"Skipping category with no valid geometries: {category}")
                 continue
-                
-            centroid = MultiPoint(valid_geoms).centroid
-            utm_crs = get_utm_crs(centroid.x, centroid.y)
-
-            # Reproject
-            category_gdf_utm = category_gdf.to_crs(utm_crs)
-            
-            # Clean up column names for Shapefile format (limit to 10 chars)
-            new_columns = {}
-            for col in category_gdf_utm.columns:
-                if len(col) > 10:
-                    new_columns[col] = col[:10]
-            if new_columns:
-                category_gdf_utm = category_gdf_utm.rename(columns=new_columns)
+            utm_crs = get_utm_crs(info['sum_x'] / info['centroids'], info['sum_y'] / info['centroids'])
 
             # Clean category name for filename
             safe_name = str(category).lower().replace(" ", "_").replace("/", "_").replace("\\", "_")
             shp_name = f"reference_{year}_{safe_name}.shp"
             shp_path = os.path.join(output_dir, shp_name)
 
-            # Save to shapefile
-            category_gdf_utm.to_file(shp_path, driver="ESRI Shapefile")
-            print(f"Saved category '{category}' with {len(category_gdf)} features → {shp_path} (CRS: {utm_crs})")
-                
+            # Reproject and save chunk by chunk
+            chunks = profiler.iterate("kmz.read_staged", iter_vector_batches(info['path'], batch_size), features=len)
+            for i, chunk in enumerate(chunks):
+                with stage("kmz.reproject", features=len(chunk)):
+                    category_gdf_utm = chunk.to_crs(utm_crs)
+
+                # Clean up column names for Shapefile format (limit to 10 chars)
+                category_gdf_utm = shapefile_columns(category_gdf_utm)
+
+                with stage("kmz.write", features=len(category_gdf_utm)):
+                    write_vector(category_gdf_utm, shp_path, append=i > 0)
+
+            print(f"Saved category '{category}' with {info['count']} features → {shp_path} (CRS: {utm_crs})")
+
     except Exception as e:
         print(f"Error processing KML file: {e}")
         import traceback
         traceback.print_exc()
         return
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def kmz_to_utm_zone_shapefiles(kmz_path, output_dir, year, combine_folders=False, batch_size=50000):
+    """
+    Like kmz_to_category_shapefiles, but every feature gets the UTM zone of its
+    own centroid, so folders spanning several zones are projected correctly.
+    Each batch is grouped by zone and reprojected with one pyproj call per zone.
+    Outputs are split per folder and zone, or with combine_folders=True one
+    shapefile per zone holding every folder with a Category column. A Shapefile
+    holds one geometry type, so points and lines get "_points" / "_lines" files.
+    Returns a dictionary of output path -> feature count.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+
+    for category, features in iter_kmz_feature_batches(kmz_path, batch_size):
+        batch_gdf = _features_to_gdf(features)
+        if combine_folders:
+            batch_gdf.insert(0, 'Category', category)
+
+        geometries = batch_gdf.geometry.values
+        centroids = shapely.centroid(geometries)
+        epsg_codes = utm_epsg_codes(shapely.get_x(centroids), shapely.get_y(centroids))
+        type_ids = shapely.get_type_id(geometries)
+        families = np.where(np.isin(type_ids, (0, 4)), "_points",
+                            np.where(np.isin(type_ids, (1, 2, 5)), "_lines", ""))
+
+        safe_name = str(category).lower().replace(" ", "_").replace("/", "_").replace("\\", "_")
+        for epsg in np.unique(epsg_codes):
+            for family in np.unique(families[epsg_codes == epsg]):
+                selected = (epsg_codes == epsg) & (families == family)
+                zone_gdf = batch_gdf[selected]
+                zone_gdf = gpd.GeoDataFrame(
+                    zone_gdf.drop(columns='geometry'),
+                    geometry=reproject_geometries(zone_gdf.geometry.values, "EPSG:4326", f"EPSG:{epsg}"),
+                    crs=f"EPSG:{epsg}"
+                )
+                zone_gdf = shapefile_columns(zone_gdf)
+
+                zone_label = f"utm{epsg % 100}{'n' if epsg < 32700 else 's'}"
+                if combine_folders:
+                    shp_name = f"reference_{year}_{zone_label}{family}.shp"
+                else:
+                    shp_name = f"reference_{year}_{safe_name}_{zone_label}{family}.shp"
+                shp_path = os.path.join(output_dir, shp_name)
+
+                write_vector(zone_gdf, shp_path, append=shp_path in written)
+                written[shp_path] = written.get(shp_path, 0) + len(zone_gdf)
+
+    for shp_path, count in written.items():
+        print(f"Saved {count} features → {shp_path}")
+    return written
 
 # ===============================
 # 🚀 RUN SCRIPT
 # ===============================
 if __name__ == "__main__":
-    kmz_to_category_shapefiles(KMZ_PATH, OUTPUT_DIR, REFERENCE_YEAR)
+    if PER_FEATURE_UTM:
+        kmz_to_utm_zone_shapefiles(KMZ_PATH, OUTPUT_DIR, REFERENCE_YEAR, combine_folders=COMBINE_FOLDERS)
+    else:
+        kmz_to_category_shapefiles(KMZ_PATH, OUTPUT_DIR, REFERENCE_YEAR)
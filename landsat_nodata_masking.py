@@ -1,32 +1,87 @@
+import os
+import glob
+import traceback
 import rasterio
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from raster_blocks import iter_windows, tiled_profile
 
 input_path = r"...\L8_composite_2020.tif"
 output_path = r"...\L8_composite_2020_n.tif"
 nodata_value = -3.4028235e+38
 
-with rasterio.open(input_path) as src:
-    profile = src.profile
-    data = src.read()  # shape: (bands, rows, cols)
-
-    # Create a mask where pixels == nodata_value
-    mask = (data == nodata_value)
 
-    # Replace nodata pixels with np.nan (or any nodata)
-    # You can also pick a nodata value for output; here we use -9999
-    output_nodata = -9999
-    data = data.astype('float32')  # promote to float for NaN support
+def remap_block(data, nodata_values, output_nodata, include_nan=False):
+    """Replaces every input nodata sentinel (and NaN if include_nan) in a float32 block, in place."""
+    mask = np.zeros(data.shape, dtype=bool)
+    for value in nodata_values:
+        mask |= data == np.float32(value)
+    if include_nan:
+        mask |= np.isnan(data)
     data[mask] = output_nodata
+    return data
+
+
+def remap_nodata(input_path, output_path, nodata_values=(nodata_value,), output_nodata=-9999,
+                 include_nan=False, block_size=512, compress="lzw"):
+    """
+    Rewrites a composite with its nodata sentinels replaced by output_nodata.
+    The raster is processed one block_size x block_size window at a time (all
+    bands together) and written to a tiled float32 GeoTIFF using the same block
+    size, so memory stays at a few blocks whatever the scene size.
+    NaN pixels stay NaN, as in the original script, unless include_nan=True.
+    compress can be "lzw", "zstd", "deflate" or None.
+    """
+    with rasterio.open(input_path) as src:
+        profile = tiled_profile(src.profile, block_size=block_size, compress=compress,
+                                dtype=rasterio.float32, nodata=output_nodata)
+        if compress:
+            profile["predictor"] = 3  # floating point predictor
+
+        with rasterio.open(output_path, 'w', **profile) as dst:
+            for window in iter_windows(src, block_size):
+                data = src.read(window=window, out_dtype="float32")
+                dst.write(remap_block(data, nodata_values, output_nodata, include_nan), window=window)
+
+    return output_path
+
+
+def _remap_job(input_path, output_path, kwargs):
+    try:
+        remap_nodata(input_path, output_path, **kwargs)
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def remap_directory(input_dir, output_dir, suffix="_n", workers=None, **kwargs):
+    """
+    Runs remap_nodata on every .tif in input_dir using a process pool.
+    Outputs are named <name><suffix>.tif in output_dir. Failing files are
+    reported and skipped. Returns a dictionary of failures and their tracebacks.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for path in sorted(glob.glob(os.path.join(input_dir, "*.tif"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        jobs.append((path, os.path.join(output_dir, f"{name}{suffix}.tif")))
 
-    # Update profile to set nodata value
-    profile.update(
-        dtype=rasterio.float32,
-        nodata=output_nodata,
-        compress='lzw'  # optional compression
-    )
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_remap_job, src_path, dst_path, kwargs): (src_path, dst_path)
+                   for src_path, dst_path in jobs}
+        for i, future in enumerate(as_completed(futures), start=1):
+            src_path, dst_path = futures[future]
+            error = future.result()
+            if error is None:
+                print(f"[{i}/{len(jobs)}] Saved masked raster: {dst_path}")
+            else:
+                failed[src_path] = error
+                print(f"[{i}/{len(jobs)}] Failed: {src_path}\n{error}")
+    return failed
 
-    # Write masked data to new raster
-    with rasterio.open(output_path, 'w', **profile) as dst:
-        dst.write(data)
 
-print(f"Saved masked raster: {output_path}")
+if __name__ == "__main__":
+    remap_nodata(input_path, output_path, nodata_values=(nodata_value,))
+    print(f"Saved masked raster: {output_path}")
@@ -1,41 +1,107 @@
-import pandas as pd
-import geopandas as gpd
 import os
 import glob
+import pandas as pd
+import geopandas as gpd
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from vector_io import LayerWriter, read_vector, read_vector_info
 
 # Specify the folder containing shapefiles
 folder_path = '...path/folder_name'  # Replace with your folder path
 
-# Get list of all .shp files in the folder
-shapefiles = glob.glob(os.path.join(folder_path, '*.shp'))
 
-# Initialize an empty list to store GeoDataFrames
-gdfs = []
+def reconcile_schemas(paths, workers=8):
+    """
+    Reads the field list of every layer (headers only) and returns one merged
+    {field: pandas dtype} schema plus the layer infos.
+    Fields that are integer in some layers and float in others become float;
+    any other type conflict falls back to string.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        infos = list(pool.map(read_vector_info, paths))
+
+    kinds = {}
+    for info in infos:
+        for field, dtype in zip(info["fields"], info["dtypes"]):
+            kinds.setdefault(field, set()).add(str(dtype))
+
+    schema = {}
+    for field, dtypes in kinds.items():
+        if dtypes <= {"int32", "int64", "int16", "int8"}:
+            schema[field] = "Int64"
+        elif dtypes <= {"int32", "int64", "int16", "int8", "float32", "float64"}:
+            schema[field] = "float64"
+        elif dtypes == {"bool"}:
+            schema[field] = "boolean"
+        elif len(dtypes) == 1 and next(iter(dtypes)).startswith("datetime64"):
+            schema[field] = next(iter(dtypes))
+        else:
+            schema[field] = "string"
+    return schema, infos
+
+
+def _read_layer(path, schema, target_crs):
+    """Reads one layer, conforms it to the merged schema and target CRS."""
+    gdf = read_vector(path)
 
-# Read each shapefile and add a source identifier
-for shp in shapefiles:
-    # Read the shapefile
-    gdf = gpd.read_file(shp)
-    
     # Add a column to identify the source layer
-    source_name = os.path.basename(shp).replace('.shp', '')  # Extract filename without extension
-    gdf['source'] = source_name
-    
-    # Append to the list
-    gdfs.append(gdf)
-
-# Check if any shapefiles were found
-if not gdfs:
-    print("No shapefiles found in the specified folder.")
-else:
-    # Merge all GeoDataFrames into one
-    merged_gdf = gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True, sort=False))
-
-    # Ensure the CRS is consistent (use the CRS of the first shapefile)
-    merged_gdf = merged_gdf.set_crs(gdfs[0].crs, allow_override=True)
-
-    # Save the merged GeoDataFrame to a new shapefile
-    output_shapefile = os.path.join(folder_path, 'merged_layer.shp')
-    merged_gdf.to_file(output_shapefile)
-
-    print(f"Merged shapefile saved as: {output_shapefile}")
+    source_name = os.path.splitext(os.path.basename(path))[0]
+    gdf["source"] = source_name
+
+    if gdf.crs is None:
+        print(f"Warning: {path} has no CRS; assuming {target_crs}")
+        gdf = gdf.set_crs(target_crs)
+    elif target_crs is not None and gdf.crs != target_crs:
+        gdf = gdf.to_crs(target_crs)
+
+    columns = {field: gdf[field] if field in gdf else pd.Series(None, index=gdf.index, dtype="object")
+               for field in schema}
+    attributes = pd.DataFrame(columns, index=gdf.index).astype(schema)
+    attributes["source"] = gdf["source"].astype("string")
+    return gpd.GeoDataFrame(attributes, geometry=gdf.geometry.values, crs=gdf.crs)
+
+
+def merge_layers(paths, output_path, target_crs=None, workers=8):
+    """
+    Merges vector layers into one output, reading them concurrently.
+    Field types are reconciled across layers first. Layers in another CRS are
+    reprojected to target_crs (the first layer's CRS by default) instead of being
+    relabelled. Each layer is appended to the output as soon as it is read, with
+    at most a few layers held in memory. Returns the number of features written.
+    """
+    schema, infos = reconcile_schemas(paths, workers)
+    schema.pop("source", None)
+    if target_crs is None:
+        target_crs = next((info["crs"] for info in infos if info["crs"]), None)
+
+    with LayerWriter(output_path) as writer, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        done_count = 0
+        for path in paths:
+            pending.add(pool.submit(_read_layer, path, schema, target_crs))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    writer.write(future.result())
+                    done_count += 1
+                    print(f"[{done_count}/{len(paths)}] merged")
+        for future in pending:
+            writer.write(future.result())
+            done_count += 1
+            print(f"[{done_count}/{len(paths)}] merged")
+    return writer.features
+
+
+if __name__ == "__main__":
+    # Get list of all .shp files in the folder
+    shapefiles = glob.glob(os.path.join(folder_path, '*.shp'))
+
+    # Check if any shapefiles were found
+    if not shapefiles:
+        print("No shapefiles found in the specified folder.")
+    else:
+        # Merge all layers into one GeoPackage (no 2 GB / 10-character field limits)
+        output_path = os.path.join(folder_path, 'merged_layer.gpkg')
+        merge_layers(shapefiles, output_path)
+
+        print(f"Merged layer saved as: {output_path}")
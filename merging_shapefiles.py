@@ -1,13 +1,15 @@
 import pandas as pd
 import geopandas as gpd
 
+from vector_io import read_vector, write_vector
+
 # Input shapefiles
 shp1 = r"...\reference_2000_bu.shp"
 shp2 = r"...\reference_2000_nbu.shp"
 
 # Read both
-gdf1 = gpd.read_file(shp1)
-gdf2 = gpd.read_file(shp2)
+gdf1 = read_vector(shp1)
+gdf2 = read_vector(shp2)
 
 # Make sure both have same CRS
 if gdf1.crs != gdf2.crs:
@@ -17,6 +19,6 @@ if gdf1.crs != gdf2.crs:
 merged = gpd.GeoDataFrame(pd.concat([gdf1, gdf2], ignore_index=True), crs=gdf1.crs)
 
 # Save merged shapefile
-merged.to_file(r"...\merged_reference.shp")
+write_vector(merged, r"...\merged_reference.shp")
 
 print("✅ Merged shapefile saved as merged_reference.shp")
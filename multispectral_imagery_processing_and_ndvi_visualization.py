@@ -3,151 +3,101 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
-def detect_sensor(filename, dataset):
-    fname = os.path.basename(filename).lower()
-
-    if "lc08" in fname or "landsat8" in fname or "l8" in fname:
-        sensor = "Landsat8"
-        bands = {
-            "B2": 2,  # Blue
-            "B3": 3,  # Green
-            "B4": 4,  # Red
-            "B5": 5,  # NIR
-            "B8": 8   # Panchromatic (optional)
-        }
-    elif "lt05" in fname or "landsat5" in fname or "l5" in fname:
-        sensor = "Landsat5"
-        bands = {
-            "B1": 1,  # Blue
-            "B2": 2,  # Green
-            "B3": 3,  # Red
-            "B4": 4,  # NIR
-            "B8": 8   # Panchromatic band may or may not exist
-        }
-    elif "le07" in fname or "landsat7" in fname or "l7" in fname:
-        sensor = "Landsat7"
-        bands = {
-            "B1": 1,  # Blue
-            "B2": 2,  # Green
-            "B3": 3,  # Red
-            "B4": 4,  # NIR
-            "B8": 8   # Panchromatic
-        }
-    elif "sentinel" in fname or "s2" in fname or "sentinel-2" in fname:
-        sensor = "Sentinel2"
-        bands = {
-            "B2": 2,   # Blue
-            "B3": 3,   # Green
-            "B4": 4,   # Red
-            "B8": 8    # NIR
-        }
-    elif "modis" in fname:
-        sensor = "MODIS"
-        bands = {
-            "B1": 1,  # Red
-            "B2": 2,  # NIR
-        }
-    else:
-        sensor = "Unknown"
-        bands = {}
+from raster_blocks import ensure_overviews, read_preview, streamed_histogram
+from spectral_indices import available_indices, compute_indices, sensor_roles
+from spectral_indices import detect_sensor as spectral_detect_sensor
 
-    return sensor, bands
+def detect_sensor(filename, dataset):
+    """Sensor name and {band key: band number}, from the registry in spectral_indices."""
+    return spectral_detect_sensor(filename)
 
 # --- Main code ---
-image_path = r"E:\Freelancing\P_05_6.18.2025\data\dataset\imagery\landsat\L5_composite_2000.tif"
-dataset = rasterio.open(image_path)
-
-sensor, bands = detect_sensor(image_path, dataset)
-print(f"Detected sensor: {sensor}")
-print(f"Using bands: {bands}")
-
-if not bands:
-    raise ValueError("Could not detect sensor or bands automatically. Please specify bands manually.")
-
-nodata_val = dataset.nodata
-print(f"\nNodata value detected: {nodata_val}")
-
-out_image = dataset.read().astype(float)
-num_bands = out_image.shape[0]
-
-# NDVI bands selection per sensor
-required_bands_for_ndvi = []
-if sensor == "Landsat5" or sensor == "Landsat7":
-    required_bands_for_ndvi = ["B4", "B3"]  # NIR=4, Red=3
-elif sensor == "Landsat8":
-    required_bands_for_ndvi = ["B5", "B4"]  # NIR=5, Red=4
-elif sensor == "Sentinel2":
-    required_bands_for_ndvi = ["B8", "B4"]  # NIR=8, Red=4
-
-missing_band = False
-indices = []
-if required_bands_for_ndvi:
-    for b in required_bands_for_ndvi:
-        if b not in bands:
-            print(f"Required band {b} for NDVI not found.")
-            missing_band = True
-            break
-        idx = bands[b] - 1
-        if idx >= num_bands:
-            print(f"Band index {idx} for {b} out of range.")
-            missing_band = True
+if __name__ == "__main__":
+    image_path = r"E:\Freelancing\P_05_6.18.2025\data\dataset\imagery\landsat\L5_composite_2000.tif"
+    indices_path = os.path.splitext(image_path)[0] + "_indices.tif"
+    preview_size = 1024  # Longest side of the NDVI map, in pixels
+    hist_bins = 50
+    dataset = rasterio.open(image_path)
+
+    sensor, bands = detect_sensor(image_path, dataset)
+    print(f"Detected sensor: {sensor}")
+    print(f"Using bands: {bands}")
+
+    if not bands:
+        raise ValueError("Could not detect sensor or bands automatically. Please specify bands manually.")
+
+    nodata_val = dataset.nodata
+    print(f"\nNodata value detected: {nodata_val}")
+
+    num_bands = dataset.count
+
+    # Band roles (nir, red, green, blue) of this sensor and the indices they allow
+    roles = sensor_roles(sensor, num_bands)
+    index_names = available_indices(roles)
+    missing_band = "NDVI" not in index_names
+    if missing_band:
+        print(f"NIR / Red bands not found among {roles}.")
+
+    fig, axes = plt.subplots(2, 3, figsize=(18, 10))
+    axes = axes.flatten()
+
+    plot_count = 0
+    for band_name, band_idx in bands.items():
+        if plot_count >= 4:
             break
-        indices.append(idx)
-else:
-    missing_band = True
-
-fig, axes = plt.subplots(2, 3, figsize=(18, 10))
-axes = axes.flatten()
-
-plot_count = 0
-for band_name, band_idx in bands.items():
-    if plot_count >= 4:
-        break
-    if band_idx - 1 >= num_bands:
-        print(f"Skipping {band_name}, index {band_idx} out of range.")
-        continue
-    data = out_image[band_idx - 1]
-
-    if nodata_val is not None:
-        data = data[data != nodata_val]
-    data = data[np.isfinite(data)]
-
-    axes[plot_count].hist(data, bins=50, color='gray', edgecolor='black')
-    axes[plot_count].set_title(f"{band_name} Histogram")
-    plot_count += 1
-
-if not missing_band:
-    nir = out_image[indices[0]]
-    red = out_image[indices[1]]
-
-    # Set minimum reflectance threshold to exclude low values
-    min_reflectance = 0.05
-    valid_mask = (nir > min_reflectance) & (red > min_reflectance)
-    if nodata_val is not None:
-        valid_mask &= (nir != nodata_val) & (red != nodata_val)
-
-    nir = np.where(valid_mask, nir, np.nan)
-    red = np.where(valid_mask, red, np.nan)
-
-    ndvi = (nir - red) / (nir + red)
-    ndvi[np.isinf(ndvi)] = np.nan
-
-    axes[4].hist(ndvi[np.isfinite(ndvi)], bins=50, color='green', edgecolor='black')
-    axes[4].set_title("NDVI Histogram")
-
-    ndvi_img = axes[5].imshow(ndvi, cmap='RdYlGn', vmin=-1, vmax=1)
-    axes[5].set_title("NDVI Map")
-    axes[5].axis('off')
-    fig.colorbar(ndvi_img, ax=axes[5], fraction=0.046, pad=0.04)
-else:
-    axes[4].axis('off')
-    axes[5].axis('off')
-    print("Skipping NDVI due to missing bands.")
-
-plt.tight_layout()
-
-output_file = "output_histograms_ndvi.png"
-plt.savefig(output_file, dpi=300)
-print(f"Saved combined figure as {output_file}")
-
-plt.show()
+        if band_idx - 1 >= num_bands:
+            print(f"Skipping {band_name}, index {band_idx} out of range.")
+            continue
+        # Fixed bin edges from a decimated read, then counts streamed block by block
+        preview = read_preview(dataset, band_idx, preview_size)
+        if not np.isfinite(preview).any():
+            print(f"Skipping {band_name}, no valid pixels.")
+            continue
+        low, high = float(np.nanmin(preview)), float(np.nanmax(preview))
+        edges = np.linspace(low, high if high > low else low + 1, hist_bins + 1)
+        counts = streamed_histogram(dataset, band_idx, edges)
+
+        axes[plot_count].hist(edges[:-1], bins=edges, weights=counts, color='gray', edgecolor='black')
+        axes[plot_count].set_title(f"{band_name} Histogram")
+        plot_count += 1
+
+    dataset.close()
+
+    if not missing_band:
+        # Set minimum reflectance threshold to exclude low values
+        min_reflectance = 0.05
+
+        # Every available index in one pass: each band is read once per block
+        stats = compute_indices(image_path, indices_path, index_names, roles,
+                                min_reflectance=min_reflectance)
+        print(f"Indices saved: {indices_path} (bands: {', '.join(index_names)})")
+        for name, s in stats.items():
+            print(f"  {name}: min {s['min']}, max {s['max']}, mean {s['mean']}")
+
+        # Overviews are built once, so later previews of this output are quick
+        ensure_overviews(indices_path)
+        ndvi_band = index_names.index("NDVI") + 1
+        ndvi_edges = np.linspace(-1, 1, hist_bins + 1)
+        with rasterio.open(indices_path) as ndvi_src:
+            ndvi_counts = streamed_histogram(ndvi_src, ndvi_band, ndvi_edges)
+            ndvi = read_preview(ndvi_src, ndvi_band, preview_size)
+
+        axes[4].hist(ndvi_edges[:-1], bins=ndvi_edges, weights=ndvi_counts, color='green', edgecolor='black')
+        axes[4].set_title("NDVI Histogram")
+
+        ndvi_img = axes[5].imshow(ndvi, cmap='RdYlGn', vmin=-1, vmax=1)
+        axes[5].set_title("NDVI Map")
+        axes[5].axis('off')
+        fig.colorbar(ndvi_img, ax=axes[5], fraction=0.046, pad=0.04)
+    else:
+        axes[4].axis('off')
+        axes[5].axis('off')
+        print("Skipping NDVI due to missing bands.")
+
+    plt.tight_layout()
+
+    output_file = "output_histograms_ndvi.png"
+    plt.savefig(output_file, dpi=300)
+    print(f"Saved combined figure as {output_file}")
+
+    plt.show()
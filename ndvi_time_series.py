@@ -0,0 +1,182 @@
+import os
+import re
+import numpy as np
+import rasterio
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from raster_blocks import iter_windows, tiled_profile
+from spectral_indices import INDICES, detect_sensor, read_bands, sensor_roles
+
+# Bands of the time-series output, in order
+OUTPUT_BANDS = ("mean", "min", "max", "std", "slope", "change", "count")
+
+# Scenes and settings of the job running in this process
+_job = None
+_datasets = {}
+
+
+def scene_date(path, default):
+    """Year in the file name (e.g. L5_composite_2000.tif -> 2000.0), or default."""
+    match = re.search(r"(?<!\d)(19|20)\d{2}(?!\d)", os.path.basename(path))
+    return float(match.group(0)) if match else float(default)
+
+
+def _close_datasets():
+    for dataset in _datasets.values():
+        dataset.close()
+    _datasets.clear()
+
+
+def _init_worker(job):
+    global _job
+    _job = job
+    _close_datasets()
+
+
+def _dataset(path):
+    """Scenes stay open in each worker for the whole job."""
+    if path not in _datasets:
+        _datasets[path] = rasterio.open(path)
+    return _datasets[path]
+
+
+def _window_stats(window):
+    """
+    Streams every scene through one window and returns the OUTPUT_BANDS stack.
+    Mean and variance are accumulated with Welford's method and the trend with
+    running least-squares sums, so only one scene's NDVI is held at a time.
+    Pixels are skipped in the dates where they are invalid.
+    """
+    shape = (int(window.height), int(window.width))
+    count = np.zeros(shape, dtype="int32")
+    mean = np.zeros(shape)
+    m2 = np.zeros(shape)
+    low = np.full(shape, np.inf, dtype="float32")
+    high = np.full(shape, -np.inf, dtype="float32")
+    sum_t, sum_tt, sum_y, sum_ty = (np.zeros(shape) for _ in range(4))
+    baseline = np.full(shape, np.nan, dtype="float32")
+    latest = np.full(shape, np.nan, dtype="float32")
+
+    ndvi = np.empty(shape, dtype="float32")
+    tmp = np.empty(shape, dtype="float32")
+    for i, (path, roles, t) in enumerate(zip(_job["scenes"], _job["roles"], _job["dates"])):
+        bands, valid = read_bands(_dataset(path), window, roles, ("nir", "red"),
+                                  _job["scale"], _job["offset"], _job["min_reflectance"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            INDICES["NDVI"]["kernel"](bands, ndvi, tmp)
+        valid &= np.isfinite(ndvi)
+        y = ndvi[valid].astype("float64")
+
+        count[valid] += 1
+        delta = y - mean[valid]
+        mean[valid] += delta / count[valid]
+        m2[valid] += delta * (y - mean[valid])
+        np.minimum(low, ndvi, out=low, where=valid)
+        np.maximum(high, ndvi, out=high, where=valid)
+
+        sum_t[valid] += t
+        sum_tt[valid] += t * t
+        sum_y[valid] += y
+        sum_ty[valid] += t * y
+
+        if i == _job["baseline"]:
+            baseline[valid] = ndvi[valid]
+        if i > _job["baseline"]:
+            latest[valid] = ndvi[valid]
+
+    out = np.full((len(OUTPUT_BANDS),) + shape, np.nan, dtype="float32")
+    seen = count > 0
+    out[0][seen] = mean[seen]
+    out[1][seen] = low[seen]
+    out[2][seen] = high[seen]
+    out[3][seen] = np.sqrt(m2[seen] / count[seen])
+
+    n = count.astype("float64")
+    denominator = n * sum_tt - sum_t * sum_t
+    trend = count >= 2
+    trend &= denominator > 0
+    out[4][trend] = (n[trend] * sum_ty[trend] - sum_t[trend] * sum_y[trend]) / denominator[trend]
+
+    out[5] = latest - baseline
+    out[6] = count
+    return window, out
+
+
+def temporal_ndvi(scenes, output_path, dates=None, roles=None, baseline=0, scale=1.0, offset=0.0,
+                  min_reflectance=None, block_size=None, workers=None, compress="lzw"):
+    """
+    Per-pixel NDVI statistics over an ordered list of aligned scenes, written as
+    one float32 GeoTIFF with the bands in OUTPUT_BANDS: mean, min, max and
+    (population) std of NDVI, the least-squares trend slope in NDVI per date
+    unit, the change of the latest valid NDVI against the baseline scene, and
+    the number of valid dates.
+
+    dates are numbers for the trend (default: the year in each file name, else
+    the scene position). roles maps nir/red to band numbers, either one dict for
+    all scenes or one per scene; by default each scene's sensor is detected from
+    its file name, so Landsat 5 and 8 composites can be mixed.
+
+    The scenes are streamed window by window and windows are spread over a
+    process pool, so memory depends on the block size and worker count, not on
+    the number of scenes.
+    """
+    scenes = list(scenes)
+    if dates is None:
+        dates = [scene_date(path, i) for i, path in enumerate(scenes)]
+    if roles is None:
+        roles = [sensor_roles(detect_sensor(path)[0]) for path in scenes]
+    elif isinstance(roles, dict):
+        roles = [roles] * len(scenes)
+    for path, scene_roles in zip(scenes, roles):
+        if "nir" not in scene_roles or "red" not in scene_roles:
+            raise ValueError(f"No NIR / Red bands known for {path}; pass roles explicitly.")
+
+    with rasterio.open(scenes[0]) as first:
+        profile = first.profile
+        grid = (first.crs, first.transform, first.shape)
+        windows = list(iter_windows(first, block_size, band=roles[0]["nir"]))
+    for path in scenes[1:]:
+        with rasterio.open(path) as src:
+            if (src.crs, src.transform, src.shape) != grid:
+                raise ValueError(f"{path} is not aligned with {scenes[0]}; resample it to the same grid first.")
+
+    job = {"scenes": scenes, "roles": roles, "dates": [float(t) for t in dates], "baseline": baseline,
+           "scale": scale, "offset": offset, "min_reflectance": min_reflectance}
+    profile = tiled_profile(profile, compress=compress, count=len(OUTPUT_BANDS), dtype="float32", nodata=np.nan)
+    workers = workers or os.cpu_count()
+
+    with rasterio.open(output_path, "w", **profile) as dst:
+        for i, name in enumerate(OUTPUT_BANDS, start=1):
+            dst.set_band_description(i, name)
+
+        if workers <= 1:
+            _init_worker(job)
+            try:
+                for window in windows:
+                    dst.write(_window_stats(window)[1], window=window)
+            finally:
+                _close_datasets()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(job,)) as pool:
+                # Few windows in flight at a time keeps memory bounded
+                pending = set()
+                for window in windows:
+                    pending.add(pool.submit(_window_stats, window))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            window, out = future.result()
+                            dst.write(out, window=window)
+                for future in pending:
+                    window, out = future.result()
+                    dst.write(out, window=window)
+
+    print(f"NDVI time series of {len(scenes)} scenes ({dates[0]} - {dates[-1]}) saved: {output_path}")
+    return {"scenes": len(scenes), "dates": job["dates"], "bands": OUTPUT_BANDS}
+
+
+if __name__ == "__main__":
+    scenes = [r"...\L5_composite_2000.tif", r"...\L5_composite_2010.tif", r"...\L8_composite_2020.tif"]
+    output_path = r"...\ndvi_2000_2020_stats.tif"
+
+    temporal_ndvi(scenes, output_path)
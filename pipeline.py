@@ -0,0 +1,442 @@
+import os
+import sys
+import glob
+import json
+import math
+import argparse
+import traceback
+import numpy as np
+import rasterio
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from rasterio.features import geometry_mask
+from rasterio.errors import WindowError
+from rasterio.windows import Window, from_bounds, transform as window_transform
+
+from batch_raster_clip import load_boundary, process_directory
+from geometry_cache import default_cache
+from instrumentation import profiler, stage
+from landsat_nodata_masking import remap_block, remap_directory, remap_nodata
+from raster_blocks import iter_windows, nodata_in_dtype, tiled_profile
+from spectral_indices import INDICES, check_indices, compute_indices, detect_sensor, evaluate_indices, sensor_roles
+from zonal_statistics import (_add_zone_block, _finish_zone_stats, _new_zone_stats, _zone_blocks,
+                              overlap_groups, zonal_statistics)
+
+
+# --- Fused raster steps ---
+# Each step takes its parameters and the current grid/band description (meta)
+# and returns the updated meta plus a function applied to every window. Blocks
+# are floating-point (bands, rows, cols) stacks with NaN for nodata, so steps
+# chain in memory and only the last one is written. They are float32 unless the
+# source values need float64 to stay exact (float64, 32- and 64-bit integers).
+
+def _clip_step(meta, boundary, all_touched=False):
+    """Crops the grid to the boundary and sets pixels outside it to nodata."""
+    gdf = default_cache.get(load_boundary(boundary), meta["crs"])
+    shapes = gdf.geometry.values
+    bounds = from_bounds(*gdf.total_bounds, transform=meta["transform"])
+    (row_start, row_stop), (col_start, col_stop) = bounds.toranges()
+    crop = Window.from_slices((math.floor(row_start), math.ceil(row_stop)),
+                              (math.floor(col_start), math.ceil(col_stop)))
+    try:
+        crop = crop.intersection(Window(0, 0, meta["width"], meta["height"]))
+    except WindowError:
+        raise ValueError(f"Boundary {boundary} does not overlap {meta['path']}")
+
+    col, row = int(crop.col_off), int(crop.row_off)
+    meta = dict(meta, width=int(crop.width), height=int(crop.height),
+                transform=window_transform(crop, meta["transform"]),
+                offset=(meta["offset"][0] + col, meta["offset"][1] + row))
+    if meta["nodata"] is None:
+        meta["nodata"] = 0
+    transform = meta["transform"]
+
+    def apply(data, window):
+        inside = geometry_mask(shapes, out_shape=data.shape[1:], invert=True, all_touched=all_touched,
+                               transform=window_transform(window, transform))
+        data[:, ~inside] = np.nan
+        return data
+
+    return meta, apply
+
+
+def _remap_nodata_step(meta, nodata_values=(-3.4028235e+38,), output_nodata=-9999):
+    """
+    Treats the nodata sentinels as nodata; the output is float32 with output_nodata.
+    NaN is the nodata marker inside fused blocks, so NaN input pixels are
+    written as output_nodata too.
+    """
+    nodata_values = [float(value) for value in nodata_values]
+    meta = dict(meta, dtype="float32", nodata=float(output_nodata))
+
+    def apply(data, window):
+        return remap_block(data.astype("float32", copy=False), nodata_values, np.nan)
+
+    return meta, apply
+
+
+def _indices_step(meta, indices=("NDVI",), roles=None, scale=1.0, offset=0.0, min_reflectance=None):
+    """Replaces the bands with one float32 band per spectral index."""
+    if meta["band_names"] is not None:
+        raise ValueError("The indices step needs the source bands; put it before any step that replaces them.")
+    if roles is None:
+        roles = sensor_roles(detect_sensor(meta["path"])[0], meta["count"])
+    indices, needed = check_indices(indices, roles)
+    scale, offset = float(scale), float(offset)
+    meta = dict(meta, count=len(indices), dtype="float32", nodata=np.nan, band_names=indices)
+
+    def apply(data, window):
+        stack = data[[roles[role] - 1 for role in needed]].astype("float32", copy=False)
+        if scale != 1.0:
+            stack *= np.float32(scale)
+        if offset:
+            stack += np.float32(offset)
+        valid = np.all(np.isfinite(stack), axis=0)
+        if min_reflectance is not None:
+            valid &= np.all(stack > min_reflectance, axis=0)
+        return evaluate_indices(dict(zip(needed, stack)), valid, indices)
+
+    return meta, apply
+
+
+def _zonal_step(meta, zones, field=None, band=1, percentiles=(), categorical=False, all_touched=False):
+    """
+    Final step: per-zone statistics of one band, accumulated window by window
+    as in zonal_statistics, so the pipeline writes a table instead of a raster.
+    band is a 1-based band number or a band name such as NDVI.
+    Returns the meta plus (accumulate, finish) functions.
+    """
+    gdf = load_boundary(zones)
+    zone_ids = gdf[field].values if field else gdf.index.values
+    gdf = default_cache.get(gdf.reset_index(drop=True), meta["crs"])
+    if isinstance(band, str):
+        if band.upper() not in (meta["band_names"] or []):
+            raise ValueError(f"No band named {band} (bands: {meta['band_names']})")
+        band = meta["band_names"].index(band.upper())
+    else:
+        band = int(band) - 1
+    percentiles = [float(q) for q in percentiles]
+    groups = overlap_groups(gdf, all_touched)
+    stats = _new_zone_stats(len(gdf), percentiles, categorical)
+    transform = meta["transform"]
+
+    def accumulate(data, window):
+        values = data[band]
+        valid = ~np.isnan(values)
+        for zone_block in _zone_blocks(gdf, groups, window, transform, all_touched):
+            _add_zone_block(stats, zone_block, values, valid)
+
+    def finish():
+        return _finish_zone_stats(stats, zone_ids, field or "zone", percentiles)
+
+    return meta, (accumulate, finish)
+
+
+RASTER_STEPS = {
+    "clip": _clip_step,
+    "remap_nodata": _remap_nodata_step,
+    "indices": _indices_step,
+}
+
+# Steps that end a pipeline with a table (CSV) instead of a raster
+TABLE_STEPS = {
+    "zonal": _zonal_step,
+}
+
+
+def _parse_step(step):
+    """A step is {"name": {params}} or {"step": name, **params}."""
+    if "step" in step:
+        params = dict(step)
+        return params.pop("step"), params
+    if len(step) != 1:
+        raise ValueError(f"Invalid step {step}")
+    name, params = next(iter(step.items()))
+    return name, dict(params or {})
+
+
+def _grid_windows(width, height, block_size):
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+
+
+def run_fused(input_path, output_path, steps, block_size=512, compress="lzw"):
+    """
+    Runs consecutive raster steps on one raster in a single windowed pass.
+    Each output window is read once from the input, passed through every step
+    in memory and written once, so no intermediate rasters touch the disk.
+    If the last step is a table step (zonal), its statistics are accumulated
+    from the windows instead and only the table is written, as CSV.
+    """
+    with rasterio.open(input_path) as src:
+        meta = {
+            "path": input_path, "crs": src.crs, "transform": src.transform,
+            "width": src.width, "height": src.height, "count": src.count,
+            "dtype": src.dtypes[0], "nodata": src.nodata, "offset": (0, 0), "band_names": None,
+        }
+        # Smallest float type that holds every source value exactly
+        work_dtype = np.result_type(src.dtypes[0], np.float32)
+        source_nodata = nodata_in_dtype(src.nodata, src.dtypes[0])
+        functions = []
+        sink = None
+        for i, step in enumerate(steps):
+            name, params = _parse_step(step)
+            if name in TABLE_STEPS:
+                if i != len(steps) - 1:
+                    raise ValueError(f"The '{name}' step writes a table and must be the last step.")
+                meta, sink = TABLE_STEPS[name](meta, **params)
+                continue
+            if name not in RASTER_STEPS:
+                raise ValueError(f"Unknown step '{name}'; available: {list(RASTER_STEPS) + list(TABLE_STEPS)}")
+            meta, function = RASTER_STEPS[name](meta, **params)
+            functions.append(function)
+        col_offset, row_offset = meta["offset"]
+
+        def fused_block(window):
+            source_window = Window(window.col_off + col_offset, window.row_off + row_offset,
+                                   window.width, window.height)
+            data = src.read(window=source_window, out_dtype=work_dtype)
+            if source_nodata is not None and not np.isnan(source_nodata):
+                data[data == source_nodata] = np.nan
+            for function in functions:
+                data = function(data, window)
+            return data
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        if sink is not None:
+            accumulate, finish = sink
+            for window in _grid_windows(meta["width"], meta["height"], block_size):
+                accumulate(fused_block(window), window)
+            finish().to_csv(output_path)
+            return output_path
+
+        dtype, nodata = np.dtype(meta["dtype"]), meta["nodata"]
+        profile = tiled_profile(src.profile, block_size=block_size, compress=compress,
+                                width=meta["width"], height=meta["height"], transform=meta["transform"],
+                                count=meta["count"], dtype=dtype.name, nodata=nodata)
+
+        with rasterio.open(output_path, "w", **profile) as dst:
+            for i, name in enumerate(meta["band_names"] or [], start=1):
+                dst.set_band_description(i, name)
+
+            for window in iter_windows(dst, block_size):
+                data = fused_block(window)
+                if nodata is not None and not np.isnan(nodata):
+                    data[np.isnan(data)] = nodata
+                dst.write(data.astype(dtype, copy=False), window=window)
+    return output_path
+
+
+def _fused_job(input_path, output_path, steps, options):
+    try:
+        run_fused(input_path, output_path, steps, **options)
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def load_pipeline(path):
+    """Reads a pipeline definition from a .yaml/.yml or .toml file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".toml":
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if ext in (".yaml", ".yml"):
+        import yaml
+
+        with open(path) as f:
+            return yaml.safe_load(f)
+    raise ValueError(f"Pipeline files must be YAML or TOML, not {ext}")
+
+
+def run_pipeline(config):
+    """
+    Runs a pipeline definition (a dict or a YAML/TOML path):
+
+        inputs: ["scenes/*.tif"]     # paths or glob patterns
+        output_dir: processed
+        suffix: _processed           # output name: <input name><suffix>.tif
+        workers: 4                   # inputs processed in parallel
+        block_size: 512
+        compress: lzw
+        steps:
+          - clip: {boundary: aoi.shp}
+          - remap_nodata: {nodata_values: [-3.4028235e+38]}
+          - indices: {indices: [NDVI, EVI], scale: 0.0000275, offset: -0.2}
+          - zonal: {zones: fields.shp, field: NAME, band: NDVI}   # optional, last
+
+    Steps form a linear chain per input. All steps are fused per input (see
+    run_fused) and independent inputs run in a process pool. A pipeline ending
+    in zonal writes <input name><suffix>.csv and no raster. Returns a
+    dictionary of failures and their tracebacks.
+    """
+    if not isinstance(config, dict):
+        config = load_pipeline(config)
+    patterns = config["inputs"] if isinstance(config["inputs"], list) else [config["inputs"]]
+    inputs = sorted({path for pattern in patterns for path in (glob.glob(pattern) or [pattern])})
+    output_dir = config.get("output_dir", ".")
+    suffix = config.get("suffix", "_processed")
+    options = {"block_size": config.get("block_size", 512), "compress": config.get("compress", "lzw")}
+    steps = config["steps"]
+    ext = ".csv" if _parse_step(steps[-1])[0] in TABLE_STEPS else ".tif"
+
+    jobs = [(path, os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + suffix + ext))
+            for path in inputs]
+    failed = {}
+    with ProcessPoolExecutor(max_workers=config.get("workers")) as pool:
+        futures = {pool.submit(_fused_job, input_path, output_path, steps, options): (input_path, output_path)
+                   for input_path, output_path in jobs}
+        for i, future in enumerate(as_completed(futures), start=1):
+            input_path, output_path = futures[future]
+            error = future.result()
+            if error is None:
+                print(f"[{i}/{len(jobs)}] Saved: {output_path}")
+            else:
+                failed[input_path] = error
+                print(f"[{i}/{len(jobs)}] Failed: {input_path}\n{error}")
+    return failed
+
+
+# --- Command line ---
+
+def _cmd_clip(args):
+    summary = process_directory(args.input_root, args.output_root, args.boundary, workers=args.workers,
+                                incremental=args.incremental, cache_dir=args.cache_dir)
+    return 1 if summary["failed"] else 0
+
+
+def _cmd_mask_nodata(args):
+    kwargs = {"nodata_values": tuple(args.nodata), "output_nodata": args.output_nodata,
+              "include_nan": args.include_nan}
+    if os.path.isdir(args.input):
+        return 1 if remap_directory(args.input, args.output, workers=args.workers, **kwargs) else 0
+    remap_nodata(args.input, args.output, **kwargs)
+    print(f"Saved masked raster: {args.output}")
+    return 0
+
+
+def _cmd_indices(args):
+    stats = compute_indices(args.input, args.output, args.indices, scale=args.scale, offset=args.offset,
+                            min_reflectance=args.min_reflectance)
+    for name, s in stats.items():
+        print(f"{name}: min {s['min']}, max {s['max']}, mean {s['mean']}")
+    return 0
+
+
+def _cmd_ndvi_series(args):
+    from ndvi_time_series import temporal_ndvi
+
+    temporal_ndvi(args.scenes, args.output, baseline=args.baseline, workers=args.workers)
+    return 0
+
+
+def _cmd_mosaic(args):
+    from automated_geospatial_mosaicking import streaming_mosaic
+
+    streaming_mosaic(args.tiles, args.output, method=args.method, block_size=args.block_size)
+    return 0
+
+
+def _cmd_zonal(args):
+    table = zonal_statistics(args.raster, args.zones, zone_field=args.field, band=args.band,
+                             percentiles=args.percentiles)
+    table.to_csv(args.output)
+    print(f"Zonal statistics saved: {args.output}")
+    return 0
+
+
+def _cmd_bounds(args):
+    from extracting_bounding_box_coordinates import get_bounds
+
+    for path in args.paths:
+        print(json.dumps(get_bounds(path)))
+    return 0
+
+
+def _cmd_run(args):
+    return 1 if run_pipeline(args.pipeline) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Raster and vector processing tools.")
+    parser.add_argument("--profile", metavar="JSON", help="Write per-stage timings, memory and I/O as JSON")
+    parser.add_argument("--trace", metavar="JSON", help="Write per-stage timings as a Chrome trace")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("clip", help="Clip every .tif under a directory to a boundary")
+    p.add_argument("input_root")
+    p.add_argument("output_root")
+    p.add_argument("boundary")
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--incremental", action="store_true")
+    p.add_argument("--cache-dir")
+    p.set_defaults(func=_cmd_clip)
+
+    p = commands.add_parser("mask-nodata", help="Replace nodata sentinels (file or directory)")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--nodata", type=float, nargs="+", default=[-3.4028235e+38])
+    p.add_argument("--output-nodata", type=float, default=-9999)
+    p.add_argument("--include-nan", action="store_true", help="Also replace NaN pixels")
+    p.add_argument("--workers", type=int)
+    p.set_defaults(func=_cmd_mask_nodata)
+
+    p = commands.add_parser("indices", help="Spectral indices in one pass")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--indices", nargs="+", default=["NDVI"], choices=list(INDICES), type=str.upper)
+    p.add_argument("--scale", type=float, default=1.0)
+    p.add_argument("--offset", type=float, default=0.0)
+    p.add_argument("--min-reflectance", type=float)
+    p.set_defaults(func=_cmd_indices)
+
+    p = commands.add_parser("ndvi-series", help="Per-pixel NDVI statistics over aligned scenes")
+    p.add_argument("output")
+    p.add_argument("scenes", nargs="+")
+    p.add_argument("--baseline", type=int, default=0)
+    p.add_argument("--workers", type=int)
+    p.set_defaults(func=_cmd_ndvi_series)
+
+    p = commands.add_parser("mosaic", help="Streaming mosaic of tiles")
+    p.add_argument("output")
+    p.add_argument("tiles", nargs="+")
+    p.add_argument("--method", default="first")
+    p.add_argument("--block-size", type=int, default=1024)
+    p.set_defaults(func=_cmd_mosaic)
+
+    p = commands.add_parser("zonal", help="Zonal statistics to CSV")
+    p.add_argument("raster")
+    p.add_argument("zones")
+    p.add_argument("output")
+    p.add_argument("--field")
+    p.add_argument("--band", type=int, default=1)
+    p.add_argument("--percentiles", type=float, nargs="*", default=())
+    p.set_defaults(func=_cmd_zonal)
+
+    p = commands.add_parser("bounds", help="Native and EPSG:4326 bounds of layers")
+    p.add_argument("paths", nargs="+")
+    p.set_defaults(func=_cmd_bounds)
+
+    p = commands.add_parser("run", help="Run a YAML/TOML pipeline with fused raster steps")
+    p.add_argument("pipeline")
+    p.set_defaults(func=_cmd_run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler.enabled = bool(args.profile or args.trace)
+    try:
+        with stage(args.command):
+            return args.func(args)
+    finally:
+        if args.profile:
+            profiler.to_json(args.profile)
+        if args.trace:
+            profiler.to_trace(args.trace)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
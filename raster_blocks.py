@@ -0,0 +1,121 @@
+import math
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+# Striped GeoTIFFs often store one row per block; windows shorter than this
+# are grouped together so each read still covers a reasonable amount of data.
+MIN_STRIP_ROWS = 256
+
+
+def iter_windows(src, block_size=None, band=1):
+    """
+    Yields windows covering the whole raster.
+    By default the raster's native block layout is followed, so every read maps
+    onto whole blocks on disk. Pass block_size to walk square windows instead.
+    """
+    if block_size is not None:
+        block_h = block_w = int(block_size)
+    else:
+        block_h, block_w = src.block_shapes[band - 1]
+        if block_w >= src.width and block_h < MIN_STRIP_ROWS:
+            block_h *= math.ceil(MIN_STRIP_ROWS / block_h)
+
+    for row_off in range(0, src.height, block_h):
+        height = min(block_h, src.height - row_off)
+        for col_off in range(0, src.width, block_w):
+            width = min(block_w, src.width - col_off)
+            yield Window(col_off, row_off, width, height)
+
+
+def nodata_in_dtype(nodata, dtype):
+    """
+    Returns nodata as a scalar of the band dtype, or None when no pixel of that
+    dtype can hold it (e.g. uint8 with nodata -9999 or 2.5).
+    """
+    if nodata is None:
+        return None
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        if not math.isfinite(nodata) or not float(nodata).is_integer():
+            return None
+        info = np.iinfo(dtype)
+        return dtype.type(nodata) if info.min <= nodata <= info.max else None
+    if dtype.kind == "f" and math.isfinite(nodata) and abs(nodata) > float(np.finfo(dtype).max):
+        return None
+    return dtype.type(nodata)
+
+
+def tiled_profile(profile, block_size=256, compress="lzw", **updates):
+    """
+    Returns a copy of a rasterio profile set up for a tiled, compressed GeoTIFF
+    that can be written window by window.
+    """
+    out = profile.copy()
+    out.pop("photometric", None)
+    out.update({
+        "driver": "GTiff",
+        "tiled": True,
+        "blockxsize": block_size,
+        "blockysize": block_size,
+        "BIGTIFF": "IF_SAFER",
+    })
+    if compress:
+        out["compress"] = compress
+    else:
+        out.pop("compress", None)
+    out.update(updates)
+    return out
+
+
+def ensure_overviews(path, min_size=256, resampling="average"):
+    """
+    Builds internal overviews (2, 4, 8, ... down to about min_size pixels) once;
+    a raster that already has overviews is left as it is.
+    Returns the overview factors.
+    """
+    with rasterio.open(path, "r+") as dst:
+        factors = dst.overviews(1)
+        if factors:
+            return factors
+        factor = 2
+        while max(dst.width, dst.height) / factor >= min_size:
+            factors.append(factor)
+            factor *= 2
+        if factors:
+            dst.build_overviews(factors, Resampling[resampling])
+            dst.update_tags(ns="rio_overview", resampling=resampling)
+    return factors
+
+
+def read_preview(src, band=1, max_size=1024, resampling="nearest"):
+    """
+    Reads a band decimated so its longest side is at most max_size, as float32
+    with nodata set to NaN. GDAL serves the read from overviews when the raster
+    has them, so the cost does not grow with the scene size.
+    """
+    scale = max(src.width, src.height) / max_size
+    shape = (max(1, round(src.height / scale)), max(1, round(src.width / scale))) if scale > 1 \
+        else (src.height, src.width)
+    data = src.read(band, out_shape=shape, out_dtype="float32", resampling=Resampling[resampling])
+    if src.nodata is not None and not np.isnan(src.nodata):
+        data[data == np.float32(src.nodata)] = np.nan
+    return data
+
+
+def streamed_histogram(src, band, edges, block_size=None):
+    """
+    Histogram of every valid pixel of a band with fixed bin edges, accumulated
+    block by block. Values outside the edges are counted in the first or last bin.
+    """
+    counts = np.zeros(len(edges) - 1, dtype="int64")
+    nodata = src.nodata
+    for window in iter_windows(src, block_size, band=band):
+        data = src.read(band, window=window, out_dtype="float32")
+        valid = np.isfinite(data)
+        if nodata is not None and not np.isnan(nodata):
+            valid &= data != np.float32(nodata)
+        values = np.clip(data[valid], edges[0], edges[-1])
+        counts += np.histogram(values, bins=edges)[0]
+    return counts
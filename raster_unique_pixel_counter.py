@@ -1,31 +1,153 @@
 import rasterio
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
-def get_pixel_value_counts(raster_path):
+from instrumentation import profiler, stage
+from raster_blocks import iter_windows, nodata_in_dtype
+
+# Small integer types are counted into a fixed array with np.bincount
+BINCOUNT_DTYPES = ("uint8", "int8", "uint16", "int16")
+
+
+def _new_counts(dtype):
+    if np.dtype(dtype).name in BINCOUNT_DTYPES:
+        info = np.iinfo(dtype)
+        return np.zeros(int(info.max) - int(info.min) + 1, dtype="int64")
+    return {}
+
+
+def _add_block(counts, data):
+    """Adds the pixel values of one block to a running count."""
+    data = data.ravel()
+    if isinstance(counts, np.ndarray):
+        offset = -int(np.iinfo(data.dtype).min)
+        if offset:
+            data = data.astype("int32") + offset
+        counts += np.bincount(data, minlength=counts.size)
+        return counts
+
+    if data.dtype.kind in "iu" and data.size:
+        # Class rasters in wider integer types: bincount over the block's range
+        low = int(data.min())
+        if int(data.max()) - low < 1 << 20:
+            block_counts = np.bincount((data - low).astype("int64"))
+            values = np.flatnonzero(block_counts)
+            for value, count in zip((values + low).tolist(), block_counts[values].tolist()):
+                counts[value] = counts.get(value, 0) + count
+            return counts
+
+    if data.dtype.kind == "f":
+        data = data[~np.isnan(data)]
+    values, block_counts = np.unique(data, return_counts=True)
+    for value, count in zip(values.tolist(), block_counts.tolist()):
+        counts[value] = counts.get(value, 0) + count
+    return counts
+
+
+def _merge_counts(total, part):
+    if isinstance(total, np.ndarray):
+        total += part
+        return total
+    for value, count in part.items():
+        total[value] = total.get(value, 0) + count
+    return total
+
+
+def _finish_counts(counts, dtype, nodata):
+    """Converts a running count to a sorted {value: count} dictionary without nodata."""
+    if isinstance(counts, np.ndarray):
+        offset = -int(np.iinfo(dtype).min)
+        values = np.flatnonzero(counts)
+        counts = dict(zip((values - offset).tolist(), counts[values].tolist()))
+    nodata = nodata_in_dtype(nodata, dtype)
+    if nodata is not None:
+        counts.pop(nodata.item(), None)
+    return dict(sorted(counts.items()))
+
+
+def _count_windows(raster_path, bands, windows, worker_profile=None):
     """
-    Reads a raster and returns a dictionary of unique pixel values and their counts.
-    Ignores nodata values if defined.
+    Counts the given windows of each band; runs in a worker process.
+    In a pool worker, worker_profile says whether to profile, and the profiler
+    records are returned with the counts. Records a forked worker inherited
+    from the parent are dropped first.
     """
+    in_worker = worker_profile is not None
+    if in_worker:
+        profiler.reset()
+        profiler.enabled = worker_profile
     with rasterio.open(raster_path) as src:
-        data = src.read(1)  # Read first band
-        nodata = src.nodata
+        counts = {band: _new_counts(src.dtypes[band - 1]) for band in bands}
+        for window in windows:
+            with stage("pixel_counts.read") as record:
+                blocks = src.read(bands, window=window)
+                record["pixels"] = blocks.size
+            with stage("pixel_counts.count", pixels=blocks.size):
+                for band, block in zip(bands, blocks):
+                    _add_block(counts[band], block)
+    return counts, profiler.drain() if in_worker else []
+
+
+def count_pixel_values(raster_paths, bands=None, block_size=None, workers=1):
+    """
+    Counts the unique pixel values of rasters one block at a time.
+    raster_paths may be a single path or a list; bands defaults to every band.
+    With workers > 1 the windows of each raster are split across processes and
+    the partial counts are merged. Nodata values are left out.
+    Returns {raster_path: {band: {value: count}}}.
+    """
+    if isinstance(raster_paths, str):
+        raster_paths = [raster_paths]
+
+    results = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+    try:
+        for raster_path in raster_paths:
+            with rasterio.open(raster_path) as src:
+                raster_bands = list(bands) if bands is not None else list(src.indexes)
+                windows = list(iter_windows(src, block_size))
+                dtypes = {band: src.dtypes[band - 1] for band in raster_bands}
+                nodata = src.nodata
 
-        # Mask nodata if it exists
-        if nodata is not None:
-            data = data[data != nodata]
+            if pool is None:
+                counts, _ = _count_windows(raster_path, raster_bands, windows)
+            else:
+                chunks = [windows[i::workers] for i in range(workers) if windows[i::workers]]
+                counts = None
+                futures = [pool.submit(_count_windows, raster_path, raster_bands, chunk, profiler.enabled) for chunk in chunks]
+                for future in futures:
+                    part, records = future.result()
+                    profiler.extend(records)
+                    if counts is None:
+                        counts = part
+                    else:
+                        for band in raster_bands:
+                            counts[band] = _merge_counts(counts[band], part[band])
 
-        # Get unique values and their counts
-        unique_vals, counts = np.unique(data, return_counts=True)
+            with stage("pixel_counts.finish"):
+                results[raster_path] = {band: _finish_counts(counts[band], dtypes[band], nodata)
+                                        for band in raster_bands}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def get_pixel_value_counts(raster_path, band=1, block_size=None, workers=1):
+    """
+    Reads a raster and returns a dictionary of unique pixel values and their counts.
+    Ignores nodata values if defined.
+    """
+    value_counts = count_pixel_values(raster_path, [band], block_size, workers)[raster_path][band]
 
-        # Create dictionary {value: count}
-        value_counts = dict(zip(unique_vals, counts))
+    print("Pixel value counts:")
+    for val, cnt in value_counts.items():
+        print(f"Value {val}: {cnt} pixels")
 
-        print("Pixel value counts:")
-        for val, cnt in value_counts.items():
-            print(f"Value {val}: {cnt} pixels")
+    return value_counts
 
-        return value_counts
 
 # Example usage
-raster_file = '...\land_cover_2000.tif'
-pixel_counts = get_pixel_value_counts(raster_file)
+if __name__ == "__main__":
+    raster_file = '...\land_cover_2000.tif'
+    pixel_counts = get_pixel_value_counts(raster_file)
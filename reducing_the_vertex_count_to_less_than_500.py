@@ -1,16 +1,119 @@
+import os
+import numpy as np
 import geopandas as gpd
-from shapely.geometry import Polygon
+import shapely
+from concurrent.futures import ProcessPoolExecutor
 
-# 1. Load the file
-gdf = gpd.read_file("single_polygon.shp")
+from vector_io import read_vector, write_vector
 
-# 2. Apply aggressive simplification (tolerance in CRS units)
-tolerance = 200  # Meters (for UTM) or 0.1 for decimal degrees (WGS84)
-gdf.geometry = gdf.geometry.simplify(tolerance)
 
-# 3. Verify
-poly = gdf.geometry.iloc[0]
-print(f"Final vertex count: {len(poly.exterior.coords)}")  # Should be ≤500
+def count_vertices(geometries):
+    """Vertex count per geometry, including interior rings and every part of multi-geometries."""
+    return shapely.get_num_coordinates(np.asarray(geometries))
 
-# 4. Export as new file (critical step!)
-gdf.to_file("simplified_output.shp")
+
+def simplify_to_budget(geometries, max_vertices=500, rtol=0.01, fill=0.98, preserve_topology=True):
+    """
+    Simplifies each geometry just enough to fit max_vertices.
+    A tolerance is binary-searched per geometry on a log scale, with every step
+    applied to all unfinished geometries at once. A geometry is done when the
+    tolerance interval is within rtol or its count reaches fill * max_vertices.
+    Geometries already within budget are returned as is; those that cannot reach
+    the budget (e.g. too many holes or parts) get the strongest simplification tried.
+    """
+    geometries = np.asarray(geometries)
+    result = geometries.copy()
+    over = np.flatnonzero(count_vertices(geometries) > max_vertices)
+    if not len(over):
+        return result
+
+    bounds = shapely.bounds(geometries[over])
+    high = np.hypot(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    low = high * 1e-9
+    best = shapely.simplify(geometries[over], high, preserve_topology=preserve_topology)
+
+    active = np.arange(len(over))
+    while len(active):
+        mid = np.sqrt(low[active] * high[active])
+        candidate = shapely.simplify(geometries[over[active]], mid, preserve_topology=preserve_topology)
+        counts = count_vertices(candidate)
+        fits = (counts <= max_vertices) & ~shapely.is_empty(candidate)
+
+        high[active] = np.where(fits, mid, high[active])
+        low[active] = np.where(fits, low[active], mid)
+        best[active] = np.where(fits, candidate, best[active])
+
+        done = (high[active] <= low[active] * (1 + rtol)) | (fits & (counts >= fill * max_vertices))
+        active = active[~done]
+
+    result[over] = best
+    return result
+
+
+def simplify_coverage_to_budget(geometries, max_vertices=500, iterations=30):
+    """
+    Simplifies a polygon coverage so shared edges stay shared between neighbours.
+    One tolerance is searched for the whole coverage: the smallest one for which
+    every polygon fits max_vertices.
+    """
+    geometries = np.asarray(geometries)
+    if count_vertices(geometries).max(initial=0) <= max_vertices:
+        return geometries.copy()
+
+    bounds = shapely.total_bounds(geometries)
+    low, high = 0.0, float(np.hypot(bounds[2] - bounds[0], bounds[3] - bounds[1]))
+    best = shapely.coverage_simplify(geometries, high)
+    if count_vertices(best).max() > max_vertices:
+        print(f"Warning: coverage cannot be simplified below {max_vertices} vertices per polygon "
+              f"(shared nodes are kept); largest polygon has {count_vertices(best).max()}")
+        return best
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        candidate = shapely.coverage_simplify(geometries, mid)
+        if count_vertices(candidate).max() <= max_vertices:
+            high, best = mid, candidate
+        else:
+            low = mid
+    return best
+
+
+def simplify_layer(gdf, max_vertices=500, preserve_coverage=False, workers=None, chunk_size=10000):
+    """
+    Simplifies every feature of a layer to at most max_vertices and prints vertex
+    counts before and after. Independent simplification runs in parallel chunks;
+    preserve_coverage=True keeps the topology between neighbouring polygons
+    (single process, one tolerance for the whole layer).
+    """
+    geometries = gdf.geometry.values
+    before = count_vertices(geometries)
+
+    if preserve_coverage:
+        simplified = simplify_coverage_to_budget(geometries, max_vertices)
+    elif (workers or os.cpu_count()) > 1 and len(geometries) > chunk_size:
+        chunks = [geometries[i:i + chunk_size] for i in range(0, len(geometries), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(simplify_to_budget, chunks, [max_vertices] * len(chunks)))
+        simplified = np.concatenate(parts)
+    else:
+        simplified = simplify_to_budget(geometries, max_vertices)
+
+    after = count_vertices(simplified)
+    print(f"Vertices before: total {before.sum()}, max {before.max(initial=0)}, "
+          f"{int((before > max_vertices).sum())} features over {max_vertices}")
+    print(f"Vertices after:  total {after.sum()}, max {after.max(initial=0)}, "
+          f"{int((after > max_vertices).sum())} features over {max_vertices}")
+
+    out = gdf.copy()
+    out.geometry = gpd.GeoSeries(simplified, index=gdf.index, crs=gdf.crs)
+    return out
+
+
+if __name__ == "__main__":
+    # 1. Load the file
+    gdf = read_vector("single_polygon.shp")
+
+    # 2. Simplify each feature just enough to stay within the vertex budget
+    gdf = simplify_layer(gdf, max_vertices=500)
+
+    # 3. Export as new file (critical step!)
+    write_vector(gdf, "simplified_output.shp")
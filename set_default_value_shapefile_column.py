@@ -1,26 +1,201 @@
-import geopandas as gpd
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+import pandas as pd
+import pyogrio
+import shapely
+from concurrent.futures import ThreadPoolExecutor
 
-# Input shapefile
-input_file = r"...\reference_2000_nbu.shp"
-output_file = r"...\reference_2000_nbu_new.shp"
+from vector_io import USE_ARROW
 
-# Column name to update
-column_name = "class"
+# Shapefile members that hold geometry or indexes; copied byte for byte
+SHAPEFILE_GEOMETRY_FILES = (".shp", ".shx", ".prj", ".qix", ".sbn", ".sbx")
 
-# Default value
-default_value = 0  # or 0, or any value
 
-# Load shapefile
-gdf = gpd.read_file(input_file)
+def apply_updates(df, constants=None, expressions=None, join_table=None, join_on=None):
+    """
+    Applies attribute updates to a DataFrame and returns the updated column names.
+    constants: {column: value}
+    expressions: {column: pandas eval string, e.g. "area / 10000", or function of the frame}
+    join_table/join_on: DataFrame whose other columns are copied onto matching
+    rows (matched on the join_on key); unmatched rows keep their values.
+    """
+    updated = []
+    for column, value in (constants or {}).items():
+        df[column] = value
+        updated.append(column)
 
-# If column does not exist, create it
-if column_name not in gdf.columns:
-    gdf[column_name] = None
+    for column, expression in (expressions or {}).items():
+        df[column] = expression(df) if callable(expression) else df.eval(expression)
+        updated.append(column)
 
-# Assign default value to all rows
-gdf[column_name] = default_value
+    if join_table is not None:
+        lookup = join_table.drop_duplicates(join_on).set_index(join_on)
+        matched = df[join_on].isin(lookup.index)
+        for column in lookup.columns:
+            values = df[join_on].map(lookup[column])
+            df[column] = values.where(matched, df[column]) if column in df else values
+            updated.append(column)
+    return updated
 
-# Save updated shapefile
-gdf.to_file(output_file)
 
-print(f"Updated shapefile saved as {output_file}")
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "DATETIME"
+    return "TEXT"
+
+
+def _sql_values(series):
+    """Python values for sqlite: NaN/NaT become NULL, timestamps ISO strings."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        series = series.dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _gpkg_geometry(blob):
+    """Decodes a GeoPackage geometry blob (header with optional envelope, then WKB)."""
+    envelope = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(blob[3] >> 1) & 7]
+    return shapely.from_wkb(bytes(blob[8 + envelope:]))
+
+
+def _register_gpkg_functions(conn):
+    """
+    GDAL's R-tree triggers reference these spatial SQL functions, so plain
+    sqlite cannot prepare an UPDATE on the table without them. Attribute
+    updates never change fid or geometry, so the triggers do not actually run.
+    """
+    def bound(i):
+        return lambda blob: None if blob is None else float(shapely.bounds(_gpkg_geometry(blob))[i])
+
+    conn.create_function("ST_IsEmpty", 1, lambda blob: None if blob is None else int(_gpkg_geometry(blob).is_empty),
+                         deterministic=True)
+    for i, name in enumerate(("ST_MinX", "ST_MinY", "ST_MaxX", "ST_MaxY")):
+        conn.create_function(name, 1, bound(i), deterministic=True)
+
+
+def _update_geopackage(path, layer, constants, expressions, join_table, join_on, scratch=False):
+    """
+    Updates attribute columns in place with SQL; the geometry column is never touched.
+    scratch=True skips the rollback journal, for fresh copies that can simply be
+    discarded if the update fails.
+    """
+    info = pyogrio.read_info(path, layer=layer)
+    table, fid = info["layer_name"], info["fid_column"] or "fid"
+
+    if expressions or join_table is not None:
+        df = pyogrio.read_dataframe(path, layer=table, read_geometry=False, fid_as_index=True,
+                                    use_arrow=USE_ARROW)
+    else:
+        df = pd.DataFrame(index=pd.RangeIndex(0))
+    updated = apply_updates(df, constants, expressions, join_table, join_on)
+
+    # The connection's own context manager only commits; closing() releases the file
+    with closing(sqlite3.connect(path)) as conn, conn:
+        _register_gpkg_functions(conn)
+        if scratch:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+        for column in updated:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {_sql_type(df[column].dtype)}')
+                existing.add(column)
+
+        # Constants are one statement; computed values are written per fid
+        for column, value in (constants or {}).items():
+            conn.execute(f'UPDATE "{table}" SET "{column}" = ?', _sql_values(pd.Series([value])))
+        computed = [column for column in dict.fromkeys(updated) if column not in (constants or {})]
+        if computed:
+            assignments = ", ".join(f'"{column}" = ?' for column in computed)
+            rows = zip(*[_sql_values(df[column]) for column in computed], df.index.tolist())
+            conn.executemany(f'UPDATE "{table}" SET {assignments} WHERE "{fid}" = ?', rows)
+        conn.execute("UPDATE gpkg_contents SET last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') "
+                     "WHERE table_name = ?", (table,))
+    return updated
+
+
+def _update_shapefile(path, output_path, constants, expressions, join_table, join_on):
+    """Rewrites only the .dbf (and .cpg); .shp/.shx/.prj are copied unchanged."""
+    df = pyogrio.read_dataframe(path, read_geometry=False, use_arrow=USE_ARROW)
+    updated = apply_updates(df, constants, expressions, join_table, join_on)
+    too_long = [column for column in df.columns if len(column) > 10]
+    if too_long:
+        raise ValueError(f"Shapefile field names are limited to 10 characters: {too_long}")
+
+    stem, out_stem = os.path.splitext(path)[0], os.path.splitext(output_path)[0]
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        tmp_dbf = os.path.join(tmp, "table.dbf")
+        pyogrio.write_dataframe(df, tmp_dbf, driver="ESRI Shapefile", use_arrow=USE_ARROW)
+        if out_stem != stem:
+            for ext in SHAPEFILE_GEOMETRY_FILES:
+                if os.path.exists(stem + ext):
+                    shutil.copyfile(stem + ext, out_stem + ext)
+        os.replace(tmp_dbf, out_stem + ".dbf")
+        if os.path.exists(os.path.join(tmp, "table.cpg")):
+            os.replace(os.path.join(tmp, "table.cpg"), out_stem + ".cpg")
+    return updated
+
+
+def update_attributes(path, output_path=None, constants=None, expressions=None,
+                      join_table=None, join_on=None, layer=None):
+    """
+    Updates attribute columns of a Shapefile or GeoPackage without decoding or
+    rewriting geometries. Missing columns are created.
+    Shapefiles: only the .dbf is rewritten; the geometry files are copied
+    as is when output_path differs from path.
+    GeoPackages: the file is copied to output_path (if given) and the columns
+    are updated in place with SQL.
+    Returns the list of updated columns.
+    """
+    output_path = output_path or path
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".shp":
+        return _update_shapefile(path, output_path, constants, expressions, join_table, join_on)
+    if ext == ".gpkg":
+        scratch = os.path.abspath(output_path) != os.path.abspath(path)
+        if scratch:
+            shutil.copyfile(path, output_path)
+        return _update_geopackage(output_path, layer, constants, expressions, join_table, join_on, scratch)
+    raise ValueError(f"Attribute-only updates support .shp and .gpkg, not {ext}")
+
+
+def update_many(paths, output_dir=None, workers=4, **updates):
+    """
+    Applies the same updates to many files concurrently. Outputs keep their
+    file names in output_dir, or files are updated in place when it is None.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def run(path):
+        output_path = os.path.join(output_dir, os.path.basename(path)) if output_dir else None
+        return path, update_attributes(path, output_path, **updates)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(run, paths))
+
+
+if __name__ == "__main__":
+    # Input shapefile
+    input_file = r"...\reference_2000_nbu.shp"
+    output_file = r"...\reference_2000_nbu_new.shp"
+
+    # Column name to update
+    column_name = "class"
+
+    # Default value
+    default_value = 0  # or 0, or any value
+
+    # Assign default value to all rows (created if missing); geometries are copied untouched
+    update_attributes(input_file, output_file, constants={column_name: default_value})
+
+    print(f"Updated shapefile saved as {output_file}")
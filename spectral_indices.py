@@ -0,0 +1,225 @@
+import os
+import numpy as np
+import rasterio
+
+from raster_blocks import iter_windows, tiled_profile
+
+try:
+    import numexpr
+    USE_NUMEXPR = True
+except ImportError:
+    USE_NUMEXPR = False
+
+# Sensors in detection order: file name patterns, band keys -> band numbers,
+# and the spectral role of each band key
+SENSORS = {
+    "Landsat8": {
+        "patterns": ("lc08", "landsat8", "l8"),
+        "bands": {"B2": 2, "B3": 3, "B4": 4, "B5": 5, "B8": 8},
+        "roles": {"blue": "B2", "green": "B3", "red": "B4", "nir": "B5", "pan": "B8"},
+    },
+    "Landsat5": {
+        "patterns": ("lt05", "landsat5", "l5"),
+        "bands": {"B1": 1, "B2": 2, "B3": 3, "B4": 4, "B8": 8},
+        "roles": {"blue": "B1", "green": "B2", "red": "B3", "nir": "B4", "pan": "B8"},
+    },
+    "Landsat7": {
+        "patterns": ("le07", "landsat7", "l7"),
+        "bands": {"B1": 1, "B2": 2, "B3": 3, "B4": 4, "B8": 8},
+        "roles": {"blue": "B1", "green": "B2", "red": "B3", "nir": "B4", "pan": "B8"},
+    },
+    "Sentinel2": {
+        "patterns": ("sentinel", "s2", "sentinel-2"),
+        "bands": {"B2": 2, "B3": 3, "B4": 4, "B8": 8},
+        "roles": {"blue": "B2", "green": "B3", "red": "B4", "nir": "B8"},
+    },
+    "MODIS": {
+        "patterns": ("modis",),
+        "bands": {"B1": 1, "B2": 2},
+        "roles": {"red": "B1", "nir": "B2"},
+    },
+}
+
+
+def _normalized_difference(a, b, out, tmp):
+    np.subtract(a, b, out=out)
+    np.add(a, b, out=tmp)
+    np.divide(out, tmp, out=out)
+
+
+def _ndvi(bands, out, tmp):
+    _normalized_difference(bands["nir"], bands["red"], out, tmp)
+
+
+def _ndwi(bands, out, tmp):
+    _normalized_difference(bands["green"], bands["nir"], out, tmp)
+
+
+def _evi(bands, out, tmp):
+    nir, red, blue = bands["nir"], bands["red"], bands["blue"]
+    np.multiply(red, 6, out=tmp)
+    tmp += nir
+    tmp += 1
+    np.multiply(blue, 7.5, out=out)
+    tmp -= out
+    np.subtract(nir, red, out=out)
+    out *= 2.5
+    out /= tmp
+
+
+def _savi(bands, out, tmp, soil=0.5):
+    np.add(bands["nir"], bands["red"], out=tmp)
+    tmp += soil
+    np.subtract(bands["nir"], bands["red"], out=out)
+    out *= 1 + soil
+    out /= tmp
+
+
+# Spectral indices: roles read, numexpr expression and in-place NumPy kernel.
+# EVI and SAVI expect surface reflectance (0-1); use scale/offset for DNs.
+INDICES = {
+    "NDVI": {"roles": ("nir", "red"), "expression": "(nir - red) / (nir + red)", "kernel": _ndvi},
+    "NDWI": {"roles": ("green", "nir"), "expression": "(green - nir) / (green + nir)", "kernel": _ndwi},
+    "EVI": {"roles": ("nir", "red", "blue"),
+            "expression": "2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1)", "kernel": _evi},
+    "SAVI": {"roles": ("nir", "red"), "expression": "1.5 * (nir - red) / (nir + red + 0.5)", "kernel": _savi},
+}
+
+
+def detect_sensor(filename):
+    """Returns (sensor, {band key: band number}) from the file name, or ("Unknown", {})."""
+    fname = os.path.basename(filename).lower()
+    for sensor, spec in SENSORS.items():
+        if any(pattern in fname for pattern in spec["patterns"]):
+            return sensor, dict(spec["bands"])
+    return "Unknown", {}
+
+
+def sensor_roles(sensor, band_count=None):
+    """{role: band number} for a sensor, leaving out bands beyond band_count."""
+    spec = SENSORS.get(sensor)
+    if spec is None:
+        return {}
+    roles = {role: spec["bands"][key] for role, key in spec["roles"].items()}
+    if band_count is not None:
+        roles = {role: band for role, band in roles.items() if band <= band_count}
+    return roles
+
+
+def available_indices(roles):
+    """Names of the indices whose bands are all present in roles."""
+    return [name for name, spec in INDICES.items() if all(role in roles for role in spec["roles"])]
+
+
+def check_indices(indices, roles):
+    """
+    Validates index names against INDICES and the band roles available.
+    Returns the upper-cased names and the roles they need, in read order.
+    """
+    indices = [name.upper() for name in indices]
+    unknown = [name for name in indices if name not in INDICES]
+    if unknown:
+        raise ValueError(f"Unknown indices {unknown}; available: {list(INDICES)}")
+    needed = list(dict.fromkeys(role for name in indices for role in INDICES[name]["roles"]))
+    missing = [role for role in needed if role not in roles]
+    if missing:
+        raise ValueError(f"No band assigned to {missing} (roles: {roles})")
+    return indices, needed
+
+
+def evaluate_indices(bands, valid, indices, use_numexpr=None):
+    """
+    Evaluates indices from {role: float32 array} into one (len(indices), h, w)
+    float32 stack; invalid and infinite pixels are NaN.
+    """
+    use_numexpr = USE_NUMEXPR if use_numexpr is None else use_numexpr
+    out = np.empty((len(indices),) + valid.shape, dtype="float32")
+    tmp = np.empty(valid.shape, dtype="float32")
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for i, name in enumerate(indices):
+            if use_numexpr:
+                numexpr.evaluate(INDICES[name]["expression"], local_dict=bands,
+                                 out=out[i], casting="same_kind")
+            else:
+                INDICES[name]["kernel"](bands, out[i], tmp)
+    out[:, ~valid] = np.nan
+    out[np.isinf(out)] = np.nan
+    return out
+
+
+def read_bands(src, window, roles, needed, scale=1.0, offset=0.0, min_reflectance=None):
+    """
+    Reads the bands for the needed roles in one call, as float32 reflectance
+    (DN * scale + offset). Returns ({role: array}, valid mask); pixels that are
+    nodata, non-finite or below min_reflectance in any band are invalid.
+    """
+    stack = src.read([roles[role] for role in needed], window=window, out_dtype="float32")
+
+    valid = np.all(np.isfinite(stack), axis=0)
+    if src.nodata is not None:
+        valid &= np.all(stack != np.float32(src.nodata), axis=0)
+    if scale != 1.0:
+        stack *= np.float32(scale)
+    if offset:
+        stack += np.float32(offset)
+    if min_reflectance is not None:
+        valid &= np.all(stack > min_reflectance, axis=0)
+    return dict(zip(needed, stack)), valid
+
+
+def compute_indices(input_path, output_path, indices=("NDVI",), roles=None, scale=1.0, offset=0.0,
+                    min_reflectance=None, block_size=None, compress="lzw", use_numexpr=None):
+    """
+    Writes several spectral indices to one multi-band float32 GeoTIFF, one band per
+    index in the requested order, in a single pass over the scene.
+    Every band needed by any index is read once per window (scaled with
+    reflectance = DN * scale + offset) and all indices are evaluated from the
+    same arrays with numexpr if installed, or in-place NumPy kernels otherwise.
+    roles maps band roles (nir, red, green, blue) to 1-based band numbers; by
+    default they come from the sensor detected from the file name.
+    Pixels that are nodata, non-finite or below min_reflectance are NaN.
+    Returns {index: {min, max, mean, valid_pixels}}.
+    """
+    with rasterio.open(input_path) as src:
+        if roles is None:
+            sensor, _ = detect_sensor(input_path)
+            roles = sensor_roles(sensor, src.count)
+        indices, needed = check_indices(indices, roles)
+
+        profile = tiled_profile(src.profile, compress=compress,
+                                count=len(indices), dtype="float32", nodata=np.nan)
+        stats = {name: {"count": 0, "total": 0.0, "min": np.inf, "max": -np.inf} for name in indices}
+
+        with rasterio.open(output_path, "w", **profile) as dst:
+            for i, name in enumerate(indices, start=1):
+                dst.set_band_description(i, name)
+
+            for window in iter_windows(src, block_size, band=roles[needed[0]]):
+                bands, valid = read_bands(src, window, roles, needed, scale, offset, min_reflectance)
+
+                out = evaluate_indices(bands, valid, indices, use_numexpr)
+                dst.write(out, window=window)
+
+                for i, name in enumerate(indices):
+                    finite = out[i][np.isfinite(out[i])]
+                    if finite.size:
+                        s = stats[name]
+                        s["count"] += finite.size
+                        s["total"] += float(finite.sum(dtype="float64"))
+                        s["min"] = min(s["min"], float(finite.min()))
+                        s["max"] = max(s["max"], float(finite.max()))
+
+    return {name: {"min": s["min"] if s["count"] else np.nan,
+                   "max": s["max"] if s["count"] else np.nan,
+                   "mean": s["total"] / s["count"] if s["count"] else np.nan,
+                   "valid_pixels": s["count"]}
+            for name, s in stats.items()}
+
+
+if __name__ == "__main__":
+    input_path = r"...\L8_composite_2020.tif"
+    output_path = r"...\L8_composite_2020_indices.tif"
+
+    stats = compute_indices(input_path, output_path, ["NDVI", "NDWI", "EVI", "SAVI"])
+    for name, s in stats.items():
+        print(f"{name}: min {s['min']}, max {s['max']}, mean {s['mean']}")
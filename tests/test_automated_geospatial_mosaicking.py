@@ -0,0 +1,73 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("geopandas")
+from rasterio.mask import mask
+from rasterio.merge import merge
+
+from automated_geospatial_mosaicking import mosaic_tiles, streaming_mosaic
+from benchmark_suite import ORIGIN, PIXEL_SIZE, make_boundary, make_raster, make_tiles, scene_bounds
+from vector_io import read_vector
+
+
+@pytest.fixture
+def tiles(tmp_path):
+    tiles_dir = tmp_path / "tiles"
+    make_tiles(str(tiles_dir), grid=2, tile_size=96, bands=2, overlap=8)
+    return tiles_dir
+
+
+def test_mosaic_tiles_matches_clipping_to_files_then_merging(tmp_path, tiles):
+    boundary = make_boundary(str(tmp_path / "boundary.gpkg"), scene_bounds(2 * 96 - 8))
+    # A tile far outside the boundary is skipped
+    make_raster(str(tiles / "far.tif"), 32, 32, 2, "uint16", (1, 10000), nodata=0,
+                origin=(ORIGIN[0] + 1000 * PIXEL_SIZE, ORIGIN[1]))
+    output = tmp_path / "mosaic.tif"
+    mosaic_tiles(boundary, str(tiles), str(output))
+
+    clipped = []
+    for i, tile_path in enumerate(glob.glob(os.path.join(str(tiles), "*.tif"))):
+        if os.path.basename(tile_path) == "far.tif":
+            continue
+        with rasterio.open(tile_path) as src:
+            shapes = read_vector(boundary).to_crs(src.crs).geometry
+            image, transform = mask(src, shapes, crop=True)
+            profile = dict(src.profile, height=image.shape[1], width=image.shape[2], transform=transform)
+        path = tmp_path / f"clipped_{i}.tif"
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(image)
+        clipped.append(str(path))
+    expected, expected_transform = merge(clipped)
+
+    with rasterio.open(output) as dst:
+        assert dst.transform == expected_transform
+        np.testing.assert_array_equal(dst.read(), expected)
+
+
+@pytest.mark.parametrize("method", ["first", "last", "min", "max"])
+def test_streaming_mosaic_matches_rasterio_merge(tmp_path, tiles, method):
+    paths = sorted(glob.glob(os.path.join(str(tiles), "*.tif")))
+    output = tmp_path / f"{method}.tif"
+    streaming_mosaic(paths, str(output), method=method, block_size=40, threads=3)
+
+    expected, transform = merge(paths, method=method)
+    with rasterio.open(output) as dst:
+        assert dst.transform == transform
+        np.testing.assert_array_equal(dst.read(), expected)
+
+
+def test_streaming_mean_matches_sum_over_count(tmp_path, tiles):
+    paths = sorted(glob.glob(os.path.join(str(tiles), "*.tif")))
+    output = tmp_path / "mean.tif"
+    streaming_mosaic(paths, str(output), method="mean", block_size=40)
+
+    total, _ = merge(paths, method="sum", dtype="float64")
+    counts, _ = merge(paths, method="count", dtype="float64")
+    with np.errstate(invalid="ignore"):
+        expected = np.where(counts > 0, total / counts, 0).astype("uint16")
+    with rasterio.open(output) as dst:
+        np.testing.assert_array_equal(dst.read(), expected)
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("rasterio")
+gpd = pytest.importorskip("geopandas")
+from shapely.geometry import box
+
+from batch_raster_clip import process_directory
+from benchmark_suite import CRS, ORIGIN, PIXEL_SIZE, make_raster
+
+
+def _boundary(path, size):
+    minx, maxy = ORIGIN
+    geometry = box(minx, maxy - size * PIXEL_SIZE, minx + size * PIXEL_SIZE, maxy)
+    gpd.GeoDataFrame({"id": [1]}, geometry=[geometry], crs=CRS).to_file(path)
+    return str(path)
+
+
+@pytest.fixture
+def rasters(tmp_path):
+    input_root = tmp_path / "in"
+    input_root.mkdir()
+    for i in range(3):
+        make_raster(str(input_root / f"r{i}.tif"), 64, 64, seed=i)
+    return input_root
+
+
+@pytest.mark.parametrize("name", ["boundary.gpkg", "boundary.fgb", "boundary.shp"])
+def test_incremental_rerun_reclips_after_boundary_edit(tmp_path, rasters, name):
+    boundary = _boundary(tmp_path / name, 32)
+    output_root = str(tmp_path / "out")
+
+    first = process_directory(str(rasters), output_root, boundary, incremental=True)
+    assert (first["files"], first["skipped"]) == (3, 0)
+    unchanged = process_directory(str(rasters), output_root, boundary, incremental=True)
+    assert (unchanged["files"], unchanged["skipped"]) == (0, 3)
+
+    _boundary(tmp_path / name, 16)
+    edited = process_directory(str(rasters), output_root, boundary, incremental=True)
+    assert (edited["files"], edited["skipped"]) == (3, 0)
+
+
+def test_clip_matches_rasterio_mask(tmp_path, rasters):
+    import rasterio
+    from rasterio.mask import mask
+
+    boundary = _boundary(tmp_path / "boundary.gpkg", 40)
+    output_root = tmp_path / "out"
+    process_directory(str(rasters), str(output_root), boundary)
+
+    shapes = list(gpd.read_file(boundary).geometry)
+    with rasterio.open(rasters / "r0.tif") as src:
+        expected, transform = mask(src, shapes, crop=True, nodata=0)
+    with rasterio.open(output_root / "r0.tif") as clipped:
+        assert clipped.transform == transform
+        assert (clipped.read() == expected).all()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cache_summary_counts_one_lookup_per_raster(tmp_path, rasters, workers):
+    boundary = _boundary(tmp_path / "boundary.gpkg", 32)
+    process_directory(str(rasters), str(tmp_path / "warmup"), boundary)
+    summary = process_directory(str(rasters), str(tmp_path / "out"), boundary, workers=workers)
+    cache = summary["cache"]
+    assert cache["hits"] + cache["misses"] == 3
+
+
+def test_pool_run_matches_sequential_run(tmp_path, rasters):
+    import rasterio
+
+    nested = rasters / "nested"
+    nested.mkdir()
+    make_raster(str(nested / "r3.tif"), 64, 64, seed=3)
+    boundary = _boundary(tmp_path / "boundary.gpkg", 40)
+    sequential = process_directory(str(rasters), str(tmp_path / "seq"), boundary, workers=1)
+    pooled = process_directory(str(rasters), str(tmp_path / "pool"), boundary, workers=2)
+    assert sequential["files"] == pooled["files"] == 4
+    assert not sequential["failed"] and not pooled["failed"]
+
+    for name in ("r0.tif", "r1.tif", "r2.tif", "nested/r3.tif"):
+        with rasterio.open(tmp_path / "seq" / name) as a, rasterio.open(tmp_path / "pool" / name) as b:
+            assert a.transform == b.transform
+            assert (a.read() == b.read()).all()
+
+
+def test_failing_raster_is_reported_without_stopping_the_run(tmp_path, rasters):
+    (rasters / "broken.tif").write_bytes(b"not a tiff")
+    boundary = _boundary(tmp_path / "boundary.gpkg", 40)
+    summary = process_directory(str(rasters), str(tmp_path / "out"), boundary, workers=2)
+    assert list(summary["failed"]) == [str(rasters / "broken.tif")]
+    assert summary["files"] == 4
+    assert len(list((tmp_path / "out").glob("r*.tif"))) == 3
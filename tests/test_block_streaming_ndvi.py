@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_raster
+from block_streaming_ndvi import ndvi_block, windowed_ndvi
+from raster_blocks import iter_windows
+
+
+def test_ndvi_block_leaves_inputs_untouched():
+    nir = np.array([[0.5, 0.0, 0.3]], dtype="float32")
+    red = np.array([[0.1, 0.0, 0.3]], dtype="float32")
+    original = nir.copy()
+    ndvi = ndvi_block(nir, red, min_reflectance=None)
+    np.testing.assert_allclose(ndvi[0, [0, 2]], [0.4 / 0.6, 0.0], rtol=1e-6)
+    assert np.isnan(ndvi[0, 1])
+    np.testing.assert_array_equal(nir, original)
+
+
+@pytest.mark.parametrize("block_size", [None, 24])
+def test_windowed_ndvi_matches_full_raster(tmp_path, block_size):
+    scene = make_raster(str(tmp_path / "scene.tif"), 100, 70, count=2, dtype="uint16",
+                        value_range=(0, 3000), nodata=0)
+    output = str(tmp_path / "ndvi.tif")
+    stats = windowed_ndvi(scene, output, nir_band=2, red_band=1, min_reflectance=None, block_size=block_size)
+
+    with rasterio.open(scene) as src:
+        red, nir = src.read().astype("float64")
+    valid = (red != 0) & (nir != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.where(valid, (nir - red) / (nir + red), np.nan)
+    with rasterio.open(output) as dst:
+        np.testing.assert_allclose(dst.read(1), expected, rtol=1e-6, equal_nan=True)
+    assert stats["valid_pixels"] == np.isfinite(expected).sum()
+    np.testing.assert_allclose(stats["mean"], np.nanmean(expected), rtol=1e-6)
+
+
+def test_iter_windows_cover_every_pixel_once(tmp_path):
+    scene = make_raster(str(tmp_path / "scene.tif"), 100, 70)
+    with rasterio.open(scene) as src:
+        for block_size in (None, 16, 33):
+            covered = np.zeros((src.height, src.width), dtype="int64")
+            for window in iter_windows(src, block_size):
+                covered[window.toslices()] += 1
+            assert (covered == 1).all()
@@ -0,0 +1,38 @@
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+import shapely
+
+from benchmark_suite import CRS, make_polygons, random_polygons, scene_bounds
+from dissolving_shapefiles import dissolve_layers, parallel_union, repair_invalid
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_union_matches_union_all(workers):
+    geometries = gpd.GeoSeries(random_polygons(300, scene_bounds(512), seed=1), crs=CRS)
+    expected = shapely.union_all(geometries.values)
+    result = parallel_union(geometries, workers=workers, partitions_per_worker=2)
+    assert result.symmetric_difference(expected).area < 1e-6 * expected.area
+
+
+def test_repair_touches_only_invalid_geometries():
+    geometries = gpd.GeoSeries(random_polygons(50, scene_bounds(512), invalid_fraction=0.3, seed=2))
+    repaired = repair_invalid(geometries)
+    assert repaired.is_valid.all()
+    valid = geometries.is_valid
+    assert (repaired[valid].values == geometries[valid].values).all()
+
+
+def test_dissolve_layers_matches_geopandas_dissolve(tmp_path):
+    bounds = scene_bounds(512)
+    paths = [make_polygons(str(tmp_path / f"layer{i}.gpkg"), 200, bounds, seed=i) for i in range(2)]
+    result = dissolve_layers(paths, str(tmp_path / "dissolved.gpkg"), workers=2)
+
+    combined = gpd.pd.concat([gpd.read_file(path) for path in paths], ignore_index=True)
+    # The original script repaired every geometry with buffer(0)
+    combined["geometry"] = combined.geometry.buffer(0)
+    expected = combined.dissolve().to_crs(epsg=32639)
+    assert len(result) == 1
+    assert result["area_sqm"].iloc[0] == pytest.approx(expected.area.iloc[0], rel=1e-6)
+    written = gpd.read_file(tmp_path / "dissolved.gpkg")
+    assert written["area_sqkm"].iloc[0] == pytest.approx(result["area_sqm"].iloc[0] / 1e6)
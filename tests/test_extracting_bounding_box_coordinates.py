@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("geopandas")
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_polygons, make_raster, scene_bounds
+from extracting_bounding_box_coordinates import _streamed_bounds, get_bounds, get_directory_bounds
+from vector_io import read_vector
+
+
+@pytest.mark.parametrize("ext", [".shp", ".gpkg", ".fgb", ".geojson", ".parquet"])
+def test_vector_bounds_match_total_bounds(tmp_path, ext):
+    path = make_polygons(str(tmp_path / f"layer{ext}"), 80, scene_bounds(256), crs="EPSG:32639")
+    layer = read_vector(path)
+    expected = layer.total_bounds
+    result = get_bounds(path)
+    np.testing.assert_allclose(result["bounds"], expected)
+    np.testing.assert_allclose(_streamed_bounds(path, batch_size=16), expected)
+
+    # The geographic box encloses every feature
+    minlon, minlat, maxlon, maxlat = result["bounds_4326"]
+    lonlat = layer.to_crs("EPSG:4326").total_bounds
+    assert minlon <= lonlat[0] and minlat <= lonlat[1] and maxlon >= lonlat[2] and maxlat >= lonlat[3]
+
+
+def test_raster_and_directory_bounds(tmp_path):
+    raster = make_raster(str(tmp_path / "scene.tif"), 40, 30)
+    make_polygons(str(tmp_path / "layer.gpkg"), 10, scene_bounds(40))
+    with rasterio.open(raster) as src:
+        assert get_bounds(raster)["bounds"] == tuple(src.bounds)
+    results = get_directory_bounds(str(tmp_path))
+    assert [os.path.basename(r["path"]) for r in results] == ["layer.gpkg", "scene.tif"]
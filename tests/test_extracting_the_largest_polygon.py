@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+import shapely
+from shapely.geometry import MultiPolygon, box
+
+from extracting_the_largest_polygon_of_a_multipolygon import largest_parts
+
+
+@pytest.fixture
+def layer():
+    rng = np.random.default_rng(0)
+    geometries = []
+    for i in range(60):
+        n_parts = rng.integers(1, 6)
+        parts = [box(x, i * 100, x + w, i * 100 + w)
+                 for x, w in zip(np.arange(n_parts) * 100, rng.uniform(1, 50, n_parts))]
+        geometries.append(MultiPolygon(parts) if n_parts > 1 else parts[0])
+    return gpd.GeoDataFrame({"id": range(60), "name": [f"f{i}" for i in range(60)]},
+                            geometry=geometries, crs="EPSG:32639")
+
+
+def _reference(geometry, top_n, min_area=None):
+    """The largest parts of one feature, one feature at a time."""
+    parts = sorted(getattr(geometry, "geoms", [geometry]), key=lambda part: part.area, reverse=True)
+    if min_area is not None:
+        parts = [part for part in parts if part.area >= min_area]
+    return parts[:top_n]
+
+
+@pytest.mark.parametrize("top_n", [1, 3])
+def test_largest_parts_match_per_feature_reference(layer, top_n):
+    out = largest_parts(layer, top_n=top_n)
+    assert out["id"].tolist() == layer["id"].tolist()
+    assert out["name"].tolist() == layer["name"].tolist()
+    for geometry, original in zip(out.geometry, layer.geometry):
+        expected = _reference(original, top_n)
+        if top_n == 1:
+            assert geometry.equals(expected[0])
+        else:
+            assert sorted(shapely.area(list(geometry.geoms))) == sorted(part.area for part in expected)
+
+
+def test_min_area_drops_small_parts_and_empty_features(layer):
+    out = largest_parts(layer, top_n=2, min_area=400)
+    expected_ids = [i for i, geometry in zip(layer["id"], layer.geometry) if _reference(geometry, 2, 400)]
+    assert out["id"].tolist() == expected_ids
+    for geometry, original in zip(out.geometry, layer.set_index("id").loc[expected_ids].geometry):
+        assert geometry.area == pytest.approx(sum(p.area for p in _reference(original, 2, 400)))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("pyogrio")
+from shapely.geometry import Point
+
+from field_profiler import gdb_layers, profile_fields, profile_layers
+
+
+def _layer(n, seed):
+    rng = np.random.default_rng(seed)
+    land_use = rng.choice(["urban", "forest", "water", None], n, p=[0.5, 0.3, 0.1, 0.1])
+    return gpd.GeoDataFrame({"land_use": land_use, "code": rng.integers(0, 7, n), "uid": np.arange(n)},
+                            geometry=[Point(i, i) for i in range(n)], crs="EPSG:4326")
+
+
+@pytest.mark.parametrize("ext", [".shp", ".gpkg", ".parquet"])
+def test_profile_matches_pandas_value_counts(tmp_path, ext):
+    gdf = _layer(1000, 0)
+    path = str(tmp_path / f"layer{ext}")
+    if ext == ".parquet":
+        gdf.to_parquet(path)
+    else:
+        gdf.to_file(path)
+
+    profiles = profile_fields(path, ["land_use", "code"], batch_size=128)
+    for field in ("land_use", "code"):
+        expected = gdf[field].value_counts(dropna=True)
+        profile = profiles[field]
+        assert profile["rows"] == 1000
+        assert profile["nulls"] == int(gdf[field].isna().sum())
+        assert profile["cardinality"] == len(expected)
+        assert profile["value_counts"].to_dict() == expected.to_dict()
+
+
+def test_high_cardinality_fields_stop_counting(tmp_path):
+    path = str(tmp_path / "layer.gpkg")
+    _layer(500, 1).to_file(path)
+    profile = profile_fields(path, "uid", batch_size=100, max_unique=50)["uid"]
+    assert profile["rows"] == 500
+    assert profile["cardinality"] is None
+    assert profile["value_counts"].empty
+
+
+def test_every_layer_with_the_field_is_profiled(tmp_path):
+    path = str(tmp_path / "multi.gpkg")
+    layers = {"parcels": _layer(300, 2), "roads": _layer(200, 3)}
+    for name, gdf in layers.items():
+        gdf.to_file(path, layer=name)
+    _layer(10, 4).drop(columns="land_use").to_file(path, layer="points")
+
+    selected = gdb_layers(path, field="land_use")
+    assert sorted(name for _, name in selected) == ["parcels", "roads"]
+    results = profile_layers(selected, ["land_use"], batch_size=64)
+    for (_, name), profiles in results.items():
+        expected = layers[name]["land_use"].value_counts()
+        assert profiles["land_use"]["value_counts"].to_dict() == expected.to_dict()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("pyarrow")
+import shapely
+
+from benchmark_suite import random_polygons, scene_bounds
+from geometry_cache import ReprojectionCache
+
+
+@pytest.fixture
+def boundary():
+    return gpd.GeoDataFrame({"id": np.arange(20)}, geometry=random_polygons(20, scene_bounds(256), seed=2),
+                            crs="EPSG:32639")
+
+
+def test_reprojection_matches_to_crs(boundary):
+    cache = ReprojectionCache()
+    result = cache.get(boundary, "EPSG:4326")
+    expected = boundary.to_crs("EPSG:4326")
+    assert result.crs == expected.crs
+    assert shapely.equals_exact(result.geometry.values, expected.geometry.values, tolerance=1e-9).all()
+    assert cache.prepared(boundary, "EPSG:4326", count=False).equals(shapely.union_all(expected.geometry.values))
+
+
+def test_one_lookup_per_call(boundary):
+    cache = ReprojectionCache()
+    cache.get(boundary, "EPSG:4326")
+    cache.shapes(boundary, "EPSG:4326", count=False)
+    cache.prepared(boundary, "EPSG:4326")
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.reset_stats()
+    assert cache.stats() == {"hits": 0, "misses": 0, "disk_hits": 0, "entries": 1}
+
+
+def test_eviction_drops_source_hashes(boundary):
+    cache = ReprojectionCache(maxsize=1)
+    other = boundary.copy()
+    other["geometry"] = boundary.geometry.translate(1000, 0)
+    cache.get(boundary, "EPSG:4326")
+    cache.get(other, "EPSG:4326")
+    assert len(cache._entries) == 1
+    assert [key for _, key in cache._hashes.values()] == [cache.source_key(other)]
+
+
+def test_cache_dir_is_shared_between_instances(tmp_path, boundary):
+    first = ReprojectionCache(cache_dir=str(tmp_path))
+    expected = first.get(boundary, "EPSG:4326")
+    second = ReprojectionCache(cache_dir=str(tmp_path))
+    result = second.get(boundary, "EPSG:4326")
+    assert second.disk_hits == 1
+    assert shapely.equals_exact(result.geometry.values, expected.geometry.values, tolerance=0).all()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_raster
+from geotiff_to_excel import geotiff_to_table
+
+
+def _per_pixel_reference(path):
+    """The original per-pixel loop of geotiff_to_excel."""
+    with rasterio.open(path) as src:
+        array = src.read(1)
+        transform = src.transform
+    data = []
+    for row in range(array.shape[0]):
+        for col in range(array.shape[1]):
+            x, y = transform * (col, row)
+            data.append((x, y, array[row, col]))
+    return pd.DataFrame(data, columns=["X", "Y", "Value"])
+
+
+@pytest.mark.parametrize("ext", [".csv", ".parquet", ".xlsx"])
+def test_table_matches_per_pixel_loop(tmp_path, ext):
+    if ext == ".parquet":
+        pytest.importorskip("pyarrow")
+    if ext == ".xlsx":
+        pytest.importorskip("openpyxl")
+    raster = make_raster(str(tmp_path / "raster.tif"), 37, 23, value_range=(0, 50))
+    output = str(tmp_path / f"table{ext}")
+    geotiff_to_table(raster, output, pixels_per_block=100)
+
+    reader = {".csv": pd.read_csv, ".parquet": pd.read_parquet, ".xlsx": pd.read_excel}[ext]
+    table = reader(output)
+    expected = _per_pixel_reference(raster)
+    np.testing.assert_allclose(table[["X", "Y"]].to_numpy(), expected[["X", "Y"]].to_numpy())
+    np.testing.assert_array_equal(table["Value"].to_numpy(), expected["Value"].to_numpy())
+
+
+def test_skip_nodata_drops_only_nodata_pixels(tmp_path):
+    raster = make_raster(str(tmp_path / "raster.tif"), 30, 20, value_range=(0, 4), nodata=0)
+    output = str(tmp_path / "table.csv")
+    geotiff_to_table(raster, output, pixels_per_block=64, skip_nodata=True)
+
+    expected = _per_pixel_reference(raster)
+    expected = expected[expected["Value"] != 0].reset_index(drop=True)
+    table = pd.read_csv(output)
+    np.testing.assert_allclose(table[["X", "Y"]].to_numpy(), expected[["X", "Y"]].to_numpy())
+    np.testing.assert_array_equal(table["Value"].to_numpy(), expected["Value"].to_numpy())
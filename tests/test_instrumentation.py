@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("rasterio")
+pytest.importorskip("geopandas")
+
+from batch_raster_clip import process_directory
+from benchmark_suite import make_boundary, make_raster, run_suite, scene_bounds
+from instrumentation import profiler
+
+TINY = {"raster_size": 256, "bands": 2, "tiles": 2, "tile_size": 128,
+        "kmz_features": 10, "polygons": 10, "vertices": 8}
+
+
+def _calls(report):
+    return {name: s["calls"] for name, s in report["summary"].items()}
+
+
+def test_stage_calls_do_not_depend_on_worker_count(tmp_path):
+    workflows = ("clip", "pixel_counts")
+    single = _calls(run_suite(str(tmp_path), "small", workflows, workers=1, **TINY))
+    pooled = _calls(run_suite(str(tmp_path), "small", workflows, workers=2, **TINY))
+    assert single["bench.clip"] == pooled["bench.clip"] == 1
+    assert single["clip.read"] == pooled["clip.read"] == 1
+    assert single["pixel_counts.read"] == pooled["pixel_counts.read"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pool_workers_return_only_their_own_records(tmp_path, workers):
+    input_root = tmp_path / "in"
+    input_root.mkdir()
+    for i in range(3):
+        make_raster(str(input_root / f"r{i}.tif"), 64, 64, seed=i)
+    boundary = make_boundary(str(tmp_path / "boundary.gpkg"), scene_bounds(64))
+
+    profiler.reset()
+    was_enabled, profiler.enabled = profiler.enabled, True
+    try:
+        with profiler.stage("before_run"):
+            pass
+        process_directory(str(input_root), str(tmp_path / "out"), boundary, workers=workers)
+        calls = {name: s["calls"] for name, s in profiler.summary().items()}
+    finally:
+        profiler.enabled = was_enabled
+        profiler.reset()
+    assert calls["before_run"] == 1
+    assert calls["clip.read"] == 3
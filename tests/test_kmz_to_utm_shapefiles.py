@@ -0,0 +1,113 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+import shapely
+from shapely.geometry import Polygon
+
+from kmz_to_utm_shapefiles import iter_kml_features, iter_kmz_feature_batches, parse_coordinates
+
+KML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document>
+<Placemark><name>loose</name><Point><coordinates>10,20</coordinates></Point></Placemark>
+<Folder><name>Urban</name>
+  <Placemark><name>block</name><description>with hole</description>
+    <Polygon>
+      <outerBoundaryIs><LinearRing><coordinates>0,0,0 4,0,0 4,4,0 0,4,0 0,0,0</coordinates></LinearRing></outerBoundaryIs>
+      <innerBoundaryIs><LinearRing><coordinates>1,1 2,1 2,2 1,2 1,1</coordinates></LinearRing></innerBoundaryIs>
+    </Polygon></Placemark>
+  <Folder><name>Roads</name>
+    <Placemark><name>road</name><MultiGeometry>
+      <LineString><coordinates>0,0 1,1</coordinates></LineString>
+      <LineString><coordinates>2,2 3,3 4,4</coordinates></LineString>
+    </MultiGeometry></Placemark>
+  </Folder>
+  <Placemark><name>after</name><Point><coordinates>5,6,7</coordinates></Point></Placemark>
+</Folder>
+</Document></kml>
+"""
+
+
+def test_iterparse_reader_follows_folders_and_geometries():
+    features = list(iter_kml_features(io.BytesIO(KML)))
+    assert [(folder, f["name"]) for folder, f in features] == [
+        ("Unknown", "loose"), ("Urban", "block"), ("Roads", "road"), ("Urban", "after")]
+
+    geometries = {f["name"]: f["geometry"] for _, f in features}
+    assert geometries["loose"].equals(shapely.Point(10, 20))
+    assert geometries["block"].equals(Polygon([(0, 0), (4, 0), (4, 4), (0, 4)],
+                                              [[(1, 1), (2, 1), (2, 2), (1, 2)]]))
+    assert geometries["road"].geom_type == "MultiLineString"
+    assert shapely.get_num_coordinates(geometries["road"]) == 5
+    assert geometries["after"].equals(shapely.Point(5, 6))
+    assert dict((f["name"], f["description"]) for _, f in features)["block"] == "with hole"
+
+
+def test_kmz_batches_match_generated_features(tmp_path):
+    from benchmark_suite import CRS, make_kmz, random_polygons, scene_bounds
+
+    bounds = scene_bounds(512)
+    kmz = make_kmz(str(tmp_path / "features.kmz"), 50, bounds, folders=3, seed=4)
+    expected = gpd.GeoSeries(random_polygons(50, bounds, 16, seed=4), crs=CRS).to_crs("EPSG:4326")
+
+    batches = list(iter_kmz_feature_batches(kmz, batch_size=7))
+    assert all(len(features) <= 7 for _, features in batches)
+    parsed = {int(f["name"].split()[1]): (folder, f["geometry"]) for folder, features in batches for f in features}
+    assert sorted(parsed) == list(range(50))
+    for i, (folder, geometry) in parsed.items():
+        assert folder == f"Class {i % 3}"
+        np.testing.assert_allclose(shapely.get_coordinates(geometry),
+                                   shapely.get_coordinates(expected.iloc[i]), atol=1e-7)
+
+
+def test_kmz_without_kml_is_rejected(tmp_path):
+    path = tmp_path / "empty.kmz"
+    with zipfile.ZipFile(path, "w") as kmz:
+        kmz.writestr("readme.txt", "no kml")
+    with pytest.raises(ValueError):
+        list(iter_kmz_feature_batches(str(path)))
+
+
+def test_parse_coordinates_skips_bad_tuples():
+    assert parse_coordinates(" 1,2,3 bad 4,5 x,y ") == [(1.0, 2.0), (4.0, 5.0)]
+
+
+def test_utm_epsg_codes_match_scalar_get_utm_crs():
+    from kmz_to_utm_shapefiles import get_utm_crs, utm_epsg_codes
+
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-179.9, 179.9, 500)
+    lat = rng.uniform(-80, 84, 500)
+    expected = [int(get_utm_crs(x, y).split(":")[1]) for x, y in zip(lon, lat)]
+    assert utm_epsg_codes(lon, lat).tolist() == expected
+
+
+def test_per_feature_zones_reproject_like_to_crs(tmp_path):
+    from kmz_to_utm_shapefiles import kmz_to_utm_zone_shapefiles
+
+    # Squares either side of the 6E/12E zone boundaries (zones 31, 32 and 33 north)
+    squares = {f"sq{i}": shapely.box(lon, 45, lon + 0.1, 45.1) for i, lon in enumerate((5.5, 6.5, 11.5, 12.5))}
+    placemarks = "".join(
+        f"<Placemark><name>{name}</name><Polygon><outerBoundaryIs><LinearRing><coordinates>"
+        + " ".join(f"{x},{y}" for x, y in shapely.get_coordinates(geometry))
+        + "</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>"
+        for name, geometry in squares.items())
+    kmz = tmp_path / "zones.kmz"
+    with zipfile.ZipFile(kmz, "w") as archive:
+        archive.writestr("doc.kml", '<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Folder>'
+                                    f"<name>Fields</name>{placemarks}</Folder></Document></kml>")
+
+    written = kmz_to_utm_zone_shapefiles(str(kmz), str(tmp_path / "out"), 2000, batch_size=3)
+    assert sorted(p.rsplit("_", 1)[-1] for p in written) == ["utm31n.shp", "utm32n.shp", "utm33n.shp"]
+    assert sum(written.values()) == 4
+
+    for path in written:
+        out = gpd.read_file(path)
+        for name, geometry in zip(out["Name"], out.geometry):
+            expected = gpd.GeoSeries([squares[name]], crs="EPSG:4326").to_crs(out.crs).iloc[0]
+            # Shapefiles store rings in their own orientation
+            np.testing.assert_allclose(shapely.get_coordinates(shapely.normalize(geometry)),
+                                       shapely.get_coordinates(shapely.normalize(expected)), atol=1e-3)
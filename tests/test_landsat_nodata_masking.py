@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_origin
+
+from landsat_nodata_masking import nodata_value, remap_directory, remap_nodata
+
+
+def _composite(path, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(0, 0.5, (3, 50, 70)).astype("float32")
+    data[:, 5:15, 10:30] = np.float32(nodata_value)
+    data[1, 40:45, 60:] = np.nan
+    profile = {"driver": "GTiff", "width": 70, "height": 50, "count": 3, "dtype": "float32",
+               "crs": "EPSG:32610", "transform": from_origin(500000, 4200000, 30, 30)}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+    return str(path), data
+
+
+@pytest.mark.parametrize("include_nan", [False, True])
+def test_remap_matches_whole_array_replacement(tmp_path, include_nan):
+    source, data = _composite(tmp_path / "composite.tif")
+    output = str(tmp_path / "masked.tif")
+    remap_nodata(source, output, include_nan=include_nan, block_size=16, compress="zstd")
+
+    expected = data.copy()
+    expected[expected == np.float32(nodata_value)] = -9999
+    if include_nan:
+        expected[np.isnan(expected)] = -9999
+    with rasterio.open(output) as dst:
+        assert dst.nodata == -9999
+        assert dst.profile["tiled"] and dst.block_shapes[0] == (16, 16)
+        np.testing.assert_array_equal(dst.read(), expected)
+
+
+def test_remap_directory_writes_every_scene(tmp_path):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    for i in range(3):
+        _composite(input_dir / f"scene{i}.tif", seed=i)
+    failed = remap_directory(str(input_dir), str(tmp_path / "out"), workers=2)
+    assert not failed
+    for i in range(3):
+        with rasterio.open(tmp_path / "out" / f"scene{i}_n.tif") as dst:
+            assert (dst.read()[:, 5:15, 10:30] == -9999).all()
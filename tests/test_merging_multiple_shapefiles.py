@@ -0,0 +1,49 @@
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("pyogrio")
+from shapely.geometry import MultiPolygon, box
+
+from merging_multiple_shapefiles_into_a_single_layer import merge_layers
+from vector_io import read_vector
+
+
+def test_merge_mixed_polygon_types_into_flatgeobuf(tmp_path):
+    polygons = gpd.GeoDataFrame({"name": ["a", "b"]}, geometry=[box(0, 0, 1, 1), box(2, 2, 3, 3)],
+                                crs="EPSG:4326")
+    multipolygons = gpd.GeoDataFrame({"name": ["c"]},
+                                     geometry=[MultiPolygon([box(4, 4, 5, 5), box(6, 6, 7, 7)])],
+                                     crs="EPSG:4326")
+    paths = [tmp_path / "polygons.gpkg", tmp_path / "multipolygons.gpkg"]
+    polygons.to_file(paths[0])
+    multipolygons.to_file(paths[1])
+
+    output_path = tmp_path / "merged.fgb"
+    assert merge_layers([str(path) for path in paths], str(output_path), workers=1) == 3
+
+    merged = read_vector(str(output_path))
+    assert sorted(merged["name"]) == ["a", "b", "c"]
+    assert set(merged.geom_type) == {"MultiPolygon"}
+    assert sorted(merged["source"]) == ["multipolygons", "polygons", "polygons"]
+
+
+def test_merge_reconciles_field_types_and_reprojects(tmp_path):
+    from merging_multiple_shapefiles_into_a_single_layer import reconcile_schemas
+
+    utm = gpd.GeoDataFrame({"code": [1, 2], "label": ["a", "b"]},
+                           geometry=[box(500000, 0, 500100, 100), box(500200, 0, 500300, 100)], crs="EPSG:32631")
+    wgs = gpd.GeoDataFrame({"code": [0.5], "extra": [True]}, geometry=[box(3, 0, 3.001, 0.001)], crs="EPSG:4326")
+    paths = [str(tmp_path / "utm.gpkg"), str(tmp_path / "wgs.gpkg")]
+    utm.to_file(paths[0])
+    wgs.to_file(paths[1])
+
+    schema, _ = reconcile_schemas(paths)
+    assert schema == {"code": "float64", "label": "string", "extra": "boolean"}
+
+    output_path = str(tmp_path / "merged.gpkg")
+    assert merge_layers(paths, output_path, workers=2) == 3
+    merged = read_vector(output_path).sort_values("code")
+    assert merged.crs.to_epsg() == 32631
+    assert merged["code"].tolist() == [0.5, 1.0, 2.0]
+    expected = wgs.to_crs("EPSG:32631").geometry.iloc[0]
+    assert merged.geometry.iloc[0].symmetric_difference(expected).area < 1e-6
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_raster
+from ndvi_time_series import OUTPUT_BANDS, scene_date, temporal_ndvi
+
+YEARS = (2000, 2005, 2012, 2020)
+
+
+def _expected(scenes):
+    """The time-series bands computed pixel by pixel from the full NDVI stack."""
+    stack = []
+    for path in scenes:
+        with rasterio.open(path) as src:
+            red, nir = src.read().astype("float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stack.append(np.where((red != 0) & (nir != 0), (nir - red) / (nir + red), np.nan))
+    stack = np.stack(stack)
+    dates = np.array(YEARS, dtype="float64")
+
+    expected = np.full((len(OUTPUT_BANDS),) + stack.shape[1:], np.nan)
+    for row, col in np.ndindex(stack.shape[1:]):
+        series = stack[:, row, col]
+        valid = np.isfinite(series)
+        expected[6, row, col] = valid.sum()
+        if valid.any():
+            y = series[valid]
+            expected[:4, row, col] = y.mean(), y.min(), y.max(), y.std()
+        if valid.sum() >= 2:
+            expected[4, row, col] = np.polyfit(dates[valid], series[valid], 1)[0]
+        later = np.flatnonzero(valid[1:])
+        if valid[0] and later.size:
+            expected[5, row, col] = series[1 + later[-1]] - series[0]
+    return expected
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_temporal_ndvi_matches_per_pixel_stats(tmp_path, workers):
+    scenes = [make_raster(str(tmp_path / f"scene_{year}.tif"), 60, 45, count=2, dtype="uint16",
+                          value_range=(0, 12), nodata=0, seed=i)
+              for i, year in enumerate(YEARS)]
+    output = str(tmp_path / "stats.tif")
+    result = temporal_ndvi(scenes, output, roles={"nir": 2, "red": 1}, block_size=16, workers=workers)
+    assert result["dates"] == [float(year) for year in YEARS]
+
+    expected = _expected(scenes)
+    with rasterio.open(output) as dst:
+        assert dst.descriptions == OUTPUT_BANDS
+        np.testing.assert_allclose(dst.read(), expected, rtol=1e-5, atol=1e-6, equal_nan=True)
+
+
+def test_misaligned_scenes_are_rejected(tmp_path):
+    first = make_raster(str(tmp_path / "a_2000.tif"), 30, 30, count=2)
+    second = make_raster(str(tmp_path / "b_2010.tif"), 30, 31, count=2)
+    with pytest.raises(ValueError):
+        temporal_ndvi([first, second], str(tmp_path / "out.tif"), roles={"nir": 2, "red": 1})
+
+
+def test_scene_date():
+    assert scene_date("L5_composite_2000.tif", 3) == 2000.0
+    assert scene_date("scene_12345.tif", 3) == 3.0
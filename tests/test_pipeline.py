@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+gpd = pytest.importorskip("geopandas")
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from batch_raster_clip import clip_raster_to_shape
+from benchmark_suite import CRS, ORIGIN, PIXEL_SIZE, make_raster
+from pipeline import run_fused, run_pipeline
+from spectral_indices import compute_indices
+
+
+def _boundary(path, size=64):
+    minx, maxy = ORIGIN
+    geometry = box(minx + 5.5 * PIXEL_SIZE, maxy - (size - 7) * PIXEL_SIZE,
+                   minx + (size - 9) * PIXEL_SIZE, maxy - 3.5 * PIXEL_SIZE)
+    gpd.GeoDataFrame({"id": [1]}, geometry=[geometry], crs=CRS).to_file(path)
+    return str(path)
+
+
+def _write(path, data, nodata):
+    profile = {"driver": "GTiff", "width": data.shape[2], "height": data.shape[1], "count": data.shape[0],
+               "dtype": data.dtype.name, "crs": CRS, "nodata": nodata,
+               "transform": from_origin(*ORIGIN, PIXEL_SIZE, PIXEL_SIZE)}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("dtype, low, high", [("float64", 0.1, 1.0), ("uint32", 2 ** 24, 2 ** 32 - 1),
+                                               ("int32", -2 ** 31 + 1, 2 ** 31 - 1)])
+def test_fused_clip_keeps_wide_values_exact(tmp_path, dtype, low, high):
+    rng = np.random.default_rng(0)
+    if dtype == "float64":
+        data = rng.uniform(low, high, (2, 64, 64))
+    else:
+        data = rng.integers(low, high, (2, 64, 64), endpoint=False)
+    source = _write(tmp_path / "source.tif", data.astype(dtype), nodata=0)
+    boundary = _boundary(tmp_path / "boundary.gpkg")
+
+    run_fused(source, str(tmp_path / "fused.tif"), [{"clip": {"boundary": boundary}}], block_size=16)
+    clip_raster_to_shape(source, str(tmp_path / "chained.tif"), boundary)
+
+    with rasterio.open(tmp_path / "fused.tif") as fused, rasterio.open(tmp_path / "chained.tif") as chained:
+        assert fused.dtypes[0] == dtype
+        assert fused.transform == chained.transform
+        np.testing.assert_array_equal(fused.read(), chained.read())
+
+
+def test_pipeline_ndvi_matches_chained_scripts(tmp_path):
+    scene = make_raster(str(tmp_path / "l8_scene.tif"), 64, 64, count=5, dtype="uint16",
+                        value_range=(1, 10000), nodata=0)
+    boundary = _boundary(tmp_path / "boundary.gpkg")
+    output_dir = tmp_path / "fused"
+    failed = run_pipeline({
+        "inputs": [scene], "output_dir": str(output_dir), "suffix": "_ndvi", "workers": 1, "block_size": 16,
+        "steps": [{"clip": {"boundary": boundary}}, {"indices": {"indices": ["NDVI"]}}],
+    })
+    assert not failed
+
+    clip_raster_to_shape(scene, str(tmp_path / "chained" / "l8_scene.tif"), boundary)
+    compute_indices(str(tmp_path / "chained" / "l8_scene.tif"), str(tmp_path / "chained_ndvi.tif"), ["NDVI"])
+
+    with rasterio.open(output_dir / "l8_scene_ndvi.tif") as fused, \
+            rasterio.open(tmp_path / "chained_ndvi.tif") as chained:
+        assert fused.transform == chained.transform
+        np.testing.assert_allclose(fused.read(1), chained.read(1), rtol=1e-6, equal_nan=True)
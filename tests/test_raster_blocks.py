@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_raster
+from raster_blocks import ensure_overviews, nodata_in_dtype, read_preview, streamed_histogram
+
+
+@pytest.mark.parametrize("overviews", [False, True])
+def test_read_preview_matches_decimated_full_read(tmp_path, overviews):
+    # Values come in aligned 8x8 patches, so every 4x4 cell of the preview is constant
+    path = make_raster(str(tmp_path / "scene.tif"), 512, 256, dtype="uint16", value_range=(0, 50), nodata=0)
+    if overviews:
+        assert ensure_overviews(path, min_size=64) == [2, 4, 8]
+    with rasterio.open(path) as src:
+        full = src.read(1).astype("float32")
+        preview = read_preview(src, max_size=128)
+    full[full == 0] = np.nan
+    assert preview.shape == (64, 128)
+    np.testing.assert_array_equal(preview, full[::4, ::4])
+
+
+def test_ensure_overviews_runs_once(tmp_path):
+    path = make_raster(str(tmp_path / "scene.tif"), 300, 300)
+    assert ensure_overviews(path, min_size=64) == [2, 4]
+    assert ensure_overviews(path, min_size=16) == [2, 4]
+
+
+@pytest.mark.parametrize("block_size", [None, 40])
+def test_streamed_histogram_matches_numpy(tmp_path, block_size):
+    path = make_raster(str(tmp_path / "scene.tif"), 150, 90, dtype="int16", value_range=(-20, 120), nodata=-5)
+    edges = np.linspace(0, 100, 11)
+    with rasterio.open(path) as src:
+        data = src.read(1)
+        counts = streamed_histogram(src, 1, edges, block_size=block_size)
+    values = np.clip(data[data != -5], edges[0], edges[-1])
+    np.testing.assert_array_equal(counts, np.histogram(values, bins=edges)[0])
+
+
+def test_nodata_in_dtype():
+    assert nodata_in_dtype(None, "uint8") is None
+    assert nodata_in_dtype(-9999, "uint8") is None
+    assert nodata_in_dtype(2.5, "int16") is None
+    assert nodata_in_dtype(255, "uint8") == np.uint8(255)
+    assert nodata_in_dtype(-1e39, "float32") is None
+    assert np.isnan(nodata_in_dtype(float("nan"), "float32"))
\ No newline at end of file
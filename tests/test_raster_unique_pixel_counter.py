@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from benchmark_suite import make_raster
+from raster_blocks import nodata_in_dtype
+from raster_unique_pixel_counter import _add_block, _finish_counts, _new_counts, count_pixel_values
+
+
+def _reference(path, band, nodata):
+    with rasterio.open(path) as src:
+        data = src.read(band)
+    if nodata is not None:
+        data = data[data != nodata]
+    values, counts = np.unique(data, return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+@pytest.mark.parametrize("dtype, value_range", [("uint8", (0, 12)), ("int16", (-300, 300)),
+                                                ("int32", (-70000, 70000)), ("float32", (0, 20))])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_counts_match_np_unique(tmp_path, dtype, value_range, workers):
+    raster = make_raster(str(tmp_path / "raster.tif"), 90, 70, count=2, dtype=dtype,
+                         value_range=value_range, nodata=0)
+    counts = count_pixel_values(raster, block_size=32, workers=workers)[raster]
+    for band in (1, 2):
+        assert counts[band] == _reference(raster, band, 0)
+
+
+def test_nodata_outside_the_band_dtype_is_ignored():
+    counts = _new_counts("uint8")
+    _add_block(counts, np.array([[0, 1, 1], [255, 2, 0]], dtype="uint8"))
+    assert _finish_counts(counts, "uint8", -9999) == {0: 2, 1: 2, 2: 1, 255: 1}
+    assert _finish_counts(counts, "uint8", 256) == {0: 2, 1: 2, 2: 1, 255: 1}
+    assert _finish_counts(counts, "uint8", 0) == {1: 2, 2: 1, 255: 1}
+
+
+def test_nodata_in_dtype():
+    assert nodata_in_dtype(None, "uint8") is None
+    assert nodata_in_dtype(-9999, "uint8") is None
+    assert nodata_in_dtype(2.5, "int16") is None
+    assert nodata_in_dtype(float("nan"), "int32") is None
+    assert nodata_in_dtype(-1e39, "float32") is None
+    assert nodata_in_dtype(255, "uint8") == np.uint8(255)
+    assert np.isnan(nodata_in_dtype(float("nan"), "float32"))
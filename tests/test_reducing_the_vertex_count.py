@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+import shapely
+
+from benchmark_suite import random_polygons, scene_bounds
+from reducing_the_vertex_count_to_less_than_500 import (count_vertices, simplify_coverage_to_budget,
+                                                        simplify_layer, simplify_to_budget)
+
+
+def _detailed_polygons(n=40, vertices=2000, seed=0):
+    return random_polygons(n, scene_bounds(4096), vertices=vertices, seed=seed)
+
+
+def test_budget_is_never_exceeded_and_small_geometries_are_untouched():
+    detailed = _detailed_polygons()
+    small = random_polygons(5, scene_bounds(4096), vertices=20, seed=1)
+    geometries = np.concatenate([detailed, small])
+
+    result = simplify_to_budget(geometries, max_vertices=500)
+    counts = count_vertices(result)
+    assert (counts <= 500).all()
+    assert shapely.is_valid(result).all()
+    assert all(a is b for a, b in zip(result[-5:], small))
+    # The tolerance is only as large as needed: the search stops close to the budget
+    assert np.median(counts[:-5]) >= 0.9 * 500
+
+
+def test_simplified_shapes_stay_close_to_the_original():
+    rng = np.random.default_rng(2)
+    geometries = shapely.buffer(shapely.points(rng.uniform(0, 1000, (10, 2))), rng.uniform(10, 50, 10),
+                                quad_segs=500)
+    result = simplify_to_budget(geometries, max_vertices=200)
+    assert (count_vertices(result) <= 200).all()
+    for original, simplified in zip(geometries, result):
+        assert original.symmetric_difference(simplified).area < 0.05 * original.area
+
+
+@pytest.mark.skipif(not hasattr(shapely, "coverage_simplify"), reason="needs shapely 2.1")
+def test_coverage_simplification_keeps_shared_edges():
+    # A detailed disc cut into strips: dense outer arcs, straight shared edges
+    disc = shapely.Point(0, 0).buffer(10, quad_segs=400)
+    strips = shapely.intersection(disc, np.array([shapely.box(x, -10, x + 5, 10) for x in range(-10, 10, 5)]))
+    result = simplify_coverage_to_budget(strips, max_vertices=50)
+    assert count_vertices(result).max() <= 50
+    # No gaps or overlaps appear between neighbours
+    union = shapely.union_all(result)
+    assert shapely.area(result).sum() == pytest.approx(union.area)
+    assert union.geom_type == "Polygon" and len(union.interiors) == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_simplify_layer_chunks_like_a_single_call(workers):
+    gdf = gpd.GeoDataFrame({"id": range(40)}, geometry=_detailed_polygons(), crs="EPSG:32639")
+    out = simplify_layer(gdf, max_vertices=300, workers=workers, chunk_size=15)
+    expected = simplify_to_budget(gdf.geometry.values, max_vertices=300)
+    assert out["id"].tolist() == list(range(40))
+    assert all(a.equals_exact(b, 0) for a, b in zip(out.geometry.values, expected))
@@ -0,0 +1,68 @@
+import filecmp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("pyogrio")
+
+from benchmark_suite import random_polygons, scene_bounds
+from set_default_value_shapefile_column import update_attributes, update_many
+
+
+@pytest.fixture
+def layer():
+    return gpd.GeoDataFrame({"code": np.arange(50) % 5, "area": np.linspace(1e4, 5e5, 50)},
+                            geometry=random_polygons(50, scene_bounds(256), vertices=8, seed=5), crs="EPSG:32639")
+
+
+def _expected(layer):
+    """The same updates done by rewriting the whole layer with GeoPandas."""
+    lookup = pd.DataFrame({"code": [1, 3], "label": ["low", "high"]})
+    expected = layer.copy()
+    expected["class"] = 0
+    expected["area_ha"] = expected["area"] / 10000
+    expected["label"] = expected["code"].map(lookup.set_index("code")["label"])
+    return expected, lookup
+
+
+@pytest.mark.parametrize("ext", [".shp", ".gpkg"])
+def test_updates_match_full_rewrite_and_keep_geometries(tmp_path, layer, ext):
+    source = str(tmp_path / f"source{ext}")
+    output = str(tmp_path / f"output{ext}")
+    layer.to_file(source)
+    expected, lookup = _expected(layer)
+
+    updated = update_attributes(source, output, constants={"class": 0}, expressions={"area_ha": "area / 10000"},
+                                join_table=lookup, join_on="code")
+    assert updated == ["class", "area_ha", "label"]
+
+    result = gpd.read_file(output)
+    for column in ("code", "class", "area_ha"):
+        np.testing.assert_allclose(result[column].to_numpy(dtype="float64"),
+                                   expected[column].to_numpy(dtype="float64"))
+    assert result["label"].where(result["label"].notna(), None).tolist() == \
+        expected["label"].where(expected["label"].notna(), None).tolist()
+    assert all(a.equals_exact(b, 0) for a, b in zip(result.geometry, gpd.read_file(source).geometry))
+    if ext == ".shp":
+        assert filecmp.cmp(source, output, shallow=False)
+        assert filecmp.cmp(source[:-4] + ".shx", output[:-4] + ".shx", shallow=False)
+
+
+def test_update_many_in_place(tmp_path, layer):
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"layer{i}.gpkg"))
+        layer.to_file(paths[-1])
+    results = update_many(paths, constants={"class": 7})
+    assert results == {path: ["class"] for path in paths}
+    for path in paths:
+        assert (gpd.read_file(path)["class"] == 7).all()
+
+
+def test_other_formats_are_rejected(tmp_path, layer):
+    path = str(tmp_path / "layer.fgb")
+    layer.to_file(path)
+    with pytest.raises(ValueError):
+        update_attributes(path, constants={"class": 0})
@@ -0,0 +1,44 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from spectral_indices import INDICES, USE_NUMEXPR, evaluate_indices
+
+# Nodata sentinel of many float32 products
+SENTINEL = np.float32(-3.4e38)
+
+
+def _bands(seed=0, shape=(16, 16)):
+    rng = np.random.default_rng(seed)
+    return {role: rng.uniform(0.01, 0.6, shape).astype("float32") for role in ("nir", "red", "green", "blue")}
+
+
+@pytest.mark.parametrize("use_numexpr", [
+    False, pytest.param(True, marks=pytest.mark.skipif(not USE_NUMEXPR, reason="numexpr not installed"))])
+def test_indices_match_reference_formulas(use_numexpr):
+    bands = _bands()
+    nir, red, green, blue = (bands[role].astype("float64") for role in ("nir", "red", "green", "blue"))
+    expected = {
+        "NDVI": (nir - red) / (nir + red),
+        "NDWI": (green - nir) / (green + nir),
+        "EVI": 2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1),
+        "SAVI": 1.5 * (nir - red) / (nir + red + 0.5),
+    }
+    valid = np.ones(nir.shape, dtype=bool)
+    out = evaluate_indices(bands, valid, list(INDICES), use_numexpr)
+    for i, name in enumerate(INDICES):
+        np.testing.assert_allclose(out[i], expected[name], rtol=1e-4, atol=1e-5)
+
+
+def test_sentinel_pixels_become_nan_without_warnings():
+    bands = _bands()
+    for role in bands:
+        bands[role][0, 0] = SENTINEL
+    valid = np.ones(bands["nir"].shape, dtype=bool)
+    valid[0, 0] = False
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = evaluate_indices(bands, valid, list(INDICES), use_numexpr=False)
+    assert np.isnan(out[:, 0, 0]).all()
+    assert np.isfinite(out[:, 1:, 1:]).all()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("pyogrio")
+from shapely.geometry import box
+
+from benchmark_suite import random_polygons, scene_bounds
+from vector_io import USE_ARROW, LayerWriter, iter_vector_batches, read_vector, read_vector_info, write_vector
+
+FORMATS = [".gpkg", ".fgb", ".shp", ".geojson",
+           pytest.param(".parquet", marks=pytest.mark.skipif(not USE_ARROW, reason="pyarrow not installed"))]
+
+
+@pytest.fixture
+def layer():
+    geometries = random_polygons(120, scene_bounds(256), vertices=8, seed=3)
+    return gpd.GeoDataFrame({"id": np.arange(120), "name": [f"f{i}" for i in range(120)],
+                             "value": np.linspace(0, 1, 120)}, geometry=geometries, crs="EPSG:32639")
+
+
+def _assert_same(result, expected):
+    result = result.sort_values("id").reset_index(drop=True)
+    expected = expected.reset_index(drop=True)
+    assert result["id"].tolist() == expected["id"].tolist()
+    assert result["name"].tolist() == expected["name"].tolist()
+    np.testing.assert_allclose(result["value"].to_numpy(), expected["value"].to_numpy())
+    assert result.crs == expected.crs
+    assert all(a.equals(b) for a, b in zip(result.geometry, expected.geometry))
+
+
+@pytest.mark.parametrize("ext", FORMATS)
+def test_round_trip_matches_geopandas(tmp_path, layer, ext):
+    path = str(tmp_path / f"layer{ext}")
+    write_vector(layer, path)
+    _assert_same(read_vector(path), layer)
+    if ext != ".parquet":
+        _assert_same(gpd.read_file(path), layer)
+
+    info = read_vector_info(path)
+    assert info["features"] == len(layer)
+    assert {"id", "name", "value"} <= set(info["fields"])
+
+
+@pytest.mark.parametrize("ext", FORMATS)
+def test_columns_bbox_and_batches(tmp_path, layer, ext):
+    path = str(tmp_path / f"layer{ext}")
+    write_vector(layer, path)
+
+    attributes = read_vector(path, columns=["name"], read_geometry=False)
+    assert isinstance(attributes, pd.DataFrame) and not isinstance(attributes, gpd.GeoDataFrame)
+    assert sorted(attributes["name"]) == sorted(layer["name"])
+
+    minx, miny, maxx, maxy = layer.total_bounds
+    bbox = (minx, miny, (minx + maxx) / 2, (miny + maxy) / 2)
+    expected = layer[layer.intersects(box(*bbox))]
+    assert sorted(read_vector(path, bbox=bbox)["id"]) == sorted(expected["id"])
+
+    batches = list(iter_vector_batches(path, batch_size=50))
+    assert all(len(batch) <= 50 for batch in batches)
+    _assert_same(pd.concat(batches), layer)
+
+
+@pytest.mark.parametrize("ext", FORMATS)
+def test_layer_writer_appends_batches(tmp_path, layer, ext):
+    path = str(tmp_path / f"out{ext}")
+    with LayerWriter(path) as writer:
+        for start in range(0, len(layer), 40):
+            writer.write(layer.iloc[start:start + 40])
+    assert writer.features == len(layer)
+    _assert_same(read_vector(path), layer)
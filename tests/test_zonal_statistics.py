@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+gpd = pytest.importorskip("geopandas")
+from rasterio.mask import mask
+from shapely.geometry import box
+
+from benchmark_suite import CRS, ORIGIN, PIXEL_SIZE, make_raster
+from zonal_statistics import overlap_groups, zonal_statistics
+
+
+def _zones(size):
+    minx, maxy = ORIGIN
+    side = size * PIXEL_SIZE
+    geometries = [
+        box(minx, maxy - side / 2, minx + side / 2, maxy),
+        box(minx + side / 4, maxy - 3 * side / 4, minx + 3 * side / 4, maxy - side / 4),
+        box(minx + side / 2, maxy - side, minx + side, maxy - side / 2),
+        box(minx + 3.3 * PIXEL_SIZE, maxy - 10.7 * PIXEL_SIZE, minx + 9.1 * PIXEL_SIZE, maxy - 3.2 * PIXEL_SIZE),
+    ]
+    return gpd.GeoDataFrame({"name": ["a", "b", "c", "d"]}, geometry=geometries, crs=CRS)
+
+
+def test_overlapping_zones_are_split_into_groups():
+    groups = overlap_groups(_zones(64))
+    # a and c overlap b but not each other; d lies inside a
+    assert groups[0] != groups[1]
+    assert groups[1] != groups[2]
+    assert groups[0] != groups[3]
+
+
+def test_zonal_statistics_match_per_polygon_mask(tmp_path):
+    raster = make_raster(str(tmp_path / "classes.tif"), 64, 64, dtype="uint8", value_range=(0, 6),
+                         nodata=0)
+    zones = _zones(64)
+    stats = zonal_statistics(raster, zones, zone_field="name", categorical=True, block_size=16)
+
+    with rasterio.open(raster) as src:
+        for name, geometry in zip(zones["name"], zones.geometry):
+            data, _ = mask(src, [geometry], crop=True, filled=False)
+            values = data.compressed().astype("float64")
+            row = stats.loc[name]
+            assert row["count"] == values.size
+            assert row["sum"] == values.sum()
+            assert row["min"] == values.min() and row["max"] == values.max()
+            np.testing.assert_allclose(row["std"], values.std())
+            for value, count in zip(*np.unique(values, return_counts=True)):
+                assert row[f"class_{int(value)}"] == count
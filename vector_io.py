@@ -0,0 +1,232 @@
+import os
+import json
+import pandas as pd
+import geopandas as gpd
+import pyogrio
+import shapely
+from pyproj import CRS
+from shapely import box
+
+try:
+    import pyarrow  # noqa: F401
+    USE_ARROW = True
+except ImportError:
+    USE_ARROW = False
+
+# Output driver for each extension handled through pyogrio
+DRIVERS = {
+    ".shp": "ESRI Shapefile",
+    ".gpkg": "GPKG",
+    ".fgb": "FlatGeobuf",
+    ".geojson": "GeoJSON",
+    ".json": "GeoJSON",
+}
+
+
+def is_parquet(path):
+    return os.path.splitext(str(path))[1].lower() in (".parquet", ".geoparquet")
+
+
+def _parquet_geo(schema):
+    """GeoParquet 'geo' metadata of a pyarrow schema."""
+    return json.loads(schema.metadata[b"geo"])
+
+
+def _table_to_gdf(table, geo):
+    """Decodes a pyarrow table with WKB geometry columns into a GeoDataFrame."""
+    df = table.to_pandas()
+    primary = geo["primary_column"]
+    if primary not in df:
+        return df
+    crs = geo["columns"][primary].get("crs", "OGC:CRS84")
+    if isinstance(crs, dict):
+        crs = CRS.from_json_dict(crs)
+    geometry = shapely.from_wkb(df.pop(primary).values)
+    return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries(geometry, crs=crs, index=df.index), crs=crs)
+
+
+def read_vector_info(path, layer=None):
+    """
+    Layer header: fields, dtypes, crs, feature count and total_bounds (None when
+    the format does not store them). No features are read.
+    """
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        schema = parquet.schema_arrow
+        geo = _parquet_geo(schema)
+        primary = geo["columns"][geo["primary_column"]]
+        fields = [field for field in schema if field.name not in geo["columns"]]
+        crs = primary.get("crs", "OGC:CRS84")
+        if isinstance(crs, dict):
+            crs = CRS.from_json_dict(crs)
+        bbox = primary.get("bbox")
+        return {
+            "fields": [field.name for field in fields],
+            "dtypes": [str(pd.api.types.pandas_dtype(field.type.to_pandas_dtype())) for field in fields],
+            "crs": crs,
+            "features": parquet.metadata.num_rows,
+            "total_bounds": tuple(bbox) if bbox else None,
+        }
+
+    info = pyogrio.read_info(path, layer=layer, force_total_bounds=False)
+    return {
+        "fields": list(info["fields"]),
+        "dtypes": list(info["dtypes"]),
+        "crs": info["crs"],
+        "features": info["features"],
+        "total_bounds": info["total_bounds"],
+    }
+
+
+def read_vector(path, columns=None, bbox=None, layer=None, read_geometry=True, where=None):
+    """
+    Reads a vector layer with the fastest engine for its format.
+    GeoParquet goes through pyarrow; everything else through pyogrio, with Arrow
+    when it is installed. columns limits the attributes read, bbox
+    (minx, miny, maxx, maxy in the layer CRS) filters features, and
+    read_geometry=False returns a plain DataFrame of attributes.
+    """
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        geo = _parquet_geo(parquet.schema_arrow)
+        primary = geo["primary_column"]
+        wanted = None
+        if columns is not None or not read_geometry:
+            wanted = list(columns) if columns is not None else \
+                [name for name in parquet.schema_arrow.names if name not in geo["columns"]]
+            if read_geometry or bbox is not None:
+                wanted.append(primary)
+        gdf = _table_to_gdf(parquet.read(columns=wanted), geo)
+        if bbox is not None:
+            gdf = gdf[gdf.intersects(box(*bbox))]
+            if not read_geometry:
+                gdf = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+        return gdf
+
+    return pyogrio.read_dataframe(path, layer=layer, columns=columns, bbox=bbox, where=where,
+                                  read_geometry=read_geometry, use_arrow=USE_ARROW)
+
+
+def iter_vector_batches(path, batch_size=65536, columns=None, bbox=None, layer=None, read_geometry=True):
+    """
+    Yields a layer as GeoDataFrames of at most batch_size features.
+    GeoParquet is streamed row group by row group; other formats through
+    pyogrio's Arrow stream, or by feature ranges without pyarrow.
+    """
+    if is_parquet(path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        geo = _parquet_geo(parquet.schema_arrow)
+        primary = geo["primary_column"]
+        wanted = None
+        if columns is not None:
+            wanted = list(columns) + ([primary] if read_geometry or bbox is not None else [])
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=wanted):
+            gdf = _table_to_gdf(pa.Table.from_batches([batch]), geo)
+            if bbox is not None:
+                gdf = gdf[gdf.intersects(box(*bbox))]
+            if not read_geometry and isinstance(gdf, gpd.GeoDataFrame):
+                gdf = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+            if len(gdf):
+                yield gdf
+        return
+
+    if USE_ARROW:
+        with pyogrio.open_arrow(path, layer=layer, columns=columns, bbox=bbox, batch_size=batch_size,
+                                read_geometry=read_geometry, use_pyarrow=True) as (meta, reader):
+            geometry_name = meta["geometry_name"] or "wkb_geometry"
+            for batch in reader:
+                df = batch.to_pandas()
+                if read_geometry and geometry_name in df:
+                    geometry = shapely.from_wkb(df.pop(geometry_name).values)
+                    yield gpd.GeoDataFrame(df, geometry=geometry, crs=meta["crs"])
+                else:
+                    yield df
+        return
+
+    total = pyogrio.read_info(path, layer=layer)["features"]
+    for start in range(0, total, batch_size):
+        gdf = pyogrio.read_dataframe(path, layer=layer, columns=columns, bbox=bbox,
+                                     read_geometry=read_geometry,
+                                     skip_features=start, max_features=batch_size)
+        if len(gdf):
+            yield gdf
+
+
+def write_vector(gdf, path, append=False, layer=None, promote_to_multi=None):
+    """
+    Writes a GeoDataFrame; the format follows the extension (.shp, .gpkg, .fgb,
+    .geojson or .parquet). Columns are only truncated for Shapefiles.
+    As with GeoDataFrame.to_file, a named or non-integer index is written as columns.
+    promote_to_multi=True writes single-part geometries as their multi type.
+    """
+    if list(gdf.index.names) != [None] or not pd.api.types.is_integer_dtype(gdf.index.dtype):
+        gdf = gdf.reset_index()
+    if is_parquet(path):
+        if append:
+            raise ValueError("Use LayerWriter to append to GeoParquet.")
+        gdf.to_parquet(path, index=False)
+        return
+    ext = os.path.splitext(str(path))[1].lower()
+    pyogrio.write_dataframe(gdf, path, layer=layer, driver=DRIVERS.get(ext), append=append,
+                            promote_to_multi=promote_to_multi)
+
+
+class LayerWriter:
+    """
+    Appends GeoDataFrames to one output layer as they arrive.
+    The format follows the extension: .gpkg, .fgb, .shp (via pyogrio) or
+    .parquet (GeoParquet via pyarrow, one row group per batch).
+    Geometries are written as multi types, so the layer type fixed by the first
+    batch also accepts later batches that mix single and multi parts.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.features = 0
+        self._parquet = None
+
+    def write(self, gdf):
+        if is_parquet(self.output_path):
+            self._write_parquet(gdf)
+        else:
+            write_vector(gdf, self.output_path, append=self.features > 0, promote_to_multi=True)
+        self.features += len(gdf)
+
+    def _write_parquet(self, gdf):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        geometry = gdf.geometry
+        table = pa.Table.from_pandas(pd.DataFrame(gdf.drop(columns=geometry.name)), preserve_index=False)
+        table = table.append_column("geometry", pa.array(shapely.to_wkb(geometry.values), pa.binary()))
+        if self._parquet is None:
+            geo = {
+                "version": "1.0.0",
+                "primary_column": "geometry",
+                "columns": {"geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": [],
+                    "crs": gdf.crs.to_json_dict() if gdf.crs is not None else None,
+                }},
+            }
+            schema = table.schema.with_metadata({b"geo": json.dumps(geo).encode()})
+            self._parquet = pq.ParquetWriter(self.output_path, schema)
+        self._parquet.write_table(table.cast(self._parquet.schema))
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
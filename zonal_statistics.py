@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.features import rasterize
+from rasterio.windows import bounds as window_bounds, transform as window_transform
+import shapely
+from shapely import box
+
+from batch_raster_clip import load_boundary
+from raster_blocks import iter_windows, nodata_in_dtype
+
+
+def overlap_groups(gdf, all_touched=False):
+    """
+    Splits the zones into groups whose members never share a pixel, by greedy
+    colouring of the overlap graph found with the spatial index. Zones that
+    only touch along an edge share no pixel centres, so they are kept together
+    unless all_touched is set. Returns a group number per zone.
+    """
+    geometries = np.asarray(gdf.geometry.values)
+    left, right = gdf.sindex.query(geometries, predicate="intersects")
+    pair = left < right
+    left, right = left[pair], right[pair]
+    if not all_touched and len(left):
+        interiors = shapely.relate_pattern(geometries[left], geometries[right], "T********")
+        left, right = left[interiors], right[interiors]
+
+    groups = np.zeros(len(gdf), dtype="int64")
+    earlier = {}
+    for a, b in zip(left.tolist(), right.tolist()):
+        earlier.setdefault(b, []).append(a)
+    for zone in sorted(earlier):
+        used = {groups[other] for other in earlier[zone]}
+        group = 0
+        while group in used:
+            group += 1
+        groups[zone] = group
+    return groups
+
+
+def _zone_blocks(gdf, groups, window, transform, all_touched):
+    """
+    Yields the zones touching one window rasterized to zone numbers
+    (1..n, 0 = outside), one grid per overlap group present in the window.
+    """
+    height, width = int(window.height), int(window.width)
+    hits = np.sort(gdf.sindex.query(box(*window_bounds(window, transform))))
+    for group in np.unique(groups[hits]):
+        members = hits[groups[hits] == group]
+        shapes = zip(gdf.geometry.values[members], (members + 1).tolist())
+        yield rasterize(shapes, out_shape=(height, width), transform=window_transform(window, transform),
+                        fill=0, all_touched=all_touched, dtype="int32")
+
+
+def _new_zone_stats(n, percentiles=(), categorical=False):
+    return {
+        "counts": np.zeros(n + 1, dtype="int64"),
+        "sums": np.zeros(n + 1, dtype="float64"),
+        "squares": np.zeros(n + 1, dtype="float64"),
+        "mins": np.full(n + 1, np.inf),
+        "maxs": np.full(n + 1, -np.inf),
+        "values": [[] for _ in range(n + 1)] if percentiles else None,
+        "classes": {} if categorical else None,
+    }
+
+
+def _add_zone_block(stats, zone_block, data, valid):
+    """Adds the valid pixels of one block to the statistics of their zones."""
+    valid = valid & (zone_block > 0)
+    z = zone_block[valid]
+    if not z.size:
+        return
+    vf = data[valid].astype("float64")
+    size = stats["counts"].size
+
+    stats["counts"] += np.bincount(z, minlength=size)
+    stats["sums"] += np.bincount(z, weights=vf, minlength=size)
+    stats["squares"] += np.bincount(z, weights=vf * vf, minlength=size)
+    np.minimum.at(stats["mins"], z, vf)
+    np.maximum.at(stats["maxs"], z, vf)
+
+    if stats["values"] is not None:
+        order = np.argsort(z, kind="stable")
+        present, starts = np.unique(z[order], return_index=True)
+        for zone, part in zip(present, np.split(vf[order], starts[1:])):
+            stats["values"][zone].append(part)
+
+    if stats["classes"] is not None:
+        class_counts = stats["classes"]
+        pairs, pair_counts = np.unique(np.stack([z.astype("float64"), vf]), axis=1, return_counts=True)
+        for (zone, value), count in zip(pairs.T.tolist(), pair_counts.tolist()):
+            key = (int(zone), value)
+            class_counts[key] = class_counts.get(key, 0) + count
+
+
+def _finish_zone_stats(stats, zone_ids, index_name, percentiles=()):
+    counts, sums, squares = stats["counts"], stats["sums"], stats["squares"]
+    mins, maxs = stats["mins"].copy(), stats["maxs"].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+    empty = counts == 0
+    mins[empty] = np.nan
+    maxs[empty] = np.nan
+
+    result = pd.DataFrame({
+        "count": counts[1:],
+        "sum": sums[1:],
+        "mean": means[1:],
+        "min": mins[1:],
+        "max": maxs[1:],
+        "std": stds[1:],
+    }, index=pd.Index(zone_ids, name=index_name))
+
+    for q in percentiles:
+        result[f"p{q:g}"] = [np.percentile(np.concatenate(parts), q) if parts else np.nan
+                             for parts in stats["values"][1:]]
+
+    if stats["classes"]:
+        histogram = pd.Series(stats["classes"]).unstack(fill_value=0)
+        histogram = histogram.reindex(range(1, counts.size), fill_value=0).astype("int64")
+        for value in histogram.columns:
+            label = int(value) if float(value).is_integer() else value
+            result[f"class_{label}"] = histogram[value].values
+
+    return result
+
+
+def zonal_statistics(raster_path, zones, zone_field=None, band=1, percentiles=(),
+                     categorical=False, block_size=None, all_touched=False):
+    """
+    Computes per-zone statistics of a raster band in a single pass.
+    zones is a GeoDataFrame or a path to a vector file; it is reprojected to the
+    raster CRS. The raster is read block by block and each block's zones are
+    rasterized from a spatial index, so every pixel is read once no matter how
+    many zones there are. Overlapping zones are rasterized in separate groups,
+    so a pixel covered by several zones counts in each of them.
+
+    Returns a DataFrame indexed by zone_field (or the zone index) with count,
+    sum, mean, min, max and std, a p<q> column per requested percentile, and
+    with categorical=True a class_<value> pixel count column per raster value.
+    Percentiles keep the zone pixel values in memory until the end.
+    """
+    gdf = load_boundary(zones)
+    zone_ids = gdf[zone_field].values if zone_field else gdf.index.values
+    gdf = gdf.reset_index(drop=True)
+    stats = _new_zone_stats(len(gdf), percentiles, categorical)
+
+    with rasterio.open(raster_path) as src:
+        if gdf.crs is not None and src.crs is not None and gdf.crs != src.crs:
+            gdf = gdf.to_crs(src.crs)
+        groups = overlap_groups(gdf, all_touched)
+        nodata = nodata_in_dtype(src.nodata, src.dtypes[band - 1])
+
+        for window in iter_windows(src, block_size, band=band):
+            data = valid = None
+            for zone_block in _zone_blocks(gdf, groups, window, src.transform, all_touched):
+                if not zone_block.any():
+                    continue
+                if data is None:
+                    data = src.read(band, window=window)
+                    valid = np.ones(data.shape, dtype=bool)
+                    if nodata is not None:
+                        valid &= data != nodata
+                    if data.dtype.kind == "f":
+                        valid &= ~np.isnan(data)
+                _add_zone_block(stats, zone_block, data, valid)
+
+    return _finish_zone_stats(stats, zone_ids, zone_field or "zone", percentiles)
+
+
+if __name__ == "__main__":
+    raster_file = r"...\land_cover_2000.tif"
+    zones_file = r"...\county.shp"
+
+    stats = zonal_statistics(raster_file, zones_file, zone_field="NAME", percentiles=(50,), categorical=True)
+    print(stats)